@@ -22,32 +22,48 @@ class IrrigationInfoDAO:
             irrigation_info (IrrigationInfo): The irrigation info to add or update.
             zone_id (int): The zone identifier for the irrigation info.
         """
-        if irrigation_info.id == -1:
-            num = SqlLite.get_instance().ExecuteQuery(
-                """SELECT COUNT(*) FROM scheduler"""
-            )
-            id = int(num[0][0]) + 1
-            SqlLite.get_instance().ExecuteQueryNoResult(
-                """INSERT INTO scheduler VALUES (?, ?, ?, ?) """,
-                [
-                    id,
-                    zone_id,
-                    irrigation_info.time_to_start.strftime("%H:%M:%S"),
-                    irrigation_info.for_how_many_seconds,
-                ],
-            )
-            irrigation_info.id = id
-        else:
+        with SqlLite.get_instance().Transaction():
+            if irrigation_info.id == -1:
+                irrigation_info.id = SqlLite.get_instance().ExecuteInsert(
+                    """INSERT INTO scheduler
+                    (zone_id, sheduled_time, for_how_many_seconds) VALUES (?, ?, ?)""",
+                    [
+                        zone_id,
+                        irrigation_info.time_to_start.strftime("%H:%M:%S"),
+                        irrigation_info.for_how_many_seconds,
+                    ],
+                )
+            else:
+                SqlLite.get_instance().ExecuteQueryNoResult(
+                    """UPDATE scheduler SET zone_id = ?, sheduled_time = ?, 
+                            for_how_many_seconds = ? WHERE id = ?""",
+                    [
+                        zone_id,
+                        irrigation_info.time_to_start.strftime("%H:%M:%S"),
+                        irrigation_info.for_how_many_seconds,
+                        irrigation_info.id,
+                    ],
+                )
+
+    @staticmethod
+    def replace_irrigation_info(zone_id: int, irrigation_info: list):
+        """
+        Makes the given list the whole schedule of a zone, in one transaction:
+        records of the zone missing from the list are removed, the others are
+        updated and new ones (id -1) are added and get their id.
+        Args:
+            zone_id (int): The zone identifier.
+            irrigation_info (list[IrrigationInfo]): The new schedule.
+        """
+        kept_ids = [info.id for info in irrigation_info if info.id != -1]
+        with SqlLite.get_instance().Transaction():
             SqlLite.get_instance().ExecuteQueryNoResult(
-                """UPDATE scheduler SET zone_id = ?, sheduled_time = ?, 
-                        for_how_many_seconds = ? WHERE id = ?""",
-                [
-                    zone_id,
-                    irrigation_info.time_to_start.strftime("%H:%M:%S"),
-                    irrigation_info.for_how_many_seconds,
-                    irrigation_info.id,
-                ],
+                f"""DELETE FROM scheduler WHERE zone_id = ?
+                AND id NOT IN ({", ".join("?" * len(kept_ids))})""",
+                [zone_id, *kept_ids],
             )
+            for info in irrigation_info:
+                IrrigationInfoDAO.add_new_irrigator_info(info, zone_id)
 
     @staticmethod
     def get_irrigation_info(id_irrigator: int):
@@ -0,0 +1,52 @@
+"""
+This module provides LastEventIndex, the date of the most recent log of every
+zone and event kept in memory.
+"""
+
+import threading
+
+
+class LastEventIndex:
+    """
+    Date of the most recent log of every (zone id, EventId), so that reading
+    it never touches the database.
+    Dates only move forward: a date older than the known one is ignored, so
+    the same log may be recorded more than once and in any order.
+    """
+
+    def __init__(self):
+        self._dates = {}
+        self._lock = threading.Lock()
+        # Generation of the database the index was loaded from, None if never
+        self.generation = None
+
+    def warm(self, generation: int, query):
+        """
+        Replaces the content with the rows returned by query(), run with the
+        index locked so that no date recorded meanwhile is lost.
+        Args:
+            generation (int): The generation of the database queried.
+            query: Callable returning (zone_id, EventId, datetime) rows.
+        """
+        with self._lock:
+            self._dates = {
+                (zone_id, event_id): date_time
+                for zone_id, event_id, date_time in query()
+            }
+            self.generation = generation
+
+    def record(self, zone_id: int, event_id, date_time):
+        """
+        Records a log, unless a more recent one of its zone and event is known.
+        """
+        key = (zone_id, event_id)
+        with self._lock:
+            known = self._dates.get(key)
+            if known is None or known < date_time:
+                self._dates[key] = date_time
+
+    def get(self, zone_id: int, event_id):
+        """
+        Returns the date of the last log of the zone and event, None if none.
+        """
+        return self._dates.get((zone_id, event_id))
@@ -2,9 +2,14 @@
 This module provides the PersistentLogDAO class for managing persistent log entries in the database.
 """
 
+import contextlib
 import datetime
+import threading
 from backend.db.SqlLite import SqlLite
 from backend.datatype.log import EventId, Log
+from backend.dao.last_event_index import LastEventIndex
+from backend.dao.recent_log_buffer import RecentLogBuffer
+from backend.dao.persistent_log_writer import LogDurability, PersistentLogWriter
 
 
 class PersistentLogDAO:
@@ -13,10 +18,81 @@ class PersistentLogDAO:
     Handles adding and retrieving log entries from the database.
     """
 
+    _writer = None
+    # Logs collected by the batch() blocks of each thread
+    _batches = threading.local()
+    # Date of the last log of every zone and event, loaded on first use
+    _last_events = LastEventIndex()
+    # The last log entries, loaded on first use
+    _recent_logs = RecentLogBuffer()
+    # Longest wait for the queued logs before a read, so that a stalled
+    # writer delays RPC reads instead of blocking them
+    _read_flush_seconds = 2
+
+    @staticmethod
+    def start_writer(durability: LogDurability = LogDurability.BATCHED, **kwargs):
+        """
+        Routes add_log through a background writer with the given durability.
+        Args:
+            durability (LogDurability): IMMEDIATE writes synchronously again.
+            **kwargs: Queue and batch sizes forwarded to PersistentLogWriter.
+        """
+        PersistentLogDAO.stop_writer()
+        if durability == LogDurability.IMMEDIATE:
+            return
+        writer = PersistentLogWriter(PersistentLogDAO._write_logs, durability, **kwargs)
+        writer.start()
+        PersistentLogDAO._writer = writer
+
+    @staticmethod
+    def stop_writer():
+        """
+        Writes every queued log entry and goes back to synchronous writes.
+        """
+        writer = PersistentLogDAO._writer
+        PersistentLogDAO._writer = None
+        if writer is not None:
+            writer.stop()
+
+    @staticmethod
+    def flush(timeout: float = None):
+        """
+        Blocks until every queued log entry has been written.
+        Args:
+            timeout (float, optional): Maximum seconds to wait.
+        Returns:
+            bool: False if entries may still be queued after timeout.
+        """
+        writer = PersistentLogDAO._writer
+        if writer is None:
+            return True
+        return writer.flush(timeout)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def batch():
+        """
+        Collects the logs added by this thread in the block and writes them
+        with one add_logs call when the block ends, inside the transaction
+        of the caller if there is one. Nested blocks join the outer one.
+        Nothing is written if the block raises.
+        """
+        if getattr(PersistentLogDAO._batches, "logs", None) is not None:
+            yield
+            return
+        PersistentLogDAO._batches.logs = []
+        try:
+            yield
+            logs = PersistentLogDAO._batches.logs
+        finally:
+            PersistentLogDAO._batches.logs = None
+        if logs:
+            PersistentLogDAO.add_logs(logs)
+
     @staticmethod
     def add_log(log: Log):
         """
-        Adds a log entry to the database.
+        Adds a log entry to the database, or queues it if a writer is running.
         Args:
             log (Log): The log entry to add.
         Raises:
@@ -25,16 +101,56 @@ class PersistentLogDAO:
         if log.event_id == EventId.GENERAL and log.log is None:
             raise ValueError("Used a general event id but no text has been provided")
         log.date_time = datetime.datetime.now()
-        SqlLite.get_instance().ExecuteQueryNoResult(
+        batch = getattr(PersistentLogDAO._batches, "logs", None)
+        if batch is not None:
+            batch.append(log)
+            return
+        if PersistentLogDAO._writer is not None:
+            # In memory at once, so that they are never behind the valves
+            PersistentLogDAO._remember([log])
+            PersistentLogDAO._writer.enqueue(log)
+            return
+        PersistentLogDAO.add_logs([log])
+
+    @staticmethod
+    def add_logs(logs: list):
+        """
+        Writes many log entries in a single transaction.
+        Args:
+            logs (list[Log]): The log entries to write, with their date_time set.
+        """
+        PersistentLogDAO._write_logs(logs)
+        PersistentLogDAO._remember(logs)
+
+    @staticmethod
+    def _write_logs(logs):
+        # Database only, also used by the writer for the logs add_log queued
+        SqlLite.get_instance().ExecuteManyNoResult(
             """INSERT INTO log VALUES (?, ?, ?, ?)""",
             [
-                log.zone_id,
-                log.date_time.strftime("%Y-%m-%d %H:%M:%S.%f"),
-                int(log.event_id.value),
-                log.log,
+                (
+                    log.zone_id,
+                    log.date_time.strftime("%Y-%m-%d %H:%M:%S.%f"),
+                    int(log.event_id.value),
+                    log.log,
+                )
+                for log in logs
             ],
         )
 
+    @staticmethod
+    def _remember(logs):
+        # Adds written or queued logs to the in-memory views of the table
+        recent_logs = PersistentLogDAO._recent_logs
+        generation = SqlLite.get_instance().Generation()
+        if recent_logs.generation != generation:
+            recent_logs.clear(generation)
+        for log in logs:
+            PersistentLogDAO._last_events.record(
+                log.zone_id, log.event_id, log.date_time
+            )
+            recent_logs.append(log)
+
     @staticmethod
     def get_logs(
         zone_id: int = None, event_id: EventId = None, number_of_logs_to_get: int = None
@@ -65,19 +181,173 @@ class PersistentLogDAO:
             query += " WHERE " + " AND ".join(conditions)
 
         query += " ORDER BY date_time DESC"
+        if number_of_logs_to_get is not None:
+            query += " LIMIT ?"
+            params.append(number_of_logs_to_get)
+        PersistentLogDAO.flush(PersistentLogDAO._read_flush_seconds)
         data = SqlLite.get_instance().ExecuteQuery(query, params)
 
-        logs = []
-        if number_of_logs_to_get is not None:
-            data = data[:number_of_logs_to_get]
-        for row in data:
-            print(row[1])
-            logs.append(
-                Log(
-                    row[0],
-                    datetime.datetime.strptime(row[1], "%Y-%m-%d %H:%M:%S.%f"),
-                    EventId(row[2]),
-                    row[3],
-                )
+        return [
+            Log(
+                row[0],
+                datetime.datetime.fromisoformat(row[1]),
+                EventId(row[2]),
+                row[3],
             )
-        return logs
+            for row in data
+        ]
+
+    @staticmethod
+    def get_logs_page(
+        zone_id: int = None,
+        event_id: EventId = None,
+        cursor: tuple = None,
+        page_size: int = 100,
+    ):
+        """
+        Retrieves one page of log entries, newest first, optionally filtered
+        by zone and event. Pages are read by key from an index, so reading a
+        page costs the same however deep in the history it is, and entries
+        added meanwhile never shift the following pages.
+        Args:
+            zone_id (int, optional): The zone ID to filter logs.
+            event_id (EventId, optional): The event ID to filter logs.
+            cursor (tuple, optional): The cursor returned with the previous
+                page, None for the first one.
+            page_size (int): The maximum number of logs to retrieve.
+        Returns:
+            tuple: (list[Log], cursor of the next page or None if this is the
+                last one). A cursor is a (date_time, rowid) tuple.
+        """
+        query = "SELECT rowid, * FROM log"
+        params = []
+        conditions = []
+        if zone_id is not None:
+            conditions.append("zone_id = ?")
+            params.append(zone_id)
+        if event_id is not None:
+            conditions.append("event = ?")
+            params.append(int(event_id.value))
+        if cursor is not None:
+            conditions.append("(date_time, rowid) < (?, ?)")
+            params.extend(cursor)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        # One more than a page, to know whether there is a next one
+        query += " ORDER BY date_time DESC, rowid DESC LIMIT ?"
+        params.append(page_size + 1)
+        PersistentLogDAO.flush(PersistentLogDAO._read_flush_seconds)
+        data = SqlLite.get_instance().ExecuteQuery(query, params)
+        next_cursor = None
+        if len(data) > page_size:
+            data = data[:page_size]
+            next_cursor = (data[-1][2], data[-1][0])
+        logs = [
+            Log(
+                row[1],
+                datetime.datetime.fromisoformat(row[2]),
+                EventId(row[3]),
+                row[4],
+            )
+            for row in data
+        ]
+        return logs, next_cursor
+
+    @staticmethod
+    def warm_last_events():
+        """
+        Loads the date of the last log of every zone and event with one
+        query, so that get_last_event_date never queries the database.
+        Called at startup; otherwise done by the first lookup, and again
+        after the database is created or removed.
+        """
+        PersistentLogDAO.flush(PersistentLogDAO._read_flush_seconds)
+        PersistentLogDAO._last_events.warm(
+            SqlLite.get_instance().Generation(),
+            PersistentLogDAO._get_last_event_dates,
+        )
+
+    @staticmethod
+    def _get_last_event_dates():
+        # Answered from the log_zone_event_date index, without the table
+        data = SqlLite.get_instance().ExecuteQuery(
+            """SELECT zone_id, event, MAX(date_time) FROM log GROUP BY zone_id, event"""
+        )
+        return [
+            (row[0], EventId(row[1]), datetime.datetime.fromisoformat(row[2]))
+            for row in data
+        ]
+
+    @staticmethod
+    def get_last_event_date(zone_id: int, event_id: EventId):
+        """
+        Returns the date of the last log of a zone and event, from memory.
+        Args:
+            zone_id (int): The zone ID.
+            event_id (EventId): The event ID.
+        Returns:
+            datetime.datetime: The date of the log, None if there is none.
+        """
+        index = PersistentLogDAO._last_events
+        if index.generation != SqlLite.get_instance().Generation():
+            PersistentLogDAO.warm_last_events()
+        return index.get(zone_id, event_id)
+
+    @staticmethod
+    def get_open_since(zone_id: int):
+        """
+        Returns when a zone was opened if its last irrigation has not stopped.
+        Args:
+            zone_id (int): The zone ID.
+        Returns:
+            datetime.datetime: The date of the last IRRIGATION_START, None if
+                an IRRIGATION_STOP followed it or there is none.
+        """
+        start = PersistentLogDAO.get_last_event_date(zone_id, EventId.IRRIGATION_START)
+        stop = PersistentLogDAO.get_last_event_date(zone_id, EventId.IRRIGATION_STOP)
+        if start is None or (stop is not None and stop >= start):
+            return None
+        return start
+
+    @staticmethod
+    def warm_recent_logs():
+        """
+        Loads the last log entries with one query, so that get_recent_logs
+        never queries the database. Called at startup; otherwise done by the
+        first lookup, and again after the database is created or removed.
+        """
+        PersistentLogDAO.flush(PersistentLogDAO._read_flush_seconds)
+        PersistentLogDAO._recent_logs.warm(
+            SqlLite.get_instance().Generation(),
+            lambda: PersistentLogDAO.get_logs(
+                number_of_logs_to_get=PersistentLogDAO._recent_logs.capacity
+            )[::-1],
+        )
+
+    @staticmethod
+    def get_recent_logs(
+        zone_id: int = None,
+        event_id: EventId = None,
+        since: datetime.datetime = None,
+        until: datetime.datetime = None,
+        within_seconds: float = None,
+        limit: int = None,
+    ):
+        """
+        Retrieves the most recent log entries from memory, newest first.
+        Only the last RecentLogBuffer capacity entries are searched: use
+        get_logs for older ones.
+        Args:
+            zone_id (int, optional): The zone ID to filter logs.
+            event_id (EventId, optional): The event ID to filter logs.
+            since (datetime.datetime, optional): The oldest date to return.
+            until (datetime.datetime, optional): The date to return logs before.
+            within_seconds (float, optional): Only the logs of the last seconds.
+            limit (int, optional): The maximum number of logs to retrieve.
+        Returns:
+            list[Log]: List of log entries matching the criteria.
+        """
+        recent_logs = PersistentLogDAO._recent_logs
+        if recent_logs.generation != SqlLite.get_instance().Generation():
+            PersistentLogDAO.warm_recent_logs()
+        return recent_logs.query(zone_id, event_id, since, until, within_seconds, limit)
@@ -0,0 +1,168 @@
+"""
+This module provides the PersistentLogWriter class, a background thread that
+writes log entries to the database in batches so that callers never wait for
+disk I/O.
+"""
+
+import logging
+import queue
+import threading
+import time
+from enum import Enum
+
+_STOP = object()
+
+
+class LogDurability(Enum):
+    """How soon a log entry reaches the database."""
+
+    # Written by the caller, one commit per entry
+    IMMEDIATE = 1
+    # Queued, committed as soon as the writer thread picks it up
+    BATCHED = 2
+    # Queued, committed every flush_interval seconds or when a batch is full
+    DEFERRED = 3
+
+
+class PersistentLogWriter:
+    """
+    Write-behind queue for log entries.
+    Entries are taken from a bounded queue and handed to write_batch in groups
+    of at most max_batch_size; when the queue is full new entries are dropped
+    and counted instead of blocking the caller.
+    """
+
+    def __init__(
+        self,
+        write_batch,
+        durability: LogDurability = LogDurability.BATCHED,
+        max_queue_size: int = 1024,
+        max_batch_size: int = 256,
+        flush_interval: float = 1.0,
+    ):
+        if durability == LogDurability.IMMEDIATE:
+            raise ValueError("Immediate durability does not use a writer")
+        self._write_batch = write_batch
+        self._durability = durability
+        self._max_batch_size = max_batch_size
+        self._flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        """
+        Starts the writer thread.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="PersistentLogWriter", daemon=True
+        )
+        self._thread.start()
+
+    def enqueue(self, log):
+        """
+        Queues a log entry without blocking.
+        Args:
+            log (Log): The entry to write.
+        Returns:
+            bool: False if the queue was full and the entry has been dropped.
+        """
+        try:
+            self._queue.put_nowait(log)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logging.error("Log queue full, dropped log for zone %s", log.zone_id)
+            return False
+
+    def flush(self, timeout: float = None):
+        """
+        Blocks until every entry queued so far has been written.
+        Args:
+            timeout (float, optional): Maximum seconds to wait, None to wait
+                as long as it takes.
+        Returns:
+            bool: True if the queue has been flushed in time.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        flushed = threading.Event()
+        try:
+            self._queue.put(flushed, timeout=timeout)
+        except queue.Full:
+            return False
+        if deadline is not None:
+            timeout = max(0, deadline - time.monotonic())
+        return flushed.wait(timeout)
+
+    def stop(self, timeout: float = None):
+        """
+        Writes the pending entries and stops the writer thread.
+        Args:
+            timeout (float, optional): Maximum seconds to wait.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP, timeout=timeout)
+        self._thread.join(timeout)
+
+    def pending(self):
+        """
+        Returns the number of queued entries not written yet.
+        """
+        return self._queue.qsize()
+
+    def _run(self):
+        pending = []
+        waiters = []
+        stopping = False
+        next_flush = time.monotonic()
+        while not stopping:
+            timeout = None
+            if self._durability == LogDurability.DEFERRED and pending:
+                timeout = max(0, next_flush - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            while item is not None:
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    if not pending:
+                        next_flush = time.monotonic() + self._flush_interval
+                    pending.append(item)
+                if len(pending) >= self._max_batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            must_write = (
+                self._durability == LogDurability.BATCHED
+                or waiters
+                or stopping
+                or len(pending) >= self._max_batch_size
+                or time.monotonic() >= next_flush
+            )
+            if pending and must_write:
+                self._write(pending)
+                pending = []
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+
+    def _write(self, batch):
+        try:
+            self._write_batch(batch)
+            self.written += len(batch)
+        except Exception as ex:
+            self.failed += len(batch)
+            logging.error("Cannot write %s log entries: %s", len(batch), ex)
@@ -0,0 +1,156 @@
+"""
+This module provides RecentLogBuffer, the last log entries kept in memory in
+fixed-size columns.
+"""
+
+import array
+import datetime
+import threading
+import time
+from backend.datatype.log import EventId, Log
+
+# Stored for the entries without a zone
+_NO_ZONE = -1
+
+
+class RecentLogBuffer:
+    """
+    Ring buffer of the last capacity log entries, one preallocated array per
+    column, so that its memory does not grow however long the service runs.
+    Each entry has a wall clock timestamp, for date windows, and a
+    time.monotonic_ns() one, for "in the last n seconds" windows that clock
+    changes do not move.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self._capacity = capacity
+        self._zone_ids = array.array("q", [0]) * capacity
+        self._events = array.array("b", [0]) * capacity
+        self._timestamps = array.array("d", [0.0]) * capacity
+        self._monotonic_ns = array.array("q", [0]) * capacity
+        self._descriptions = [None] * capacity
+        # Number of entries ever appended; the next one goes at _appended %
+        # capacity
+        self._appended = 0
+        self._lock = threading.Lock()
+        # Generation of the database the entries belong to
+        self.generation = None
+
+    @property
+    def capacity(self):
+        """The number of entries kept."""
+        return self._capacity
+
+    def __len__(self):
+        return min(self._appended, self._capacity)
+
+    def append(self, log: Log, monotonic_ns: int = None):
+        """
+        Adds a log entry, replacing the oldest one when full.
+        Args:
+            log (Log): The entry, with its date_time set.
+            monotonic_ns (int, optional): When it happened, now if None.
+        """
+        with self._lock:
+            if monotonic_ns is None:
+                monotonic_ns = time.monotonic_ns()
+            self._append(log, log.date_time.timestamp(), monotonic_ns)
+
+    def _append(self, log, timestamp, monotonic_ns):
+        # Called with the lock held
+        slot = self._appended % self._capacity
+        self._zone_ids[slot] = _NO_ZONE if log.zone_id is None else log.zone_id
+        self._events[slot] = log.event_id.value
+        self._timestamps[slot] = timestamp
+        self._monotonic_ns[slot] = monotonic_ns
+        self._descriptions[slot] = log.log
+        self._appended += 1
+
+    def clear(self, generation: int = None):
+        """
+        Drops every entry; they now belong to the given database generation.
+        """
+        with self._lock:
+            self._appended = 0
+            self._descriptions = [None] * self._capacity
+            self.generation = generation
+
+    def warm(self, generation: int, query):
+        """
+        Replaces the entries with the logs returned by query(), oldest first,
+        run with the buffer locked so that no entry appended meanwhile is
+        lost. Their monotonic timestamps are derived from their dates, the
+        future ones being taken as now.
+        Args:
+            generation (int): The generation of the database queried.
+            query: Callable returning the logs to keep.
+        """
+        with self._lock:
+            logs = query()
+            self._appended = 0
+            self._descriptions = [None] * self._capacity
+            self.generation = generation
+            now = time.time()
+            now_ns = time.monotonic_ns()
+            for log in logs[-self._capacity :]:
+                timestamp = log.date_time.timestamp()
+                age_ns = max(0, int((now - timestamp) * 1e9))
+                self._append(log, timestamp, now_ns - age_ns)
+
+    def query(
+        self,
+        zone_id: int = None,
+        event_id: EventId = None,
+        since: datetime.datetime = None,
+        until: datetime.datetime = None,
+        within_seconds: float = None,
+        limit: int = None,
+    ):
+        """
+        Returns the entries matching every given filter, newest first.
+        Args:
+            zone_id (int, optional): Only the entries of this zone.
+            event_id (EventId, optional): Only the entries of this event.
+            since (datetime.datetime, optional): Only the entries from this date.
+            until (datetime.datetime, optional): Only the entries before this date.
+            within_seconds (float, optional): Only the entries of the last
+                seconds, measured on the monotonic clock.
+            limit (int, optional): The maximum number of entries.
+        Returns:
+            list[Log]: The matching entries.
+        """
+        event = None if event_id is None else event_id.value
+        start = None if since is None else since.timestamp()
+        end = None if until is None else until.timestamp()
+        oldest_ns = None
+        if within_seconds is not None:
+            oldest_ns = time.monotonic_ns() - int(within_seconds * 1e9)
+        logs = []
+        with self._lock:
+            newest = self._appended - 1
+            for position in range(newest, newest - len(self), -1):
+                if limit is not None and len(logs) >= limit:
+                    break
+                slot = position % self._capacity
+                if oldest_ns is not None and self._monotonic_ns[slot] < oldest_ns:
+                    # Appended in monotonic order: the older ones are too
+                    break
+                if zone_id is not None and self._zone_ids[slot] != zone_id:
+                    continue
+                if event is not None and self._events[slot] != event:
+                    continue
+                timestamp = self._timestamps[slot]
+                if (start is not None and timestamp < start) or (
+                    end is not None and timestamp >= end
+                ):
+                    continue
+                logs.append((slot, timestamp))
+            return [
+                Log(
+                    None if self._zone_ids[slot] == _NO_ZONE else self._zone_ids[slot],
+                    datetime.datetime.fromtimestamp(timestamp),
+                    EventId(self._events[slot]),
+                    self._descriptions[slot],
+                )
+                for slot, timestamp in logs
+            ]
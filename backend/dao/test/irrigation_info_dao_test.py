@@ -69,6 +69,22 @@ class TestIrrigationInfo(unittest.TestCase):
         self.assertEqual(irrigator_list[0], irrigation_info_to_add_2)
         self.assertEqual(irrigator_list[1], irrigation_info_to_add_3)
 
+    def test_replace_irrigation_info(self):
+        print("==== test replace irrigation info =====")
+        kept = IrrigationInfo(datetime.time(6, 0, 0), 120)
+        removed = IrrigationInfo(datetime.time(7, 0, 0), 120)
+        IrrigationInfoDAO.add_new_irrigator_info(kept, 9)
+        IrrigationInfoDAO.add_new_irrigator_info(removed, 9)
+        kept.for_how_many_seconds = 300
+        added = IrrigationInfo(datetime.time(20, 0, 0), 60)
+        IrrigationInfoDAO.replace_irrigation_info(9, [kept, added])
+        self.assertNotEqual(added.id, -1)
+        irrigator_list = IrrigationInfoDAO.get_irrigation_info(9)
+        self.assertEqual([info.id for info in irrigator_list], [kept.id, added.id])
+        self.assertEqual(irrigator_list[0].for_how_many_seconds, 300)
+        IrrigationInfoDAO.replace_irrigation_info(9, [])
+        self.assertEqual(IrrigationInfoDAO.get_irrigation_info(9), [])
+
 
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+Unit tests for LastEventIndex: verifies loading and recording of the last
+event dates.
+"""
+
+import datetime
+import unittest
+from backend.dao.last_event_index import LastEventIndex
+from backend.datatype.log import EventId
+
+
+class TestLastEventIndex(unittest.TestCase):
+    """
+    Test suite for LastEventIndex.
+    """
+
+    def test_dates_only_move_forward(self):
+        """
+        Test that recording an older date keeps the most recent one.
+        """
+        index = LastEventIndex()
+        later = datetime.datetime(2024, 5, 2, 8)
+        index.record(1, EventId.IRRIGATION_START, later)
+        index.record(1, EventId.IRRIGATION_START, later - datetime.timedelta(hours=1))
+        self.assertEqual(index.get(1, EventId.IRRIGATION_START), later)
+        self.assertIsNone(index.get(1, EventId.IRRIGATION_STOP))
+        self.assertIsNone(index.get(2, EventId.IRRIGATION_START))
+
+    def test_warm_replaces_the_content(self):
+        """
+        Test that warming loads the rows of the query and its generation.
+        """
+        index = LastEventIndex()
+        date = datetime.datetime(2024, 5, 2, 8)
+        index.record(3, EventId.IRRIGATION_STOP, date)
+        index.warm(7, lambda: [(1, EventId.IRRIGATION_START, date)])
+        self.assertEqual(index.generation, 7)
+        self.assertEqual(index.get(1, EventId.IRRIGATION_START), date)
+        self.assertIsNone(index.get(3, EventId.IRRIGATION_STOP))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -98,6 +98,134 @@ class TestPersistentLog(unittest.TestCase):
         self.assertEqual(logs[0], log_to_add_3)
         self.assertEqual(logs[1], log_to_add_1)
 
+    def test_batch(self):
+        """
+        Test that logs added in a batch are written only when it ends, and
+        not at all when it fails.
+        """
+        with PersistentLogDAO.batch():
+            PersistentLogDAO.add_log(
+                Log(5, None, EventId.IRRIGATION_START, "Irrigation started")
+            )
+            with PersistentLogDAO.batch():
+                PersistentLogDAO.add_log(
+                    Log(5, None, EventId.IRRIGATION_STOP, "Irrigation ended")
+                )
+            self.assertEqual(PersistentLogDAO.get_logs(5), [])
+        self.assertEqual(len(PersistentLogDAO.get_logs(5)), 2)
+        with self.assertRaises(RuntimeError):
+            with PersistentLogDAO.batch():
+                PersistentLogDAO.add_log(
+                    Log(6, None, EventId.IRRIGATION_START, "Irrigation started")
+                )
+                raise RuntimeError("failed")
+        self.assertEqual(PersistentLogDAO.get_logs(6), [])
+
+    def test_latest_event_of_a_zone_uses_the_index(self):
+        """
+        Test that the latest event of a zone is read through the composite index.
+        """
+        plan = self.db.ExecuteQuery(
+            """EXPLAIN QUERY PLAN SELECT * FROM log WHERE zone_id = ? AND event = ?
+            ORDER BY date_time DESC LIMIT 1""",
+            [2, EventId.IRRIGATION_START.value],
+        )
+        details = " ".join(str(row[-1]) for row in plan)
+        self.assertIn("log_zone_event_date", details)
+        self.assertNotIn("TEMP B-TREE", details)
+
+    def test_last_event_dates_from_memory(self):
+        """
+        Test that the last event dates are loaded with one query and then
+        kept up to date by add_log without reading the database.
+        """
+        self.db.ExecuteQueryNoResult(
+            """INSERT INTO log VALUES (?, ?, ?, ?)""",
+            [8, "2024-03-01 06:00:00.000000", EventId.IRRIGATION_START.value, "old"],
+        )
+        PersistentLogDAO.warm_last_events()
+        self.assertEqual(
+            PersistentLogDAO.get_last_event_date(8, EventId.IRRIGATION_START),
+            datetime.datetime(2024, 3, 1, 6),
+        )
+        self.assertEqual(
+            PersistentLogDAO.get_open_since(8), datetime.datetime(2024, 3, 1, 6)
+        )
+        PersistentLogDAO.add_log(Log(8, None, EventId.IRRIGATION_STOP, "stopped"))
+        self.assertIsNone(PersistentLogDAO.get_open_since(8))
+        PersistentLogDAO.add_log(Log(8, None, EventId.IRRIGATION_START, "started"))
+        started = PersistentLogDAO.get_last_event_date(8, EventId.IRRIGATION_START)
+        self.assertGreater(started, datetime.datetime(2024, 3, 1, 6))
+        self.assertEqual(PersistentLogDAO.get_open_since(8), started)
+        # Written behind the back of the DAO: not seen until the next warm up
+        self.db.ExecuteQueryNoResult(
+            """INSERT INTO log VALUES (?, ?, ?, ?)""",
+            [8, "2999-01-01 00:00:00.000000", EventId.IRRIGATION_START.value, "new"],
+        )
+        self.assertEqual(
+            PersistentLogDAO.get_last_event_date(8, EventId.IRRIGATION_START), started
+        )
+        self.assertIsNone(PersistentLogDAO.get_last_event_date(9, EventId.LOG_IN))
+
+    def test_recent_logs_from_memory(self):
+        """
+        Test that the recent logs are loaded once and then follow add_log.
+        """
+        PersistentLogDAO.add_log(Log(10, None, EventId.IRRIGATION_START, "started"))
+        PersistentLogDAO.warm_recent_logs()
+        PersistentLogDAO.add_log(Log(10, None, EventId.IRRIGATION_STOP, "stopped"))
+        self.db.ExecuteQueryNoResult("""DELETE FROM log WHERE zone_id = 10""")
+        self.assertEqual(
+            [log.log for log in PersistentLogDAO.get_recent_logs(zone_id=10)],
+            ["stopped", "started"],
+        )
+        self.assertEqual(
+            PersistentLogDAO.get_recent_logs(
+                zone_id=10, event_id=EventId.IRRIGATION_START, within_seconds=60
+            )[0].log,
+            "started",
+        )
+
+    def test_logs_page(self):
+        """
+        Test that pages follow each other without gaps or repeats, entries of
+        the same date included, and that the last one has no cursor.
+        """
+        self.db.ExecuteManyNoResult(
+            """INSERT INTO log VALUES (?, ?, ?, ?)""",
+            [
+                (11, f"2024-07-01 06:00:0{second // 2}.000000", 1, f"{second}")
+                for second in range(7)
+            ]
+            + [(12, "2024-07-01 06:00:00.000000", 1, "other zone")],
+        )
+        descriptions = []
+        cursor = None
+        for _ in range(4):
+            logs, cursor = PersistentLogDAO.get_logs_page(
+                zone_id=11, cursor=cursor, page_size=2
+            )
+            descriptions.extend(log.log for log in logs)
+            if cursor is None:
+                break
+        self.assertIsNone(cursor)
+        self.assertEqual(descriptions, ["6", "5", "4", "3", "2", "1", "0"])
+        logs, cursor = PersistentLogDAO.get_logs_page(
+            zone_id=11, event_id=EventId.IRRIGATION_STOP
+        )
+        self.assertEqual((logs, cursor), ([], None))
+
+    def test_upgrade_adds_indexes_to_existing_databases(self):
+        """
+        Test that UpgradeDb creates the missing indexes.
+        """
+        self.db.ExecuteQueryNoResult("""DROP INDEX log_zone_event_date""")
+        self.db.UpgradeDb()
+        indexes = self.db.ExecuteQuery(
+            """SELECT name FROM sqlite_master WHERE type = 'index'"""
+        )
+        self.assertIn(("log_zone_event_date",), indexes)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,110 @@
+"""
+Unit tests for PersistentLogWriter: verifies batching, flushing and overflow
+of the write-behind log queue.
+"""
+
+import datetime
+import threading
+import unittest
+from backend.db.SqlLite import SqlLite
+from backend.dao.persistent_log_dao import PersistentLogDAO
+from backend.dao.persistent_log_writer import LogDurability, PersistentLogWriter
+from backend.datatype.log import Log, EventId
+
+
+def _log(zone_id):
+    return Log(zone_id, datetime.datetime.now(), EventId.IRRIGATION_START, "opened")
+
+
+class TestPersistentLogWriter(unittest.TestCase):
+    """
+    Test suite for PersistentLogWriter.
+    """
+
+    db = None
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Set up the test database before running tests.
+        """
+        cls.db = SqlLite.get_instance()
+        cls.db.CreateDb()
+
+    @classmethod
+    def tearDownClass(cls):
+        """
+        Remove the test database after running tests.
+        """
+        PersistentLogDAO.stop_writer()
+        cls.db.RemoveDb()
+
+    def test_entries_are_written_in_batches(self):
+        """
+        Test that queued entries reach write_batch grouped and in order.
+        """
+        batches = []
+        writer = PersistentLogWriter(
+            batches.append, LogDurability.DEFERRED, max_batch_size=4
+        )
+        for zone_id in range(10):
+            writer.enqueue(_log(zone_id))
+        writer.start()
+        self.assertTrue(writer.flush(5))
+        writer.stop(5)
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 2])
+        self.assertEqual(
+            [log.zone_id for batch in batches for log in batch], list(range(10))
+        )
+        self.assertEqual(writer.written, 10)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """
+        Test that enqueue never blocks when the writer cannot keep up.
+        """
+        release = threading.Event()
+        writer = PersistentLogWriter(
+            lambda batch: release.wait(5), max_queue_size=2, max_batch_size=1
+        )
+        results = [writer.enqueue(_log(zone_id)) for zone_id in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(writer.dropped, 1)
+        writer.start()
+        release.set()
+        writer.stop(5)
+
+    def test_flush_of_a_stalled_writer_times_out(self):
+        """
+        Test that flush gives up after its timeout, also when the queue is
+        full, instead of blocking.
+        """
+        release = threading.Event()
+        writer = PersistentLogWriter(
+            lambda batch: release.wait(5), max_queue_size=1, max_batch_size=1
+        )
+        writer.start()
+        self.addCleanup(writer.stop, 5)
+        self.addCleanup(release.set)
+        writer.enqueue(_log(1))
+        self.assertFalse(writer.flush(0.05))
+        # The writer is stuck and the queue is full
+        self.assertFalse(writer.flush(0.05))
+        release.set()
+        self.assertTrue(writer.flush(5))
+
+    def test_dao_reads_its_own_queued_writes(self):
+        """
+        Test that get_logs sees entries still queued in the writer.
+        """
+        PersistentLogDAO.start_writer(LogDurability.DEFERRED, flush_interval=60)
+        PersistentLogDAO.add_log(
+            Log(7, None, EventId.IRRIGATION_STOP, "Irrigation ended")
+        )
+        logs = PersistentLogDAO.get_logs(7)
+        PersistentLogDAO.stop_writer()
+        self.assertEqual(len(logs), 1)
+        self.assertEqual(logs[0].event_id, EventId.IRRIGATION_STOP)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Unit tests for RecentLogBuffer: verifies the ring replacement and the
+filters of the queries.
+"""
+
+import datetime
+import time
+import unittest
+from backend.dao.recent_log_buffer import RecentLogBuffer
+from backend.datatype.log import EventId, Log
+
+_START = datetime.datetime(2024, 6, 1, 6, 0, 0)
+
+
+def _log(zone_id, minutes, event_id=EventId.IRRIGATION_START):
+    return Log(
+        zone_id, _START + datetime.timedelta(minutes=minutes), event_id, f"{minutes}"
+    )
+
+
+class TestRecentLogBuffer(unittest.TestCase):
+    """
+    Test suite for RecentLogBuffer.
+    """
+
+    def test_keeps_the_last_entries(self):
+        """
+        Test that the oldest entries are replaced once the buffer is full.
+        """
+        buffer = RecentLogBuffer(capacity=3)
+        for minutes in range(5):
+            buffer.append(_log(1, minutes))
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual([log.log for log in buffer.query()], ["4", "3", "2"])
+        self.assertEqual(buffer.query(limit=1), [_log(1, 4)])
+
+    def test_filters(self):
+        """
+        Test that the zone, event and date filters are combined.
+        """
+        buffer = RecentLogBuffer()
+        buffer.append(_log(1, 0))
+        buffer.append(_log(2, 1))
+        buffer.append(_log(1, 2, EventId.IRRIGATION_STOP))
+        buffer.append(_log(None, 3, EventId.GENERAL))
+        self.assertEqual(
+            buffer.query(zone_id=1), [_log(1, 2, EventId.IRRIGATION_STOP), _log(1, 0)]
+        )
+        self.assertEqual(
+            buffer.query(event_id=EventId.IRRIGATION_START), [_log(2, 1), _log(1, 0)]
+        )
+        self.assertEqual(
+            buffer.query(
+                since=_START + datetime.timedelta(minutes=1),
+                until=_START + datetime.timedelta(minutes=3),
+            ),
+            [_log(1, 2, EventId.IRRIGATION_STOP), _log(2, 1)],
+        )
+        self.assertEqual(buffer.query(event_id=EventId.GENERAL)[0].zone_id, None)
+
+    def test_monotonic_window(self):
+        """
+        Test that within_seconds selects by the monotonic time of appending.
+        """
+        buffer = RecentLogBuffer()
+        buffer.append(_log(1, 0), monotonic_ns=time.monotonic_ns() - 10_000_000_000)
+        buffer.append(_log(1, 1))
+        self.assertEqual(buffer.query(within_seconds=5), [_log(1, 1)])
+
+    def test_warm_replaces_the_entries(self):
+        """
+        Test that warming keeps the last capacity logs of the query.
+        """
+        buffer = RecentLogBuffer(capacity=2)
+        buffer.append(_log(9, 0))
+        buffer.warm(3, lambda: [_log(1, 0), _log(1, 1), _log(1, 2)])
+        self.assertEqual(buffer.generation, 3)
+        self.assertEqual(buffer.query(), [_log(1, 2), _log(1, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -101,6 +101,72 @@ class TestZoneDAO(unittest.TestCase):
             irrigator.irrigation_info[0].time_to_start, datetime.time(11, 30, 00, 00)
         )
 
+    def test_get_zones_by_ids(self):
+        """
+        Test bulk loading of a list of zones, with and without irrigation info.
+        """
+        print("==== test get zones by ids =====")
+        zone_with_info = Zone("bulk1", 6)
+        zone_with_info.irrigation_info.append(
+            IrrigationInfo(datetime.time(6, 0, 0, 0), 60)
+        )
+        zone_with_info.irrigation_info.append(
+            IrrigationInfo(datetime.time(18, 0, 0, 0), 90)
+        )
+        zone_without_info = Zone("bulk2", 7)
+        ZoneDAO.add_new_irrigator(zone_with_info)
+        ZoneDAO.add_new_irrigator(zone_without_info)
+        zones = ZoneDAO.get_zones_by_ids(
+            [zone_without_info.id, zone_with_info.id, 9999]
+        )
+        self.assertEqual(zones, [zone_with_info, zone_without_info])
+        self.assertEqual(zones[0].irrigation_info[1].for_how_many_seconds, 90)
+        self.assertIsNone(ZoneDAO.get_zone_by_id(9999))
+        all_zones = ZoneDAO.get_zone_by_id()
+        self.assertIn(zone_with_info, all_zones)
+        self.assertIn(zone_without_info, all_zones)
+
+    def test_import_zones(self):
+        """
+        Test bulk import of zones with irrigation info and per-zone results.
+        """
+        print("==== test import zones =====")
+        zones = []
+        for index in range(50):
+            zone = Zone(f"imported{index}", 10 + index)
+            zone.irrigation_info.append(IrrigationInfo(datetime.time(6, 0, 0, 0), 60))
+            zone.irrigation_info.append(IrrigationInfo(datetime.time(18, 0, 0, 0), 90))
+            zones.append(zone)
+        invalid_zone = Zone("", 9)
+        results = ZoneDAO.import_zones(zones[:25] + [invalid_zone] + zones[25:])
+        self.assertEqual(len(results), 51)
+        self.assertFalse(results[25].imported)
+        self.assertEqual(results[25].error, "missing zone name")
+        self.assertEqual(invalid_zone.id, -1)
+        self.assertTrue(all(result.imported for result in results[:25]))
+        ids = [zone.id for zone in zones]
+        self.assertEqual(len(set(ids)), 50)
+        self.assertEqual(ZoneDAO.get_zones_by_ids(ids), zones)
+        schedule_ids = [info.id for zone in zones for info in zone.irrigation_info]
+        self.assertEqual(len(set(schedule_ids)), 100)
+
+    def test_deleted_ids_are_not_reused(self):
+        """
+        Test that a new zone never gets the id of a deleted zone.
+        """
+        print("==== test deleted ids are not reused =====")
+        first = Zone("first", 20)
+        ZoneDAO.add_new_irrigator(first)
+        SqlLite.get_instance().ExecuteQueryNoResult(
+            """DELETE FROM zone WHERE id = ?""", [first.id]
+        )
+        second = Zone("second", 21)
+        ZoneDAO.add_new_irrigator(second)
+        self.assertGreater(second.id, first.id)
+        other_zone = Zone("third", 22)
+        ZoneDAO.import_zones([other_zone])
+        self.assertEqual(other_zone.id, second.id + 1)
+
 
 if __name__ == "__main__":
     unittest.main()
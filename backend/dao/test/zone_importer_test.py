@@ -0,0 +1,103 @@
+"""
+Unit tests for the zone importer: verifies reading zones from CSV and
+JSON Lines files and importing them with per-line results.
+"""
+
+import datetime
+import unittest
+from backend.db.SqlLite import SqlLite
+from backend.dao.zone_dao import ZoneDAO
+from backend.dao.zone_importer import import_zones, read_zones_csv, read_zones_jsonl
+
+
+class TestZoneImporter(unittest.TestCase):
+    """
+    Test suite for the CSV and JSON Lines zone importer.
+    """
+
+    db = None
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Set up the test database before running tests.
+        """
+        cls.db = SqlLite.get_instance()
+        cls.db.CreateDb()
+
+    @classmethod
+    def tearDownClass(cls):
+        """
+        Remove the test database after running tests.
+        """
+        cls.db.RemoveDb()
+
+    def test_import_csv(self):
+        """
+        Test that consecutive CSV rows of a zone are grouped and bad rows reported.
+        """
+        lines = [
+            "name,gpio_pin,time_to_start,for_how_many_seconds\n",
+            "Orto,5,05:00:00,120\n",
+            "Orto,5,21:00:00,60\n",
+            "Prato,6,not a time,60\n",
+            "Siepe,7,,\n",
+        ]
+        results = import_zones(read_zones_csv(lines), chunk_size=1)
+        self.assertEqual([result.line for result in results], [2, 4, 5])
+        self.assertEqual([result.imported for result in results], [True, False, True])
+        orto = ZoneDAO.get_zone_by_id(results[0].zone.id)
+        self.assertEqual(orto.name, "Orto")
+        self.assertEqual(
+            [info.time_to_start for info in orto.irrigation_info],
+            [datetime.time(5, 0, 0), datetime.time(21, 0, 0)],
+        )
+        self.assertEqual(ZoneDAO.get_zone_by_id(results[2].zone.id).irrigation_info, [])
+
+    def test_import_csv_without_header(self):
+        """
+        Test that a CSV file without the expected columns is rejected.
+        """
+        results = import_zones(read_zones_csv(["Orto,5,05:00:00,120\n"]))
+        self.assertEqual(len(results), 1)
+        self.assertFalse(results[0].imported)
+
+    def test_import_jsonl(self):
+        """
+        Test importing zones from JSON Lines, including a malformed line.
+        """
+        lines = [
+            '{"name": "Aiuola", "gpio_pin": 8, "irrigation_info": '
+            '[{"time_to_start": "06:30:00", "for_how_many_seconds": 45}]}\n',
+            "\n",
+            '{"name": "Vasi"}\n',
+            '{"name": "Serra", "gpio_pin": 9}\n',
+        ]
+        results = import_zones(read_zones_jsonl(lines))
+        self.assertEqual([result.line for result in results], [1, 3, 4])
+        self.assertFalse(results[1].imported)
+        aiuola = ZoneDAO.get_zone_by_id(results[0].zone.id)
+        self.assertEqual(aiuola.irrigation_info[0].for_how_many_seconds, 45)
+        self.assertEqual(results[2].serialize()["name"], "Serra")
+
+    def test_rolled_back_import_sets_no_ids(self):
+        """
+        Test that zones imported in a transaction that is rolled back keep
+        id -1 and are not in the database.
+        """
+        lines = ["name,gpio_pin,time_to_start,for_how_many_seconds\n"]
+        lines += [f"Rolled{index},{20 + index},05:00:00,60\n" for index in range(3)]
+        with self.assertRaises(RuntimeError):
+            with self.db.Transaction():
+                results = import_zones(read_zones_csv(lines), chunk_size=2)
+                raise RuntimeError("abort")
+        self.assertEqual([result.zone.id for result in results], [-1, -1, -1])
+        self.assertEqual(
+            [info.id for result in results for info in result.zone.irrigation_info],
+            [-1, -1, -1],
+        )
+        self.assertNotIn("Rolled0", [zone.name for zone in ZoneDAO.get_zone_by_id()])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,10 +2,74 @@
 This module provides the ZoneDAO class for managing zone records in the database.
 """
 
+import datetime
+import logging
 from backend.datatype.zone import Zone
+from backend.datatype.irrigation_info import IrrigationInfo
 from backend.db.SqlLite import SqlLite
 from backend.dao.irrigation_info_dao import IrrigationInfoDAO
 
+_SELECT_ZONES_WITH_SCHEDULES = """SELECT zone.id, zone.name, zone.gpio_pin,
+    scheduler.id, scheduler.sheduled_time, scheduler.for_how_many_seconds
+    FROM zone LEFT JOIN scheduler ON scheduler.zone_id = zone.id"""
+_ORDER_ZONES_WITH_SCHEDULES = """ ORDER BY zone.id, scheduler.rowid"""
+# Stay well below the SQLite limit of host parameters per statement
+_MAX_IDS_PER_QUERY = 500
+_INSERT_ZONE = """INSERT INTO zone (name, gpio_pin, last_irrigation_time)
+    VALUES (?, ?, ?)"""
+_INSERT_SCHEDULE = """INSERT INTO scheduler
+    (zone_id, sheduled_time, for_how_many_seconds) VALUES (?, ?, ?)"""
+
+
+class ZoneImportResult:
+    """
+    Outcome of the import of one zone: the imported zone, with its ids set,
+    or the reason why it has been rejected.
+    """
+
+    def __init__(self, zone: Zone = None, error: str = None, line: int = None):
+        self.zone = zone
+        self.error = error
+        self.line = line
+
+    @property
+    def imported(self):
+        """True if the zone has been written to the database."""
+        return self.error is None
+
+    def serialize(self):
+        """
+        Serializes the result into a dictionary format for reports.
+        """
+        return {
+            "line": self.line,
+            "zone_id": self.zone.id if self.zone is not None else None,
+            "name": self.zone.name if self.zone is not None else None,
+            "imported": self.imported,
+            "error": self.error,
+        }
+
+
+def _validate_zone(zone):
+    """
+    Returns why a zone cannot be imported, or None if it can.
+    """
+    if not isinstance(zone, Zone):
+        return f"not a zone: {zone!r}"
+    if zone.id != -1:
+        return f"zone already has id {zone.id}"
+    if not isinstance(zone.name, str) or not zone.name.strip():
+        return "missing zone name"
+    if not isinstance(zone.gpio_pin, int) or zone.gpio_pin < 0:
+        return f"invalid gpio pin {zone.gpio_pin!r}"
+    for irrigation_info in zone.irrigation_info:
+        if not isinstance(irrigation_info.time_to_start, datetime.time):
+            return f"invalid start time {irrigation_info.time_to_start!r}"
+        seconds = irrigation_info.for_how_many_seconds
+        if not isinstance(seconds, int) or seconds <= 0:
+            return f"invalid duration {seconds!r}"
+    return None
+
 
 class ZoneDAO:
     """
@@ -20,59 +84,168 @@ class ZoneDAO:
         """
         SqlLite.get_instance().ExecuteQueryNoResult(""" DELETE FROM zone """)
 
+    @staticmethod
+    def _build_zones(rows):
+        """
+        Build the Zone/IrrigationInfo graph from zone LEFT JOIN scheduler rows.
+        Args:
+            rows (list[tuple]): Rows ordered by zone, as selected by
+                _SELECT_ZONES_WITH_SCHEDULES.
+        Returns:
+            list[Zone]: One zone per distinct zone id, in row order.
+        """
+        zones = {}
+        parsed_times = {}
+        for zone_id, name, gpio_pin, info_id, scheduled_time, seconds in rows:
+            if zone_id not in zones:
+                zones[zone_id] = (name, gpio_pin, [])
+            if info_id is None:
+                continue
+            time_to_start = parsed_times.get(scheduled_time)
+            if time_to_start is None:
+                time_to_start = datetime.time.fromisoformat(scheduled_time)
+                parsed_times[scheduled_time] = time_to_start
+            irrigation_info = IrrigationInfo(time_to_start, seconds)
+            irrigation_info.id = info_id
+            zones[zone_id][2].append(irrigation_info)
+        returned_zone = []
+        for zone_id, (name, gpio_pin, irrigation_info) in zones.items():
+            zone = Zone(name, gpio_pin, irrigation_info)
+            zone.set_id(zone_id)
+            returned_zone.append(zone)
+        return returned_zone
+
     @staticmethod
     def get_zone_by_id(zone_id=None):
         """
-        Retrieve one or all zone records from the database.
+        Retrieve one or all zone records, with their irrigation info, in one query.
         Args:
-            zone_id (int, optional): The ID of the zone to retrieve. If None, retrieves all zones.
+            zone_id (int, optional): The ID of the zone to retrieve. If None,
+                retrieves all zones.
         Returns:
             Zone or list[Zone] or None: The zone(s) matching the query.
         """
         if zone_id is None:
-            rows = SqlLite.get_instance().ExecuteQuery("""SELECT * FROM zone""")
-            returned_zone = []
-            for data in rows:
-                print("got data: ", data)
-                zone = Zone(
-                    data[1], data[2], IrrigationInfoDAO.get_irrigation_info(data[0])
+            return ZoneDAO._build_zones(
+                SqlLite.get_instance().ExecuteQuery(
+                    _SELECT_ZONES_WITH_SCHEDULES + _ORDER_ZONES_WITH_SCHEDULES
                 )
-                print("got zone: ", zone)
-                zone.set_id(data[0])
-                returned_zone.append(zone)
-            return returned_zone
-        data = SqlLite.get_instance().ExecuteQuery(
-            """SELECT * FROM zone where id = ?""", [zone_id]
-        )
-        if data is not None:
-            zone = Zone(
-                data[0][1], data[0][2], IrrigationInfoDAO.get_irrigation_info(zone_id)
             )
-            zone.set_id(data[0][0])
-            return zone
+        zones = ZoneDAO.get_zones_by_ids([zone_id])
+        if len(zones) != 0:
+            return zones[0]
         return None
 
+    @staticmethod
+    def get_zones_by_ids(zone_ids):
+        """
+        Retrieve the zones with the given ids, with their irrigation info.
+        Args:
+            zone_ids (list[int]): The IDs of the zones to retrieve.
+        Returns:
+            list[Zone]: The zones found, ordered by id. Unknown ids are skipped.
+        """
+        zone_ids = list(zone_ids)
+        returned_zone = []
+        for start in range(0, len(zone_ids), _MAX_IDS_PER_QUERY):
+            chunk = zone_ids[start : start + _MAX_IDS_PER_QUERY]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = SqlLite.get_instance().ExecuteQuery(
+                _SELECT_ZONES_WITH_SCHEDULES
+                + f" WHERE zone.id IN ({placeholders})"
+                + _ORDER_ZONES_WITH_SCHEDULES,
+                chunk,
+            )
+            returned_zone.extend(ZoneDAO._build_zones(rows))
+        returned_zone.sort(key=lambda zone: zone.id)
+        return returned_zone
+
     @staticmethod
     def add_new_irrigator(zone: Zone):
         """
-        Add a new zone or update an existing zone in the database, and add related irrigation info.
+        Add a new zone or update an existing zone in the database, and add
+        related irrigation info.
         Args:
             zone (Zone): The zone object to add or update.
         """
-        if zone.id == -1:
-            num = SqlLite.get_instance().ExecuteQuery("""SELECT COUNT(*) FROM zone""")
-            new_zone_id = int(num[0][0]) + 1
-            zone.set_id(new_zone_id)
-            SqlLite.get_instance().ExecuteQueryNoResult(
-                """INSERT INTO zone VALUES (?, ?, ?, ?) """,
-                [zone.id, zone.name, zone.gpio_pin, None],
-            )
-        else:
-            SqlLite.get_instance().ExecuteQueryNoResult(
-                """UPDATE zone SET name=?, gpio_pin=?, last_irrigation_time=? WHERE id = ?""",
-                [zone.name, zone.gpio_pin, zone.last_irrigation_date, zone.id],
+        with SqlLite.get_instance().Transaction():
+            if zone.id == -1:
+                zone.set_id(
+                    SqlLite.get_instance().ExecuteInsert(
+                        """INSERT INTO zone (name, gpio_pin, last_irrigation_time)
+                        VALUES (?, ?, ?) """,
+                        [zone.name, zone.gpio_pin, None],
+                    )
+                )
+            else:
+                SqlLite.get_instance().ExecuteQueryNoResult(
+                    """UPDATE zone SET name=?, gpio_pin=?, last_irrigation_time=?
+                    WHERE id = ?""",
+                    [zone.name, zone.gpio_pin, zone.last_irrigation_date, zone.id],
+                )
+            logging.debug(
+                "Saved zone %s, %s on pin %s", zone.id, zone.name, zone.gpio_pin
             )
-        zone.print_zone()
-        for irrigation_info_element in zone.irrigation_info:
-            print(f"Adding irrigation info {irrigation_info_element} to zone {zone.id}")
-            IrrigationInfoDAO.add_new_irrigator_info(irrigation_info_element, zone.id)
+            for irrigation_info_element in zone.irrigation_info:
+                logging.debug(
+                    "Adding irrigation info %s to zone %s",
+                    irrigation_info_element,
+                    zone.id,
+                )
+                IrrigationInfoDAO.add_new_irrigator_info(
+                    irrigation_info_element, zone.id
+                )
+        zone.compile_schedule()
+
+    @staticmethod
+    def import_zones(zones):
+        """
+        Add many new zones, with their irrigation info, in one transaction.
+        Ids are assigned by the database and set on the zones once the
+        outermost transaction commits; invalid zones are reported and skipped.
+        Args:
+            zones (Iterable[Zone]): New zones, with id -1.
+        Returns:
+            list[ZoneImportResult]: One result per zone, in input order.
+        """
+        results = []
+        valid = []
+        for zone in zones:
+            error = _validate_zone(zone)
+            results.append(ZoneImportResult(zone, error))
+            if error is None:
+                valid.append(zone)
+        if not valid:
+            return results
+        db = SqlLite.get_instance()
+        zone_ids = []
+        schedule_ids = []
+        with db.Transaction():
+            for zone in valid:
+                zone_id = db.ExecuteInsert(
+                    _INSERT_ZONE, [zone.name, zone.gpio_pin, None]
+                )
+                zone_ids.append(zone_id)
+                for irrigation_info in zone.irrigation_info:
+                    schedule_ids.append(
+                        db.ExecuteInsert(
+                            _INSERT_SCHEDULE,
+                            [
+                                zone_id,
+                                irrigation_info.time_to_start.strftime("%H:%M:%S"),
+                                irrigation_info.for_how_many_seconds,
+                            ],
+                        )
+                    )
+
+            def set_ids():
+                schedule_id = iter(schedule_ids)
+                for zone, zone_id in zip(valid, zone_ids, strict=True):
+                    zone.set_id(zone_id)
+                    for irrigation_info in zone.irrigation_info:
+                        irrigation_info.id = next(schedule_id)
+                    zone.compile_schedule()
+
+            # Not before: an enclosing transaction may still roll the rows back
+            db.OnCommit(set_ids)
+        return results
@@ -0,0 +1,165 @@
+"""
+This module provides readers that stream zones and their irrigation info out
+of CSV or JSON Lines files, and import_zone_file that writes them to the
+database in one transaction through ZoneDAO.import_zones.
+
+CSV files need a header with the columns name, gpio_pin, time_to_start and
+for_how_many_seconds; consecutive rows with the same name and gpio_pin add
+irrigation info to the same zone, a row with an empty time_to_start adds a
+zone without irrigation info. JSON Lines files hold one zone per line:
+{"name": "Zona 1", "gpio_pin": 37,
+ "irrigation_info": [{"time_to_start": "05:00:00", "for_how_many_seconds": 120}]}
+"""
+
+import csv
+import datetime
+import json
+from backend.dao.zone_dao import ZoneDAO, ZoneImportResult
+from backend.datatype.irrigation_info import IrrigationInfo
+from backend.datatype.zone import Zone
+from backend.db.SqlLite import SqlLite
+
+_CSV_COLUMNS = ("name", "gpio_pin", "time_to_start", "for_how_many_seconds")
+
+
+def _irrigation_info(time_to_start, for_how_many_seconds):
+    return IrrigationInfo(
+        datetime.time.fromisoformat(str(time_to_start).strip()),
+        int(for_how_many_seconds),
+    )
+
+
+def read_zones_csv(lines):
+    """
+    Streams the zones of a CSV file.
+    Args:
+        lines (Iterable[str]): The lines of the file, header included.
+    Returns:
+        Iterator[tuple[int, Zone | str]]: The line where each zone starts and
+            the zone, or the error that prevented reading it.
+    """
+    reader = csv.DictReader(lines)
+    missing = [
+        column for column in _CSV_COLUMNS if column not in (reader.fieldnames or [])
+    ]
+    if missing:
+        yield 1, f"missing columns {', '.join(missing)}"
+        return
+    zone = None
+    zone_line = None
+    key = None
+    # Reported after the zone being read, to keep them in line order
+    errors = []
+    for row in reader:
+        line = reader.line_num
+        try:
+            row_key = (row["name"].strip(), int(row["gpio_pin"]))
+            if row["time_to_start"] and row["time_to_start"].strip():
+                irrigation_info = _irrigation_info(
+                    row["time_to_start"], row["for_how_many_seconds"]
+                )
+            else:
+                irrigation_info = None
+        except (AttributeError, TypeError, ValueError) as ex:
+            errors.append((line, f"invalid row: {ex}"))
+            continue
+        if zone is None or row_key != key:
+            if zone is not None:
+                yield zone_line, zone
+            yield from errors
+            errors.clear()
+            zone = Zone(row_key[0], row_key[1])
+            zone_line = line
+            key = row_key
+        if irrigation_info is not None:
+            zone.irrigation_info.append(irrigation_info)
+    if zone is not None:
+        yield zone_line, zone
+    yield from errors
+
+
+def read_zones_jsonl(lines):
+    """
+    Streams the zones of a JSON Lines file.
+    Args:
+        lines (Iterable[str]): The lines of the file.
+    Returns:
+        Iterator[tuple[int, Zone | str]]: The line of each zone and the zone,
+            or the error that prevented reading it.
+    """
+    for line, text in enumerate(lines, start=1):
+        if not text.strip():
+            continue
+        try:
+            data = json.loads(text)
+            zone = Zone(
+                data["name"],
+                int(data["gpio_pin"]),
+                [
+                    _irrigation_info(
+                        info["time_to_start"], info["for_how_many_seconds"]
+                    )
+                    for info in data.get("irrigation_info", [])
+                ],
+            )
+        except (KeyError, TypeError, ValueError) as ex:
+            yield line, f"invalid zone: {ex!r}"
+            continue
+        yield line, zone
+
+
+def import_zones(entries, chunk_size: int = 500):
+    """
+    Imports the zones read by read_zones_csv or read_zones_jsonl in one
+    transaction, writing them chunk_size zones at a time.
+    Args:
+        entries (Iterable[tuple[int, Zone | str]]): The zones to import.
+        chunk_size (int): Zones kept in memory before writing them.
+    Returns:
+        list[ZoneImportResult]: One result per zone or unreadable entry.
+    """
+    results = []
+    chunk = []
+
+    def write_chunk():
+        # Unreadable entries stay in the chunk to keep results in file order
+        imported = iter(
+            ZoneDAO.import_zones(
+                entry for _, entry in chunk if not isinstance(entry, str)
+            )
+        )
+        for line, entry in chunk:
+            if isinstance(entry, str):
+                result = ZoneImportResult(error=entry)
+            else:
+                result = next(imported)
+            result.line = line
+            results.append(result)
+        chunk.clear()
+
+    with SqlLite.get_instance().Transaction():
+        for entry in entries:
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                write_chunk()
+        write_chunk()
+    return results
+
+
+def import_zone_file(path: str, chunk_size: int = 500):
+    """
+    Imports a .csv or .jsonl file of zones in one transaction.
+    Args:
+        path (str): The file to import, its extension selects the format.
+        chunk_size (int): Zones kept in memory before writing them.
+    Returns:
+        list[ZoneImportResult]: One result per zone or unreadable entry.
+    """
+    if path.endswith(".csv"):
+        reader = read_zones_csv
+    elif path.endswith((".jsonl", ".ndjson")):
+        reader = read_zones_jsonl
+    else:
+        raise ValueError(f"Unknown zone file format: {path}")
+    with open(path, newline="", encoding="utf-8") as file:
+        return import_zones(reader(file), chunk_size)
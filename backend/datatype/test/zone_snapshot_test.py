@@ -0,0 +1,84 @@
+"""Unit tests for the zone snapshot encoding."""
+
+import unittest
+import datetime
+
+from backend.datatype import zone_snapshot
+from backend.datatype.zone import Zone
+from backend.datatype.irrigation_info import IrrigationInfo
+from backend.db.SqlLite import SqlLite
+
+
+def _is_plain(value):
+    """Return True if value is made only of tuples and immutable scalars."""
+    if isinstance(value, tuple):
+        return all(_is_plain(item) for item in value)
+    return value is None or isinstance(value, (bool, int, float, str))
+
+
+class TestZoneSnapshot(unittest.TestCase):
+    """Test cases for encoding and decoding zone snapshots."""
+
+    db = None
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up the database read for the last irrigation date."""
+        cls.db = SqlLite.get_instance()
+        cls.db.CreateDb()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Tear down the database."""
+        cls.db.RemoveDb()
+
+    def _zone(self):
+        """Return a zone with two irrigation infos."""
+        zone = Zone(
+            "snapshot",
+            12,
+            [
+                IrrigationInfo(datetime.time(6, 30, 0), 60, [0, 2, 4]),
+                IrrigationInfo(datetime.time(20, 0, 0), 90),
+            ],
+        )
+        zone.set_id(3)
+        zone.irrigation_info[0].id = 7
+        return zone
+
+    def test_snapshot_is_made_of_plain_values(self):
+        """Test that the snapshot contains nothing rpyc would send by reference."""
+        snapshot = zone_snapshot.encode_snapshot([self._zone(), self._zone()])
+        self.assertTrue(_is_plain(snapshot))
+        self.assertEqual(snapshot[0], zone_snapshot.SNAPSHOT_VERSION)
+        self.assertEqual(len(snapshot[1]), 2)
+
+    def test_round_trip(self):
+        """Test that decoding a snapshot gives back the zone fields."""
+        zone = self._zone()
+        zone.override_open(True)
+        (encoded,) = zone_snapshot.decode_snapshot(
+            zone_snapshot.encode_snapshot([zone], with_last_irrigation_date=True)
+        )
+        self.assertEqual(encoded[zone_snapshot.ZONE_ID], 3)
+        self.assertEqual(encoded[zone_snapshot.ZONE_NAME], "snapshot")
+        self.assertTrue(encoded[zone_snapshot.ZONE_IS_OPEN])
+        self.assertTrue(encoded[zone_snapshot.ZONE_IS_OVERRIDE])
+        self.assertIsNotNone(encoded[zone_snapshot.ZONE_LAST_IRRIGATION_DATE])
+        irrigation_info = [
+            zone_snapshot.decode_irrigation_info(info)
+            for info in encoded[zone_snapshot.ZONE_IRRIGATION_INFO]
+        ]
+        self.assertEqual(irrigation_info, zone.irrigation_info)
+        self.assertEqual(irrigation_info[0].id, 7)
+        self.assertEqual(irrigation_info[1].for_how_many_seconds, 90)
+        zone.override_open(False)
+
+    def test_unknown_version_is_rejected(self):
+        """Test that a snapshot of another version is not misread."""
+        with self.assertRaises(ValueError):
+            zone_snapshot.decode_snapshot((zone_snapshot.SNAPSHOT_VERSION + 1, ()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,7 @@ import datetime
 from backend.datatype.zone import Zone
 from backend.datatype.irrigation_info import IrrigationInfo
 from backend.db.SqlLite import SqlLite
+from backend.scheduling.deadline_queue import DeadlineKind
 
 
 class TestZone(unittest.TestCase):
@@ -73,7 +74,7 @@ class TestZone(unittest.TestCase):
         zone.check_if_need_to_close(now.time())
         self.assertEqual(zone.is_open(), True)
         now = now + datetime.timedelta(minutes=1, seconds=1)
-        zone.check_emergency_closing(now.time())
+        zone.check_emergency_closing(now)
         self.assertEqual(zone.is_open(), False)
 
     def test_try_to_open_zone_with_right_time_but_wrong_day_then_zone_is_closed(self):
@@ -123,6 +124,86 @@ class TestZone(unittest.TestCase):
         zone.override_open()
         self.assertEqual(zone.is_open(), False)
 
+    def test_later_schedule_of_the_day_opens_the_zone(self):
+        """Test that a passed schedule does not hide the next one of the day."""
+        irrigation_info = [
+            IrrigationInfo(datetime.time(5, 0, 0, 0), 120),
+            IrrigationInfo(datetime.time(13, 0, 0, 0), 120),
+        ]
+        zone = Zone("test", 1, irrigation_info)
+        zone.check_if_need_to_open(datetime.time(13, 0, 30, 0), 3)
+        self.assertEqual(zone.is_open(), True)
+        zone.check_if_need_to_close(datetime.time(13, 2, 1, 0))
+        self.assertEqual(zone.is_open(), False)
+
+    def test_closed_zone_next_deadline_is_next_schedule_start(self):
+        """Test that a closed zone reports the next allowed start as deadline."""
+        irrigation_info = [
+            IrrigationInfo(datetime.time(10, 20, 0, 0), 120, [2]),
+            IrrigationInfo(datetime.time(22, 20, 0, 0), 120, [0]),
+        ]
+        zone = Zone("test", 1, irrigation_info)
+        # Monday 23:00, next start is Wednesday 10:20
+        now = datetime.datetime(2025, 6, 2, 23, 0, 0)
+        self.assertEqual(
+            zone.get_next_deadlines(now),
+            [(datetime.datetime(2025, 6, 4, 10, 20, 0), DeadlineKind.OPEN)],
+        )
+
+    def test_open_zone_next_deadlines_are_close_and_emergency(self):
+        """Test that an open zone reports its close and emergency deadlines."""
+        irrigation_info = [IrrigationInfo(datetime.time(10, 20, 0, 0), 60)]
+        zone = Zone("test", 1, irrigation_info)
+        zone.check_if_need_to_open(datetime.time(10, 20, 1, 0), 3)
+        now = datetime.datetime(2025, 6, 5, 10, 20, 1)
+        self.assertEqual(
+            zone.get_next_deadlines(now),
+            [
+                (datetime.datetime(2025, 6, 5, 10, 21, 0), DeadlineKind.CLOSE),
+                (datetime.datetime(2025, 6, 5, 10, 22, 0), DeadlineKind.EMERGENCY),
+            ],
+        )
+        zone.override_close()
+        self.assertEqual(zone.get_next_deadlines(now), [])
+
+    def test_deadlines_of_a_window_across_midnight(self):
+        """
+        Test that a window opened before midnight closes after it, not a day
+        later.
+        """
+        zone = Zone("test", 1, [IrrigationInfo(datetime.time(23, 59, 0), 120)])
+        zone.check_if_need_to_open(datetime.time(23, 59, 1), 3)
+        now = datetime.datetime(2025, 6, 6, 0, 0, 30)
+        self.assertEqual(
+            zone.get_next_deadlines(now),
+            [
+                (datetime.datetime(2025, 6, 6, 0, 1, 0), DeadlineKind.CLOSE),
+                (datetime.datetime(2025, 6, 6, 0, 1, 0), DeadlineKind.EMERGENCY),
+            ],
+        )
+        zone.check_emergency_closing(now)
+        self.assertTrue(zone.is_open())
+        zone.check_emergency_closing(datetime.datetime(2025, 6, 6, 0, 1, 1))
+        self.assertFalse(zone.is_open())
+
+    def test_unchanged_status_logged_once(self):
+        """Test that ticks leaving the zone as it is log their reason only once."""
+        zone = Zone("test", 1)
+        with self.assertLogs("backend.datatype.zone", level="DEBUG") as logs:
+            for _ in range(3):
+                zone.check_if_need_to_close(datetime.time(10, 0, 0))
+                zone.check_emergency_closing(datetime.datetime(2025, 6, 6, 10))
+            zone.set_irrigation_info([IrrigationInfo(datetime.time(9, 0, 0), 60)])
+            zone.check_if_need_to_close(datetime.time(10, 0, 1))
+        self.assertEqual(
+            [record.getMessage() for record in logs.records],
+            [
+                "test - Already closed",
+                "test - Emergency closing, already closed",
+                "test - Already closed",
+            ],
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -3,10 +3,33 @@
 import datetime
 import logging
 import json
-from backend.datatype.irrigation_info import IrrigationInfo
+from enum import Enum
 from backend.dao.persistent_log_dao import PersistentLogDAO
 from backend.datatype.log import Log, EventId
 from backend.hw_io.gpio import PiGpio
+from backend.scheduling.deadline_queue import DeadlineKind
+from backend.scheduling.weekly_schedule import (
+    SECONDS_PER_DAY,
+    WeeklySchedule,
+    seconds_of_day,
+    seconds_of_week,
+)
+
+
+_logger = logging.getLogger(__name__)
+
+# Default of how long a zone may stay open before it is closed as an emergency
+MAX_OPEN_SECONDS = 120
+
+
+class ZoneEvent(Enum):
+    """State changes a Zone reports to its listeners."""
+
+    OPENED = 1
+    CLOSED = 2
+    OVERRIDE_CLOSED = 3
+    SCHEDULE_CHANGED = 4
+    EMERGENCY_CLOSED = 5
 
 
 # pylint: disable=too-many-instance-attributes
@@ -22,15 +45,19 @@ class Zone:
     _last_irrigation_date: datetime.time = None
     _is_override_open = False
     _is_override_close = False
-    _how_many_second_can_i_stay_open = 120
+    _how_many_second_can_i_stay_open = MAX_OPEN_SECONDS
     _logger = None
     _active_irrigation = None
+    _schedule = None
+    _state_listeners = None
+    # Last reason each check left the zone unchanged for, logged on change only
+    _last_status = None
 
     def __init__(
         self, name: str, gpio_pin: int, irrigation_info: list = None, zone_id: int = 0
     ):
         """Initialize a Zone instance."""
-        self._logger = logging.getLogger()
+        self._logger = _logger
         self.name = name
         self.gpio_pin = gpio_pin
         self.id = int(zone_id)
@@ -39,21 +66,44 @@ class Zone:
         else:
             self.irrigation_info = irrigation_info
         self.id = -1
+        self._state_listeners = []
+        self._last_status = {}
+        self.compile_schedule()
 
-    def _check_if_is_right_day_of_the_week_to_open(
-        self, irrigation_info: IrrigationInfo, current_day_of_the_week
-    ):
-        """Check if today is a valid day for irrigation."""
-        return current_day_of_the_week in irrigation_info.day_of_the_week
+    def add_state_listener(self, listener):
+        """Register a callable(zone, ZoneEvent) invoked after every state change."""
+        self._state_listeners.append(listener)
+
+    def remove_state_listener(self, listener):
+        """Unregister a listener added with add_state_listener."""
+        if listener in self._state_listeners:
+            self._state_listeners.remove(listener)
+
+    def _notify_state_listeners(self, event: ZoneEvent):
+        """Invoke every registered listener with the given event."""
+        self._last_status.clear()
+        for listener in self._state_listeners:
+            listener(self, event)
+
+    def compile_schedule(self):
+        """Rebuild the weekly schedule index, call it after editing irrigation info."""
+        self._schedule = WeeklySchedule(self.irrigation_info)
+        self._notify_state_listeners(ZoneEvent.SCHEDULE_CHANGED)
+
+    def set_irrigation_info(self, irrigation_info: list):
+        """Replace the irrigation info of the zone and recompile its schedule."""
+        self.irrigation_info = irrigation_info
+        self.compile_schedule()
+
+    def get_schedule(self):
+        """Return the compiled weekly schedule, rebuilding it if the list changed."""
+        if not self._schedule.is_compiled_from(self.irrigation_info):
+            self.compile_schedule()
+        return self._schedule
 
     def get_last_irrigation_date(self):
-        """Get the last irrigation start date from logs."""
-        logs = PersistentLogDAO.get_logs(
-            self.id, EventId.IRRIGATION_START, number_of_logs_to_get=1
-        )
-        if len(logs) != 0:
-            return logs[0].date_time
-        return None
+        """Get the last irrigation start date from the in-memory log index."""
+        return PersistentLogDAO.get_last_event_date(self.id, EventId.IRRIGATION_START)
 
     def print_zone(self):
         """Print zone information."""
@@ -62,12 +112,25 @@ class Zone:
             f"IrrigatorInfo: {self.irrigation_info}"
         )
 
-    def log_information(self, message, is_a_warning=False):
-        """Log zone information or warning."""
-        if is_a_warning:
-            logging.warning("%s - %s", self.name, message)
-        else:
-            logging.info("%s - %s", self.name, message)
+    def log_information(self, message, *args, is_a_warning=False):
+        """Log zone information or warning, formatted with args only if emitted."""
+        self._logger.log(
+            logging.WARNING if is_a_warning else logging.INFO,
+            "%s - " + message,
+            self.name,
+            *args,
+        )
+
+    def log_status(self, check, message, *args):
+        """
+        Log at debug level why check left the zone unchanged, only when the
+        reason differs from the one of the previous call since the last state
+        change, so that ticks doing nothing log nothing.
+        """
+        if self._last_status.get(check) == message:
+            return
+        self._last_status[check] = message
+        self._logger.debug("%s - " + message, self.name, *args)
 
     def set_id(self, zone_id):
         """Set the zone ID."""
@@ -80,7 +143,7 @@ class Zone:
     def _open_it(self):
         """Open the zone and log the event."""
         self._is_open = True
-        self.log_information(f"Open zone {self.name}")
+        self.log_information("Open zone")
         self._last_irrigation_date = datetime.datetime.now().time()
         PiGpio.instance().OpenPin(self.gpio_pin)
         PersistentLogDAO.add_log(
@@ -91,13 +154,14 @@ class Zone:
                 log=f"Zone {self.name} opened",
             )
         )
+        self._notify_state_listeners(ZoneEvent.OPENED)
 
     def _close_it(self):
         """Close the zone and log the event."""
         self._is_open = False
         self._is_override_open = False
         self._last_irrigation_date = None
-        self.log_information(f"Close zone {self.name}")
+        self.log_information("Close zone")
         PiGpio.instance().ClosePin(self.gpio_pin)
         PersistentLogDAO.add_log(
             Log(
@@ -107,15 +171,39 @@ class Zone:
                 log=f"Zone {self.name} closed",
             )
         )
+        self._notify_state_listeners(ZoneEvent.CLOSED)
+
+    def mark_closed(self):
+        """
+        Mark the zone closed after the caller has already closed its pin.
+        Return the log of the close for the caller to write, or None if the
+        zone was not open.
+        """
+        was_open = self._is_open
+        self._is_open = False
+        self._is_override_open = False
+        self._last_irrigation_date = None
+        if not was_open:
+            return None
+        self.log_information("Close zone")
+        self._notify_state_listeners(ZoneEvent.CLOSED)
+        return Log(
+            zone_id=self.id,
+            date_time=datetime.datetime.now(),
+            event_id=EventId.IRRIGATION_STOP,
+            log=f"Zone {self.name} closed",
+        )
 
     def override_open(self, is_override=True):
         """Override and open the zone, unless override close is active."""
         if self._is_override_close:
-            self.log_information("Override Open: cannot open since override close!")
+            self.log_information(
+                "Override Open: cannot open since override close!", is_a_warning=True
+            )
             return
         if is_override:
-            self._open_it()
             self._is_override_open = True
+            self._open_it()
         else:
             self._close_it()
 
@@ -123,6 +211,36 @@ class Zone:
         """Return True if override open is active."""
         return self._is_override_open
 
+    def is_override_close(self):
+        """Return True if override close is active."""
+        return self._is_override_close
+
+    def get_active_irrigation(self):
+        """Return the irrigation info that opened the zone, if any."""
+        return self._active_irrigation
+
+    def get_max_open_seconds(self):
+        """Return how many seconds the zone may stay open before an emergency close."""
+        return self._how_many_second_can_i_stay_open
+
+    def get_open_time(self):
+        """Return the time of day the emergency timeout counts from."""
+        if self._is_override_open:
+            return self._last_irrigation_date
+        return self._active_irrigation.time_to_start
+
+    def get_open_datetime(self, now: datetime.datetime):
+        """
+        Return when the zone opened, at most a day before now: an open time
+        well after now is the one of a window started before midnight.
+        Open times just after now, as when the zone opened while now was
+        being taken, are today's.
+        """
+        opened = datetime.datetime.combine(now.date(), self.get_open_time())
+        if opened - now > datetime.timedelta(hours=12):
+            opened -= datetime.timedelta(days=1)
+        return opened
+
     def override_close(self):
         """Override and close the zone."""
         self._close_it()
@@ -130,86 +248,156 @@ class Zone:
         self._is_override_open = False
         self._last_irrigation_date = None
         self._is_override_close = True
+        self._notify_state_listeners(ZoneEvent.OVERRIDE_CLOSED)
+
+    def save_state(self):
+        """Return the state of the zone, to be given back to restore_state."""
+        return (
+            self._is_open,
+            self._is_override_open,
+            self._is_override_close,
+            self._active_irrigation,
+            self._last_irrigation_date,
+            self.irrigation_info,
+        )
+
+    def restore_state(self, state):
+        """
+        Put the zone, and its pin, back in a state returned by save_state,
+        without logging: the changes made since have been rolled back.
+        """
+        irrigation_info = state[5]
+        (
+            self._is_open,
+            self._is_override_open,
+            self._is_override_close,
+            self._active_irrigation,
+            self._last_irrigation_date,
+        ) = state[:5]
+        if self._is_open:
+            PiGpio.instance().OpenPin(self.gpio_pin)
+        else:
+            PiGpio.instance().ClosePin(self.gpio_pin)
+        if irrigation_info is not self.irrigation_info:
+            self.set_irrigation_info(irrigation_info)
+        if self._is_open:
+            self._notify_state_listeners(ZoneEvent.OPENED)
+        elif self._is_override_close:
+            self._notify_state_listeners(ZoneEvent.OVERRIDE_CLOSED)
+        else:
+            self._notify_state_listeners(ZoneEvent.CLOSED)
+
+    def open_for_schedule(self, irrigation):
+        """Open the zone for the given scheduled irrigation."""
+        self.log_information("Open command for timing")
+        self._active_irrigation = irrigation
+        self._open_it()
+
+    def close_for_schedule(self):
+        """Close the zone because its scheduled irrigation is over."""
+        self.log_information("Closing for timing")
+        self._close_it()
+
+    def emergency_close(self):
+        """Close the zone because it stayed open for too long."""
+        self.log_information("Emergency closing, need to close!", is_a_warning=True)
+        self._close_it()
+        self._notify_state_listeners(ZoneEvent.EMERGENCY_CLOSED)
 
     def check_if_need_to_open(
         self, current_time: datetime.time, current_day_of_the_week
     ):
         """Check if the zone needs to be opened based on schedule."""
         if self._is_open:
-            self.log_information("Already Open", True)
+            self.log_status("open", "Already open")
             return
         if self._is_override_close:
-            self.log_information("Closed by override", True)
+            self.log_status("open", "Closed by override")
             return
-        for irrigation in self.irrigation_info:
-            if self._check_if_is_right_day_of_the_week_to_open(
-                irrigation, current_day_of_the_week
-            ):
-                datetime_to_open = datetime.datetime.combine(
-                    datetime.date.today(), irrigation.time_to_start
-                )
-                time_to_close = (
-                    datetime_to_open
-                    + datetime.timedelta(seconds=irrigation.for_how_many_seconds)
-                ).time()
-                time_to_open = datetime_to_open.time()
-                if current_time > time_to_close:
-                    self.log_information("Too Late to open")
-                    return
-                if current_time < time_to_open:
-                    self.log_information("Too Early to open")
-                    return
-                if time_to_open < current_time < time_to_close:
-                    self.log_information("Open command for timing", False)
-                    self._open_it()
-                    self._active_irrigation = irrigation
+        active = self.get_schedule().find_active(
+            seconds_of_week(current_day_of_the_week, current_time)
+        )
+        if active is None:
+            self.log_status("open", "Nothing scheduled now")
+            return
+        self.open_for_schedule(active[0])
 
     def check_if_need_to_close(self, current_time):
         """Check if the zone needs to be closed based on schedule."""
         if not self._is_open:
-            self.log_information("Already Closed", True)
+            self.log_status("close", "Already closed")
             return
         if self._is_override_open:
-            self.log_information("Override, not my responsibility to close it", True)
+            self.log_status("close", "Override, not my responsibility to close it")
             return
-        datetime_to_close = datetime.datetime.combine(
-            datetime.date.today(), self._active_irrigation.time_to_start
-        ) + datetime.timedelta(seconds=self._active_irrigation.for_how_many_seconds)
-        time_to_close = datetime_to_close.time()
-        if current_time > time_to_close:
-            self.log_information("Closing for timing ", False)
-            self._close_it()
+        second_to_open = seconds_of_day(self._active_irrigation.time_to_start)
+        current_second = seconds_of_day(current_time)
+        if current_second < second_to_open:
+            # The irrigation started before midnight
+            current_second += SECONDS_PER_DAY
+        if (
+            current_second
+            > second_to_open + self._active_irrigation.for_how_many_seconds
+        ):
+            self.close_for_schedule()
 
-    def check_emergency_closing(self, current_time):
+    def check_emergency_closing(self, current_datetime: datetime.datetime):
         """Check if the zone needs to be closed due to emergency (open too long)."""
         if not self._is_open:
-            self.log_information("Emergency closing, already closed")
+            self.log_status("emergency", "Emergency closing, already closed")
             return
-        open_time: datetime = None
-        if self._is_override_open:
-            open_time = self._last_irrigation_date
-        else:
-            open_time = self._active_irrigation.time_to_start
-        if open_time is None:
+        if self.get_open_time() is None:
             self._close_it()
             return
-        current_datetime = datetime.datetime.combine(
-            datetime.date.today(), current_time
-        )
-        last_opened_datetime = datetime.datetime.combine(
-            datetime.date.today(), open_time
-        )
+        last_opened_datetime = self.get_open_datetime(current_datetime)
         if current_datetime - last_opened_datetime > datetime.timedelta(
             seconds=self._how_many_second_can_i_stay_open
         ):
-            self.log_information("Emergency closing, need to close!")
-            self._close_it()
+            self.emergency_close()
         else:
-            self.log_information(
-                "Emergency closing, number of seconds: %s",
+            self.log_status(
+                "emergency",
+                "Emergency closing, open for %s",
                 current_datetime - last_opened_datetime,
             )
 
+    def get_next_deadlines(self, now: datetime.datetime):
+        """Return the upcoming (datetime, DeadlineKind) transitions of the zone."""
+        if self._is_open:
+            if self.get_open_time() is None:
+                return [(now, DeadlineKind.EMERGENCY)]
+            # Anchored to the real opening, also when it was before midnight
+            opened = self.get_open_datetime(now)
+            deadlines = []
+            if not self._is_override_open:
+                deadlines.append(
+                    (
+                        opened
+                        + datetime.timedelta(
+                            seconds=self._active_irrigation.for_how_many_seconds
+                        ),
+                        DeadlineKind.CLOSE,
+                    )
+                )
+            deadlines.append(
+                (
+                    opened
+                    + datetime.timedelta(seconds=self._how_many_second_can_i_stay_open),
+                    DeadlineKind.EMERGENCY,
+                )
+            )
+            return deadlines
+        if self._is_override_close:
+            return []
+        schedule = self.get_schedule()
+        current_second = seconds_of_week(now.weekday(), now.time())
+        if schedule.find_active(current_second) is not None:
+            return [(now, DeadlineKind.OPEN)]
+        seconds_to_open = schedule.seconds_until_next_start(current_second)
+        if seconds_to_open is None:
+            return []
+        return [(now + datetime.timedelta(seconds=seconds_to_open), DeadlineKind.OPEN)]
+
     def to_json(self):
         """Return a JSON representation of the zone."""
         return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True, indent=4)
@@ -0,0 +1,138 @@
+"""
+Compact, versioned snapshot of zones for the RPC API.
+
+A snapshot is built only of tuples, strings, numbers, booleans and None, so
+rpyc sends it by value in one round trip instead of handing out netrefs whose
+every attribute read is another request.
+
+Layout of SNAPSHOT_VERSION 1:
+    (version, (zone, ...))
+    zone: (id, name, gpio_pin, is_open, is_override, last_irrigation_date,
+           (irrigation_info, ...))
+    irrigation_info: (id, "HH:MM:SS", for_how_many_seconds, (day, ...))
+last_irrigation_date is an ISO 8601 string, or None when unknown or not
+requested.
+
+State change events are published as
+    (event, zone_id, is_open, is_override, date_time)
+where event is the name of a ZoneEvent or of a change of the zone list, and
+zone_id, is_open and is_override are None for events not about one zone.
+
+Log entries are sent as
+    (zone_id, date_time, event, description)
+where date_time is an ISO 8601 string and event the name of an EventId.
+"""
+
+import datetime
+from backend.datatype.irrigation_info import IrrigationInfo
+
+SNAPSHOT_VERSION = 1
+
+# Positions of the fields in a zone tuple
+ZONE_ID = 0
+ZONE_NAME = 1
+ZONE_GPIO_PIN = 2
+ZONE_IS_OPEN = 3
+ZONE_IS_OVERRIDE = 4
+ZONE_LAST_IRRIGATION_DATE = 5
+ZONE_IRRIGATION_INFO = 6
+
+
+# Positions of the fields in an event tuple
+EVENT_NAME = 0
+EVENT_ZONE_ID = 1
+EVENT_IS_OPEN = 2
+EVENT_IS_OVERRIDE = 3
+EVENT_DATE_TIME = 4
+
+# Positions of the fields in a log tuple
+LOG_ZONE_ID = 0
+LOG_DATE_TIME = 1
+LOG_EVENT = 2
+LOG_DESCRIPTION = 3
+
+
+def encode_event(name: str, zone=None, date_time: datetime.datetime = None):
+    """Return the event tuple of a state change, of zone if given."""
+    if date_time is None:
+        date_time = datetime.datetime.now()
+    if zone is None:
+        return (name, None, None, None, date_time.isoformat())
+    return (
+        name,
+        int(zone.id),
+        bool(zone.is_open()),
+        bool(zone.is_override()),
+        date_time.isoformat(),
+    )
+
+
+def encode_irrigation_info(irrigation_info: IrrigationInfo):
+    """Return the snapshot tuple of one irrigation info."""
+    return (
+        int(irrigation_info.id),
+        irrigation_info.time_to_start.strftime("%H:%M:%S"),
+        int(irrigation_info.for_how_many_seconds),
+        tuple(int(day) for day in irrigation_info.day_of_the_week),
+    )
+
+
+def decode_irrigation_info(encoded):
+    """Rebuild an IrrigationInfo from its snapshot tuple."""
+    info_id, time_to_start, for_how_many_seconds, day_of_the_week = encoded
+    irrigation_info = IrrigationInfo(
+        datetime.time.fromisoformat(time_to_start),
+        for_how_many_seconds,
+        list(day_of_the_week),
+    )
+    irrigation_info.id = info_id
+    return irrigation_info
+
+
+def encode_zone(zone, with_last_irrigation_date=False):
+    """
+    Return the snapshot tuple of one zone.
+    The last irrigation date is read from the logs, so it is only included
+    when asked for.
+    """
+    last_irrigation_date = None
+    if with_last_irrigation_date:
+        date = zone.get_last_irrigation_date()
+        if date is not None:
+            last_irrigation_date = date.isoformat()
+    return (
+        int(zone.id),
+        zone.name,
+        int(zone.gpio_pin),
+        bool(zone.is_open()),
+        bool(zone.is_override()),
+        last_irrigation_date,
+        tuple(encode_irrigation_info(info) for info in zone.irrigation_info),
+    )
+
+
+def encode_snapshot(zones, with_last_irrigation_date=False):
+    """Return the versioned snapshot of the given zones."""
+    return (
+        SNAPSHOT_VERSION,
+        tuple(encode_zone(zone, with_last_irrigation_date) for zone in zones),
+    )
+
+
+def decode_snapshot(snapshot):
+    """
+    Return the zone tuples of a snapshot.
+    Raises ValueError if the snapshot has been written by an unknown version.
+    """
+    version, zones = snapshot
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported zone snapshot version {version}")
+    return zones
+
+
+def encode_logs(logs):
+    """Return the log tuples of the given Log entries."""
+    return tuple(
+        (log.zone_id, log.date_time.isoformat(), log.event_id.name, log.log)
+        for log in logs
+    )
@@ -1,7 +1,10 @@
+import contextlib
+import logging
 import sqlite3
 import os
 import threading
 import sys
+import weakref
 
 # tell interpreter where to look
 sys.path.insert(0, "..")
@@ -11,8 +14,32 @@ class SqlLite:
     _instance = None
     _lock = threading.Lock()  # Class-level lock for singleton creation
     _file_name = "database.db"
-    _conn = None
-    _cursor = None
+    # Bumped by CreateDb and RemoveDb, see Generation()
+    _generation = 0
+    # Applied once to every new connection
+    _connection_pragmas = (
+        "PRAGMA journal_mode=WAL;",
+        "PRAGMA synchronous=NORMAL;",
+        "PRAGMA busy_timeout=5000;",
+        "PRAGMA temp_store=MEMORY;",
+    )
+    _cached_statements = 256
+    # Tables whose ids are assigned by the database; older databases used
+    # "INT NOT NULL PRIMARY KEY" and are rebuilt by UpgradeDb
+    _tables_with_id = {
+        "zone": """ CREATE TABLE zone (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT, gpio_pin INTEGER, last_irrigation_time TEXT)""",
+        "scheduler": """ CREATE TABLE scheduler (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            zone_id INT, sheduled_time TEXT, for_how_many_seconds INT)""",
+    }
+    # Created with the tables and added to existing databases by UpgradeDb
+    _indexes = (
+        """ CREATE INDEX IF NOT EXISTS log_zone_event_date
+            ON log (zone_id, event, date_time)""",
+        """ CREATE INDEX IF NOT EXISTS log_date ON log (date_time)""",
+        """ CREATE INDEX IF NOT EXISTS log_zone_date
+            ON log (zone_id, date_time)""",
+    )
 
     def __new__(cls, *args, **kwargs):
         # Double-checked locking pattern for thread-safe singleton
@@ -24,9 +51,8 @@ class SqlLite:
     def get_instance():
         # Thread-safe singleton access
         if SqlLite._instance is None:
-            print("Creating new SqlLite instance")
+            logging.debug("Creating new SqlLite instance")
             with SqlLite._lock:
-                print("Acquired lock for SqlLite instance creation")
                 SqlLite._instance = SqlLite()
         return SqlLite._instance
 
@@ -34,95 +60,222 @@ class SqlLite:
         # Evita di reinizializzare se già inizializzato
         if hasattr(self, "_initialized") and self._initialized:
             return
-        self._conn = None
-        self._db_lock = threading.RLock()  # Instance-level lock for database operations
+        # One long-lived connection per thread, tracked to close them all
+        self._local = threading.local()
+        self._connections = {}
+        self._connections_lock = threading.Lock()
         self._initialized = True
 
     def CreateDb(self):
-        with self._db_lock:
-            self.OpenConnection()
-            try:
-                self._cursor.execute(
-                    """ CREATE TABLE configuration (maximum_seconds INTEGER)"""
-                )
-                self._cursor.execute(
-                    """ INSERT INTO configuration (maximum_seconds) VALUES (120) """
-                )
-                self._cursor.execute(
-                    """ CREATE TABLE zone (id INT NOT NULL PRIMARY KEY, name TEXT, gpio_pin INTEGER, last_irrigation_time TEXT)"""
-                )
-                self._cursor.execute(
-                    """ CREATE TABLE scheduler (id INT NOT NULL PRIMARY KEY, zone_id INT, sheduled_time TEXT, for_how_many_seconds INT)"""
-                )
-                self._cursor.execute(
-                    """ CREATE TABLE log (zone_id INT, date_time TEXT, event INT, description TEXT)"""
-                )
+        SqlLite._generation += 1
+        conn = self.OpenConnection()
+        try:
+            conn.execute(""" CREATE TABLE configuration (maximum_seconds INTEGER)""")
+            conn.execute(
+                """ INSERT INTO configuration (maximum_seconds) VALUES (120) """
+            )
+            for table in self._tables_with_id.values():
+                conn.execute(table)
+            conn.execute(
+                """ CREATE TABLE log (zone_id INT, date_time TEXT, event INT,
+                description TEXT)"""
+            )
+            for index in self._indexes:
+                conn.execute(index)
 
-                self._conn.commit()
-            except Exception as e:
-                print(f"Error creating db: {e}")
-                self.RemoveDb()
-            finally:
-                self.CloseConnection()
+            conn.commit()
+        except Exception as e:
+            logging.error("Error creating db: %s", e)
+            self.RemoveDb()
+
+    def UpgradeDb(self):
+        # Brings a database created by an older version up to date
+        with self.Transaction() as conn:
+            for name, table in self._tables_with_id.items():
+                row = conn.execute(
+                    """SELECT sql FROM sqlite_master
+                    WHERE type = 'table' AND name = ?""",
+                    [name],
+                ).fetchone()
+                if row is None or "AUTOINCREMENT" in row[0].upper():
+                    continue
+                conn.execute(f"ALTER TABLE {name} RENAME TO {name}_old")
+                conn.execute(table)
+                conn.execute(f"INSERT INTO {name} SELECT * FROM {name}_old")
+                conn.execute(f"DROP TABLE {name}_old")
+            for index in self._indexes:
+                conn.execute(index)
 
     def DbExists(self):
         return os.path.isfile(self._file_name)
 
     def OpenConnection(self):
-        with self._db_lock:
-            if self._conn is None:
-                # Enable thread safety and check same thread = False for multi-threaded access
-                self._conn = sqlite3.connect(self._file_name, check_same_thread=False)
-                # Enable WAL mode for better concurrent access
-                self._conn.execute("PRAGMA journal_mode=WAL;")
-                self._cursor = self._conn.cursor()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and threading.get_ident() not in self._connections:
+            # Closed by CloseAllConnections from another thread
+            conn = None
+        if conn is None:
+            # Enable thread safety and check same thread = False so that
+            # connections of finished threads can be closed from any thread
+            conn = sqlite3.connect(
+                self._file_name,
+                check_same_thread=False,
+                cached_statements=self._cached_statements,
+            )
+            for pragma in self._connection_pragmas:
+                conn.execute(pragma)
+            self._local.conn = conn
+            self._local.transaction_depth = 0
+            with self._connections_lock:
+                self._CloseConnectionsOfFinishedThreads()
+                self._connections[threading.get_ident()] = (
+                    weakref.ref(threading.current_thread()),
+                    conn,
+                )
+        return conn
 
-    def RemoveDb(self):
-        os.remove(self._file_name)
+    def _CloseConnectionsOfFinishedThreads(self):
+        for ident, (thread, conn) in list(self._connections.items()):
+            if thread() is None or not thread().is_alive():
+                del self._connections[ident]
+                conn.close()
 
-    def ExecuteQueryNoResult(self, query, params=None):
-        with self._db_lock:
-            self.OpenConnection()
+    @contextlib.contextmanager
+    def Transaction(self):
+        # Groups every query run by this thread in the block in one transaction.
+        # A nested block is a savepoint: when it raises, only its own queries
+        # are rolled back, the caller deciding whether the outer block goes on
+        conn = self.OpenConnection()
+        if self._local.transaction_depth > 0:
+            savepoint = f"nested_{self._local.transaction_depth}"
+            on_commit = len(self._local.on_commit)
+            self._local.transaction_depth += 1
+            conn.execute(f"SAVEPOINT {savepoint}")
             try:
-                if params is None:
-                    self._cursor.execute(query)
-                else:
-                    self._cursor.execute(query, params)
-                self._conn.commit()
-            except Exception as e:
-                print(f"Error executing query (no result): {e}")
-                self._conn.rollback()
+                yield conn
+                conn.execute(f"RELEASE {savepoint}")
+            except BaseException:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+                del self._local.on_commit[on_commit:]
                 raise
             finally:
-                self.CloseConnection()
+                self._local.transaction_depth -= 1
+            return
+        self._local.transaction_depth = 1
+        self._local.on_commit = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.transaction_depth = 0
+            on_commit, self._local.on_commit = self._local.on_commit, []
+        for callback in on_commit:
+            callback()
+
+    def OnCommit(self, callback):
+        # Runs callback once the queries of the block are committed: at once
+        # outside Transaction(), after the outermost block otherwise. Dropped
+        # when the block it was registered in is rolled back
+        if self._InTransaction():
+            self._local.on_commit.append(callback)
+        else:
+            callback()
+
+    def _InTransaction(self):
+        return getattr(self._local, "transaction_depth", 0) > 0
+
+    def Generation(self):
+        # Changes whenever the database is created or removed, so that caches
+        # of its content know when they are stale
+        return SqlLite._generation
+
+    def RemoveDb(self):
+        SqlLite._generation += 1
+        self.CloseAllConnections()
+        os.remove(self._file_name)
+
+    def ExecuteQueryNoResult(self, query, params=None):
+        conn = self.OpenConnection()
+        try:
+            if params is None:
+                conn.execute(query)
+            else:
+                conn.execute(query, params)
+            if not self._InTransaction():
+                conn.commit()
+        except Exception as e:
+            logging.error("Error executing query (no result): %s", e)
+            if not self._InTransaction():
+                conn.rollback()
+            raise
+
+    def ExecuteInsert(self, query, params=None):
+        # Like ExecuteQueryNoResult, returns the id assigned to the new row
+        conn = self.OpenConnection()
+        try:
+            cursor = conn.execute(query, params or [])
+            if not self._InTransaction():
+                conn.commit()
+            return cursor.lastrowid
+        except Exception as e:
+            logging.error("Error executing insert: %s", e)
+            if not self._InTransaction():
+                conn.rollback()
+            raise
+
+    def ExecuteManyNoResult(self, query, params_list):
+        conn = self.OpenConnection()
+        try:
+            conn.executemany(query, params_list)
+            if not self._InTransaction():
+                conn.commit()
+        except Exception as e:
+            logging.error("Error executing query (many): %s", e)
+            if not self._InTransaction():
+                conn.rollback()
+            raise
 
     def ExecuteQuery(self, query, params=None):
-        with self._db_lock:
-            self.OpenConnection()
-            try:
-                if params is None:
-                    self._cursor.execute(query)
-                else:
-                    self._cursor.execute(query, params)
-                return self._cursor.fetchall()
-            except Exception as e:
-                print(f"Error executing query: {e}")
-                raise
-            finally:
-                self.CloseConnection()
+        conn = self.OpenConnection()
+        try:
+            if params is None:
+                return conn.execute(query).fetchall()
+            return conn.execute(query, params).fetchall()
+        except Exception as e:
+            logging.error("Error executing query: %s", e)
+            raise
 
     def CloseConnection(self):
-        with self._db_lock:
-            if self._conn is not None:
-                try:
-                    self._conn.close()
-                    self._conn = None
-                    self._cursor = None
-                except Exception as e:
-                    print(f"Error closing connection: {e}")
+        # Closes the connection of the calling thread only
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._connections_lock:
+            self._connections.pop(threading.get_ident(), None)
+        try:
+            conn.close()
+        except Exception as e:
+            logging.error("Error closing connection: %s", e)
+
+    def CloseAllConnections(self):
+        self.CloseConnection()
+        with self._connections_lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for _, conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                logging.error("Error closing connection: %s", e)
 
     def __del__(self):
         try:
-            self.CloseConnection()
+            self.CloseAllConnections()
         except Exception as e:
-            print(f"Error closing connection: {e}")
+            logging.error("Error closing connection: %s", e)
@@ -1,3 +1,4 @@
+import threading
 import unittest
 from backend.db.SqlLite import SqlLite
 import sys
@@ -11,13 +12,99 @@ class TestInitSqlLite(unittest.TestCase):
     @classmethod
     def setUpClass(self):
         self.db = SqlLite()
-        self.db.Init()
         self.db.CreateDb()
 
     @classmethod
     def tearDownClass(self):
         self.db.RemoveDb()
 
+    def test_connection_is_reused_by_the_same_thread(self):
+        self.assertIs(self.db.OpenConnection(), self.db.OpenConnection())
+        connections = []
+        thread = threading.Thread(
+            target=lambda: connections.append(self.db.OpenConnection())
+        )
+        thread.start()
+        thread.join()
+        self.assertIsNot(connections[0], self.db.OpenConnection())
+
+    def test_transaction_commits_all_statements(self):
+        with self.db.Transaction():
+            self.db.ExecuteQueryNoResult(
+                "INSERT INTO log VALUES (?, ?, ?, ?)", [10, "t", 5, "a"]
+            )
+            self.db.ExecuteQueryNoResult(
+                "INSERT INTO log VALUES (?, ?, ?, ?)", [10, "t", 5, "b"]
+            )
+        data = self.db.ExecuteQuery("SELECT * FROM log WHERE zone_id = 10")
+        self.assertEqual(len(data), 2)
+
+    def test_transaction_rolls_back_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with self.db.Transaction():
+                self.db.ExecuteQueryNoResult(
+                    "INSERT INTO log VALUES (?, ?, ?, ?)", [11, "t", 5, "a"]
+                )
+                raise RuntimeError("abort")
+        data = self.db.ExecuteQuery("SELECT * FROM log WHERE zone_id = 11")
+        self.assertEqual(len(data), 0)
+
+    def test_nested_transaction_rolls_back_alone(self):
+        with self.db.Transaction():
+            self.db.ExecuteQueryNoResult(
+                "INSERT INTO log VALUES (?, ?, ?, ?)", [12, "t", 5, "a"]
+            )
+            with self.assertRaises(RuntimeError):
+                with self.db.Transaction():
+                    self.db.ExecuteQueryNoResult(
+                        "INSERT INTO log VALUES (?, ?, ?, ?)", [12, "t", 5, "b"]
+                    )
+                    raise RuntimeError("abort")
+        data = self.db.ExecuteQuery("SELECT description FROM log WHERE zone_id = 12")
+        self.assertEqual([row[0] for row in data], ["a"])
+
+    def test_upgrade_adds_autoincrement_to_old_tables(self):
+        self.db.ExecuteQueryNoResult("DROP TABLE scheduler")
+        self.db.ExecuteQueryNoResult(
+            "CREATE TABLE scheduler (id INT NOT NULL PRIMARY KEY, zone_id INT,"
+            " sheduled_time TEXT, for_how_many_seconds INT)"
+        )
+        self.db.ExecuteQueryNoResult(
+            "INSERT INTO scheduler VALUES (?, ?, ?, ?)", [3, 1, "05:00:00", 60]
+        )
+        self.db.UpgradeDb()
+        new_id = self.db.ExecuteInsert(
+            "INSERT INTO scheduler (zone_id, sheduled_time, for_how_many_seconds)"
+            " VALUES (?, ?, ?)",
+            [1, "06:00:00", 60],
+        )
+        self.assertEqual(new_id, 4)
+        self.db.ExecuteQueryNoResult("DELETE FROM scheduler WHERE id = 4")
+        new_id = self.db.ExecuteInsert(
+            "INSERT INTO scheduler (zone_id, sheduled_time, for_how_many_seconds)"
+            " VALUES (?, ?, ?)",
+            [1, "07:00:00", 60],
+        )
+        self.assertEqual(new_id, 5)
+
+    def test_on_commit_runs_after_the_outermost_block(self):
+        committed = []
+        with self.db.Transaction():
+            with self.db.Transaction():
+                self.db.OnCommit(lambda: committed.append("kept"))
+            with self.assertRaises(RuntimeError):
+                with self.db.Transaction():
+                    self.db.OnCommit(lambda: committed.append("rolled back"))
+                    raise RuntimeError("abort")
+            self.assertEqual(committed, [])
+        self.assertEqual(committed, ["kept"])
+        with self.assertRaises(RuntimeError):
+            with self.db.Transaction():
+                self.db.OnCommit(lambda: committed.append("rolled back"))
+                raise RuntimeError("abort")
+        self.db.OnCommit(lambda: committed.append("now"))
+        self.assertEqual(committed, ["kept", "now"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,85 @@
+"""
+Micro-benchmark of the per-query latency of SqlLite: the pooled per-thread
+connection against the former connect/PRAGMA/close around every statement.
+
+Run with: bazel run //backend/db:sql_lite_benchmark -- --iterations 2000
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from backend.db.SqlLite import SqlLite
+
+INSERT_LOG = """INSERT INTO log VALUES (?, ?, ?, ?)"""
+SELECT_LOG = """SELECT * FROM log WHERE zone_id = ? ORDER BY date_time DESC"""
+
+
+def _legacy_execute(query, params, fetch):
+    # What SqlLite did before: a new connection for every statement
+    conn = sqlite3.connect(SqlLite._file_name, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        if fetch:
+            return cursor.fetchall()
+        conn.commit()
+        return None
+    finally:
+        conn.close()
+
+
+def _log_row(index):
+    return [index % 8, f"2025-06-02 10:00:{index % 60:02d}.000000", 1, "bench"]
+
+
+def _microseconds_per_call(function, iterations):
+    start = time.perf_counter()
+    for index in range(iterations):
+        function(index)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def run(iterations):
+    db = SqlLite.get_instance()
+    db.CreateDb()
+    try:
+        results = [
+            (
+                "insert",
+                _microseconds_per_call(
+                    lambda i: _legacy_execute(INSERT_LOG, _log_row(i), False),
+                    iterations,
+                ),
+                _microseconds_per_call(
+                    lambda i: db.ExecuteQueryNoResult(INSERT_LOG, _log_row(i)),
+                    iterations,
+                ),
+            ),
+            (
+                "select",
+                _microseconds_per_call(
+                    lambda i: _legacy_execute(SELECT_LOG, [i % 8], True),
+                    iterations,
+                ),
+                _microseconds_per_call(
+                    lambda i: db.ExecuteQuery(SELECT_LOG, [i % 8]), iterations
+                ),
+            ),
+        ]
+    finally:
+        db.RemoveDb()
+    print(f"{'query':<8}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, before, after in results:
+        print(f"{name:<8}{before:>14.1f}{after:>14.1f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        run(args.iterations)
@@ -0,0 +1,175 @@
+"""
+This module provides Actuator, the thread every pin change goes through once
+the Executor runs, and its max-open watchdog.
+"""
+
+import collections
+import logging
+import queue
+import threading
+import time
+from backend.hw_io.gpio import CLOSED_LEVEL, OPEN_LEVEL
+
+_STOP = object()
+_WATCHDOG_RETRY_NS = 100_000_000
+
+
+class ActuatorCommand:
+    """Levels to write, stamped with the time.monotonic_ns() they were queued."""
+
+    def __init__(self, levels: dict, force: bool = False):
+        self.levels = levels
+        self.force = force
+        self.queued_ns = time.monotonic_ns()
+        self.done = threading.Event()
+        self.error = None
+
+
+class Actuator:
+    """
+    Single thread writing the pins, fed by a SimpleQueue so that callers
+    never wait for the bus.
+    Every pin set to OPEN_LEVEL is closed by the actuator itself when it has
+    been open for max_open_seconds, however busy or stalled the rest of the
+    service is; on_watchdog_close(pin) is then called on a separate thread so
+    that the owner can update its state.
+    """
+
+    def __init__(
+        self,
+        write,
+        max_open_seconds: float = None,
+        on_watchdog_close=None,
+        history: int = 1024,
+    ):
+        """
+        Args:
+            write: Callable(levels, force) writing {pin: level} to the pins.
+            max_open_seconds (float, optional): Longest time a pin may stay
+                open, None to disable the watchdog.
+            on_watchdog_close (optional): Callable(pin) run after the watchdog
+                closed a pin.
+            history (int): How many latencies the statistics are computed on.
+        """
+        self._write = write
+        self._max_open_seconds = max_open_seconds
+        self._on_watchdog_close = on_watchdog_close
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        # pin -> time.monotonic_ns() at which the watchdog closes it
+        self._deadlines = {}
+        self._latencies_ns = collections.deque(maxlen=history)
+        self.commands = 0
+        self.errors = 0
+        self.watchdog_closes = 0
+
+    def start(self):
+        """
+        Starts the actuator thread.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="Actuator", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """
+        Applies the queued commands and stops the actuator thread.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def is_running(self):
+        """True if the actuator thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def is_actuator_thread(self):
+        """True if called from the actuator thread."""
+        return threading.current_thread() is self._thread
+
+    def submit(self, levels: dict, force: bool = False):
+        """
+        Queues levels to write and returns at once.
+        Returns:
+            ActuatorCommand: Its done event is set once written.
+        """
+        command = ActuatorCommand(dict(levels), force)
+        self._queue.put(command)
+        return command
+
+    def stats(self):
+        """
+        Returns the number of commands and the latency, in milliseconds, from
+        queueing a command to the end of its write.
+        """
+        latencies = sorted(self._latencies_ns)
+        stats = {
+            "commands": self.commands,
+            "errors": self.errors,
+            "watchdog_closes": self.watchdog_closes,
+            "open_pins": len(self._deadlines),
+            "pending": self._queue.qsize(),
+        }
+        if latencies:
+            stats["latency_mean_ms"] = sum(latencies) / len(latencies) / 1e6
+            stats["latency_p99_ms"] = latencies[int(len(latencies) * 0.99)] / 1e6
+            stats["latency_max_ms"] = latencies[-1] / 1e6
+        return stats
+
+    def _run(self):
+        while True:
+            timeout = None
+            if self._deadlines:
+                next_deadline = min(self._deadlines.values())
+                timeout = max(0, (next_deadline - time.monotonic_ns()) / 1e9)
+            try:
+                command = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                command = None
+            if command is _STOP:
+                break
+            if command is not None:
+                self._apply(command)
+            self._check_deadlines()
+
+    def _apply(self, command):
+        try:
+            self._write(command.levels, command.force)
+        except Exception as ex:
+            self.errors += 1
+            command.error = ex
+            logging.error("Actuator cannot write %s: %s", command.levels, ex)
+        else:
+            for pin, level in command.levels.items():
+                if level == OPEN_LEVEL and self._max_open_seconds is not None:
+                    # Counted from when the command was queued, not written
+                    self._deadlines.setdefault(
+                        pin, command.queued_ns + int(self._max_open_seconds * 1e9)
+                    )
+                elif level == CLOSED_LEVEL:
+                    self._deadlines.pop(pin, None)
+        self.commands += 1
+        self._latencies_ns.append(time.monotonic_ns() - command.queued_ns)
+        command.done.set()
+
+    def _check_deadlines(self):
+        now = time.monotonic_ns()
+        for pin, deadline in list(self._deadlines.items()):
+            if deadline > now:
+                continue
+            logging.warning("Actuator watchdog: pin %s open for too long", pin)
+            try:
+                self._write({pin: CLOSED_LEVEL}, True)
+            except Exception as ex:
+                self.errors += 1
+                logging.error("Actuator watchdog cannot close pin %s: %s", pin, ex)
+                self._deadlines[pin] = now + _WATCHDOG_RETRY_NS
+                continue
+            del self._deadlines[pin]
+            self.watchdog_closes += 1
+            if self._on_watchdog_close is not None:
+                threading.Thread(
+                    target=self._on_watchdog_close, args=(pin,), daemon=True
+                ).start()
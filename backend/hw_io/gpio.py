@@ -1,32 +1,141 @@
-try:
-    import RPi.GPIO as GPIO
+import contextlib
+import logging
+import threading
+from backend.hw_io.gpio_backend import RpiGpioBackend, SimulatedGpioBackend
 
-    test = False
-except ImportError:
-    test = True
+# Output levels, as RPi.GPIO.LOW and RPi.GPIO.HIGH; the valves are active low
+LOW = 0
+HIGH = 1
+OPEN_LEVEL = LOW
+CLOSED_LEVEL = HIGH
 
 
 class PiGpio:
     pins_to_use = None
     _instance = None
+    # Last level written to each pin, so that reads never touch the hardware
+    _levels = None
+    _levels_lock = None
+    # RpiGpioBackend on the controller, SimulatedGpioBackend elsewhere
+    _backend = None
+    # When running, every write goes through its thread
+    _actuator = None
+    # Longest wait for the actuator to close every pin in ClosePins
+    _close_pins_timeout = 5
+    # Levels set by the Batch() blocks of each thread, not written yet
+    _batches = threading.local()
+    writes = 0
+    skipped_writes = 0
 
     def OpenPin(self, pin_id):
-        if not test:
-            GPIO.output(pin_id, GPIO.LOW)
+        self.SetPins({pin_id: OPEN_LEVEL})
 
     def ClosePin(self, pin_id):
-        if not test:
-            GPIO.output(pin_id, GPIO.HIGH)
+        self.SetPins({pin_id: CLOSED_LEVEL})
+
+    def ClosePins(self, pin_ids):
+        # One call for every pin, used when all the valves must close at once.
+        # Written even if cached as closed: the cache must not hide a valve
+        self.SetPins({pin_id: CLOSED_LEVEL for pin_id in pin_ids}, force=True)
+
+    def SetPins(self, levels, force=False):
+        # Writes {pin: level} with one GPIO.output call, skipping the pins
+        # already at their level unless force is set. Returns the pins written.
+        # With a running actuator the write is queued instead, and awaited
+        # only when forced
+        pending = getattr(self._batches, "levels", None)
+        if pending is not None and not force:
+            pending.update(levels)
+            return []
+        actuator = self._actuator
+        if (
+            actuator is not None
+            and actuator.is_running()
+            and not actuator.is_actuator_thread()
+        ):
+            command = actuator.submit(levels, force)
+            if force and not command.done.wait(self._close_pins_timeout):
+                # The actuator is stalled: the valves must close anyway
+                logging.error(
+                    "PiGpio - Actuator did not write %s in %s s, writing directly",
+                    levels,
+                    self._close_pins_timeout,
+                )
+                return self.WritePins(levels, force)
+            return []
+        return self.WritePins(levels, force)
+
+    def WritePins(self, levels, force=False):
+        # SetPins on the calling thread, used by the actuator
+        with self._levels_lock:
+            requested = len(levels)
+            if not force:
+                levels = {
+                    pin_id: level
+                    for pin_id, level in levels.items()
+                    if self._levels.get(pin_id) != level
+                }
+            self.skipped_writes += requested - len(levels)
+            if levels:
+                pins = list(levels)
+                self._backend.output(pins, [levels[pin_id] for pin_id in pins])
+                self._levels.update(levels)
+                self.writes += 1
+            return list(levels)
+
+    @contextlib.contextmanager
+    def Batch(self):
+        # Collects the pins set by this thread in the block and writes them
+        # with one SetPins call when the block ends, even if it raises, so
+        # that group operations cost one bus operation
+        if getattr(self._batches, "levels", None) is not None:
+            yield
+            return
+        self._batches.levels = {}
+        try:
+            yield
+        finally:
+            levels = self._batches.levels
+            self._batches.levels = None
+            self.SetPins(levels)
+
+    def GetPinLevel(self, pin_id):
+        # Last level written to the pin, None if never written
+        return self._levels.get(pin_id)
+
+    def GetPinStates(self):
+        with self._levels_lock:
+            return dict(self._levels)
 
     def SetUp(self, pins_to_use: list()):
-        print("Setup")
-        if not test:
+        logging.debug("PiGpio - Setting up pins %s", pins_to_use)
+        with self._levels_lock:
             self.pins_to_use = pins_to_use
-            GPIO.setup(pins_to_use, GPIO.OUT, initial=GPIO.HIGH)
+            self._backend.setup(pins_to_use, CLOSED_LEVEL)
+            for pin_id in pins_to_use:
+                self._levels[pin_id] = CLOSED_LEVEL
+
+    def UseBackend(self, backend):
+        # Replaces the backend, e.g. with a SimulatedGpioBackend in tests;
+        # the cached levels are forgotten
+        with self._levels_lock:
+            self._backend = backend
+            self._levels = {}
+
+    def GetBackend(self):
+        return self._backend
+
+    def UseActuator(self, actuator):
+        # Routes the writes through an Actuator built on WritePins, None to
+        # write on the calling thread again
+        self._actuator = actuator
+
+    def GetActuator(self):
+        return self._actuator
 
     def __del__(self):
-        if not test:
-            GPIO.cleanup(self.pins_to_use)
+        if self._backend is not None:
+            self._backend.cleanup(self.pins_to_use)
 
     def __init__(self):
         raise RuntimeError("Call instance() instead")
@@ -34,8 +143,12 @@ class PiGpio:
     @classmethod
     def instance(self):
         if self._instance is None:
-            print("Creating new instance")
+            logging.debug("PiGpio - Creating new instance")
             self._instance = self.__new__(self)
-            if not test:
-                GPIO.setmode(GPIO.BOARD)
+            self._instance._levels = {}
+            self._instance._levels_lock = threading.Lock()
+            try:
+                self._instance._backend = RpiGpioBackend()
+            except ImportError:
+                self._instance._backend = SimulatedGpioBackend()
         return self._instance
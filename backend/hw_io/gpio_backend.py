@@ -0,0 +1,122 @@
+"""
+Backends PiGpio drives the pins through: RpiGpioBackend for the RPi.GPIO
+library of the controller, SimulatedGpioBackend for development boxes and
+tests.
+"""
+
+import collections
+import random
+import threading
+import time
+
+
+class RpiGpioBackend:
+    """
+    Drives the pins of the Raspberry Pi through RPi.GPIO, with board
+    numbering.
+    """
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+
+        self._gpio = GPIO
+        GPIO.setmode(GPIO.BOARD)
+
+    def setup(self, pins: list, level: int):
+        """Configures the pins as outputs at the given initial level."""
+        self._gpio.setup(pins, self._gpio.OUT, initial=level)
+
+    def output(self, pins: list, levels: list):
+        """Writes levels[i] to pins[i], in one call."""
+        self._gpio.output(pins, levels)
+
+    def cleanup(self, pins: list):
+        """Releases the pins."""
+        if pins:
+            self._gpio.cleanup(pins)
+
+
+class PinTransition(
+    collections.namedtuple("PinTransition", ["monotonic_ns", "pin", "level"])
+):
+    """A level written to a pin, with the time.monotonic_ns() it took effect."""
+
+    __slots__ = ()
+
+
+class SimulatedGpioBackend:
+    """
+    Keeps the level of every pin in memory and records every write.
+    Each output call sleeps latency seconds, plus or minus up to jitter,
+    like a slow bus would; the transitions are stamped after the sleep and
+    kept in a ring buffer of the last capacity ones.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        capacity: int = 4096,
+        seed: int = None,
+    ):
+        self._latency = latency
+        self._jitter = jitter
+        self._random = random.Random(seed)
+        self._levels = {}
+        self._transitions = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.outputs = 0
+
+    def setup(self, pins: list, level: int):
+        """Sets the initial level of the pins; not recorded as a transition."""
+        with self._lock:
+            for pin in pins:
+                self._levels[pin] = level
+
+    def output(self, pins: list, levels: list):
+        """Writes levels[i] to pins[i] after the simulated latency."""
+        delay = self._latency
+        if self._jitter:
+            delay += self._random.uniform(-self._jitter, self._jitter)
+        if delay > 0:
+            time.sleep(delay)
+        now = time.monotonic_ns()
+        with self._lock:
+            self.outputs += 1
+            for pin, level in zip(pins, levels, strict=True):
+                self._levels[pin] = level
+                self._transitions.append(PinTransition(now, pin, level))
+
+    def cleanup(self, pins: list):
+        """Forgets the level of the pins."""
+        with self._lock:
+            for pin in pins or ():
+                self._levels.pop(pin, None)
+
+    def level(self, pin: int):
+        """Returns the level of a pin, None if it has never been set."""
+        return self._levels.get(pin)
+
+    def transitions(self, pin: int = None, since_ns: int = None):
+        """
+        Returns the recorded transitions, oldest first.
+        Args:
+            pin (int, optional): Only the transitions of this pin.
+            since_ns (int, optional): Only the transitions stamped after this
+                time.monotonic_ns() value.
+        Returns:
+            list[PinTransition]: The matching transitions.
+        """
+        with self._lock:
+            transitions = list(self._transitions)
+        return [
+            transition
+            for transition in transitions
+            if (pin is None or transition.pin == pin)
+            and (since_ns is None or transition.monotonic_ns > since_ns)
+        ]
+
+    def clear(self):
+        """Drops the recorded transitions."""
+        with self._lock:
+            self._transitions.clear()
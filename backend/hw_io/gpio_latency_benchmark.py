@@ -0,0 +1,72 @@
+"""
+Benchmark of the latency from a schedule deadline to the pin flip, with the
+simulated GPIO backend: a DeadlineQueue wakes up for each deadline, the zone
+is toggled and the flip is read back from the recorded transitions.
+
+Run with: bazel run //backend/hw_io:gpio_latency_benchmark -- --latency 0.002
+"""
+
+import argparse
+import datetime
+import os
+import statistics
+import tempfile
+import time
+from backend.datatype.zone import Zone
+from backend.db.SqlLite import SqlLite
+from backend.hw_io.gpio import PiGpio
+from backend.hw_io.gpio_backend import SimulatedGpioBackend
+from backend.scheduling.deadline_queue import DeadlineKind, DeadlineQueue
+
+PIN = 40
+
+
+def run(iterations, delay, latency, jitter):
+    db = SqlLite.get_instance()
+    db.CreateDb()
+    backend = SimulatedGpioBackend(latency=latency, jitter=jitter, seed=1)
+    PiGpio.instance().UseBackend(backend)
+    PiGpio.instance().SetUp([PIN])
+    zone = Zone("benchmark", PIN)
+    zone.set_id(1)
+    queue = DeadlineQueue()
+    latencies = []
+    try:
+        for index in range(iterations):
+            deadline_ns = time.monotonic_ns() + int(delay * 1e9)
+            queue.schedule(
+                zone,
+                [
+                    (
+                        datetime.datetime.now() + datetime.timedelta(seconds=delay),
+                        DeadlineKind.OPEN,
+                    )
+                ],
+            )
+            due, _ = queue.wait_for_due(delay + 1)
+            for due_zone, _ in due:
+                due_zone.override_open(index % 2 == 0)
+            flips = backend.transitions(PIN, since_ns=deadline_ns - int(delay * 1e9))
+            latencies.append((flips[-1].monotonic_ns - deadline_ns) / 1e6)
+    finally:
+        db.RemoveDb()
+    latencies.sort()
+    print(f"deadline to pin flip over {iterations} deadlines (ms)")
+    print(f"{'p50':>8}{'p99':>10}{'max':>10}")
+    print(
+        f"{statistics.median(latencies):>8.3f}"
+        f"{latencies[int(len(latencies) * 0.99) - 1]:>10.3f}"
+        f"{latencies[-1]:>10.3f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.01)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        run(args.iterations, args.delay, args.latency, args.jitter)
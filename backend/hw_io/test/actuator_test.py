@@ -0,0 +1,123 @@
+"""
+Unit tests for the Actuator: verifies queued writes, latency statistics and
+the max-open watchdog.
+"""
+
+import threading
+import time
+import unittest
+from backend.hw_io.actuator import Actuator
+from backend.hw_io.gpio import CLOSED_LEVEL, OPEN_LEVEL, PiGpio
+from backend.hw_io.gpio_backend import SimulatedGpioBackend
+
+
+class TestActuator(unittest.TestCase):
+    """
+    Test suite for the Actuator driving PiGpio over a simulated backend.
+    """
+
+    def setUp(self):
+        """
+        Route PiGpio through an actuator with a 100 ms watchdog.
+        """
+        self.gpio = PiGpio.instance()
+        self.addCleanup(self.gpio.UseBackend, self.gpio.GetBackend())
+        self.backend = SimulatedGpioBackend()
+        self.gpio.UseBackend(self.backend)
+        self.gpio.SetUp([21, 22])
+        self.watchdog_closed = []
+        self.watchdog_called = threading.Event()
+        self.actuator = Actuator(
+            self.gpio.WritePins,
+            max_open_seconds=0.1,
+            on_watchdog_close=self.on_watchdog_close,
+        )
+        self.actuator.start()
+        self.gpio.UseActuator(self.actuator)
+        self.addCleanup(self.actuator.stop, 5)
+        self.addCleanup(self.gpio.UseActuator, None)
+
+    def on_watchdog_close(self, pin):
+        self.watchdog_closed.append(pin)
+        self.watchdog_called.set()
+
+    def test_writes_are_queued_to_the_actuator(self):
+        """
+        Test that pins are written by the actuator thread, in order.
+        """
+        writers = []
+        write = self.gpio.WritePins
+
+        def record_writer(levels, force=False):
+            writers.append(threading.current_thread().name)
+            return write(levels, force)
+
+        self.actuator._write = record_writer
+        self.assertEqual(self.gpio.SetPins({21: OPEN_LEVEL, 22: OPEN_LEVEL}), [])
+        self.gpio.ClosePin(21)
+        # Forced writes wait for the actuator, so everything before is done
+        self.gpio.ClosePins([22])
+        self.assertEqual(writers, ["Actuator"] * 3)
+        self.assertEqual(
+            [(t.pin, t.level) for t in self.backend.transitions()],
+            [
+                (21, OPEN_LEVEL),
+                (22, OPEN_LEVEL),
+                (21, CLOSED_LEVEL),
+                (22, CLOSED_LEVEL),
+            ],
+        )
+        stats = self.actuator.stats()
+        self.assertEqual(stats["commands"], 3)
+        self.assertEqual(stats["open_pins"], 0)
+        self.assertGreaterEqual(stats["latency_max_ms"], stats["latency_mean_ms"])
+
+    def test_watchdog_closes_a_valve_left_open(self):
+        """
+        Test that a pin nobody closes is closed after max_open_seconds.
+        """
+        opened = time.monotonic()
+        self.gpio.OpenPin(21)
+        self.assertTrue(self.watchdog_called.wait(5))
+        self.assertGreaterEqual(time.monotonic() - opened, 0.1)
+        self.assertEqual(self.watchdog_closed, [21])
+        self.assertEqual(self.backend.level(21), CLOSED_LEVEL)
+        self.assertEqual(self.gpio.GetPinLevel(21), CLOSED_LEVEL)
+        self.assertEqual(self.actuator.stats()["watchdog_closes"], 1)
+
+    def test_closing_in_time_disarms_the_watchdog(self):
+        """
+        Test that a pin closed before its deadline is left alone.
+        """
+        self.gpio.OpenPin(22)
+        self.gpio.ClosePin(22)
+        self.assertFalse(self.watchdog_called.wait(0.2))
+        self.assertEqual(self.actuator.stats()["watchdog_closes"], 0)
+
+    def test_close_pins_bypasses_a_stalled_actuator(self):
+        """
+        Test that ClosePins writes directly when the actuator does not answer
+        in time.
+        """
+        self.gpio.OpenPin(21)
+        # Waits for the actuator to open the pin
+        self.gpio.ClosePins([])
+        release = threading.Event()
+        write = self.gpio.WritePins
+
+        def stalled_write(levels, force=False):
+            release.wait(5)
+            return write(levels, force)
+
+        self.actuator._write = stalled_write
+        self.addCleanup(release.set)
+        self.gpio._close_pins_timeout = 0.05
+        self.addCleanup(delattr, self.gpio, "_close_pins_timeout")
+        with self.assertLogs(level="ERROR"):
+            self.gpio.ClosePins([21])
+        self.assertEqual(self.backend.level(21), CLOSED_LEVEL)
+        self.assertEqual(self.gpio.GetPinLevel(21), CLOSED_LEVEL)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Unit tests for SimulatedGpioBackend: verifies pin state, latency and the
+transition recorder.
+"""
+
+import time
+import unittest
+from backend.hw_io.gpio import CLOSED_LEVEL, OPEN_LEVEL, PiGpio
+from backend.hw_io.gpio_backend import SimulatedGpioBackend
+
+
+class TestSimulatedGpioBackend(unittest.TestCase):
+    """
+    Test suite for the simulated GPIO backend.
+    """
+
+    def test_levels_and_transitions(self):
+        """
+        Test that writes update the levels and are recorded in order.
+        """
+        backend = SimulatedGpioBackend()
+        backend.setup([1, 2], CLOSED_LEVEL)
+        self.assertEqual(backend.level(1), CLOSED_LEVEL)
+        self.assertEqual(backend.transitions(), [])
+        started = time.monotonic_ns()
+        backend.output([1, 2], [OPEN_LEVEL, OPEN_LEVEL])
+        backend.output([1], [CLOSED_LEVEL])
+        transitions = backend.transitions()
+        self.assertEqual(
+            [(t.pin, t.level) for t in transitions],
+            [(1, OPEN_LEVEL), (2, OPEN_LEVEL), (1, CLOSED_LEVEL)],
+        )
+        self.assertTrue(all(t.monotonic_ns >= started for t in transitions))
+        self.assertEqual(len(backend.transitions(pin=1)), 2)
+        self.assertEqual(
+            backend.transitions(since_ns=transitions[0].monotonic_ns),
+            transitions[2:],
+        )
+        self.assertEqual(backend.level(1), CLOSED_LEVEL)
+        self.assertEqual(backend.level(2), OPEN_LEVEL)
+
+    def test_ring_buffer_keeps_the_last_transitions(self):
+        """
+        Test that only the last capacity transitions are kept.
+        """
+        backend = SimulatedGpioBackend(capacity=3)
+        for level in range(5):
+            backend.output([7], [level % 2])
+        self.assertEqual([t.level for t in backend.transitions()], [0, 1, 0])
+        backend.clear()
+        self.assertEqual(backend.transitions(), [])
+
+    def test_latency_and_jitter(self):
+        """
+        Test that every write takes the configured latency, within the jitter.
+        """
+        backend = SimulatedGpioBackend(latency=0.01, jitter=0.005, seed=3)
+        for _ in range(5):
+            started = time.monotonic_ns()
+            backend.output([1], [OPEN_LEVEL])
+            elapsed = (backend.transitions()[-1].monotonic_ns - started) / 1e9
+            self.assertGreaterEqual(elapsed, 0.005)
+            self.assertLess(elapsed, 0.1)
+
+    def test_pi_gpio_drives_the_backend(self):
+        """
+        Test that PiGpio writes through the backend it has been given.
+        """
+        gpio = PiGpio.instance()
+        previous = gpio.GetBackend()
+        self.addCleanup(gpio.UseBackend, previous)
+        backend = SimulatedGpioBackend()
+        gpio.UseBackend(backend)
+        gpio.SetUp([11, 12])
+        gpio.OpenPin(11)
+        gpio.OpenPin(11)
+        gpio.ClosePins([11, 12])
+        self.assertEqual(
+            [(t.pin, t.level) for t in backend.transitions()],
+            [(11, OPEN_LEVEL), (11, CLOSED_LEVEL), (12, CLOSED_LEVEL)],
+        )
+        self.assertEqual(backend.outputs, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
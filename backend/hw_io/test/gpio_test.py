@@ -0,0 +1,75 @@
+"""
+Unit tests for PiGpio: verifies the cache of pin levels and batched writes.
+"""
+
+import unittest
+from backend.hw_io.gpio import CLOSED_LEVEL, OPEN_LEVEL, PiGpio
+
+
+class TestPiGpio(unittest.TestCase):
+    """
+    Test suite for the pin level cache of PiGpio.
+    """
+
+    def setUp(self):
+        """
+        Start every test from closed pins.
+        """
+        self.gpio = PiGpio.instance()
+        self.pins = [101, 102, 103]
+        self.gpio.SetUp(self.pins)
+
+    def test_redundant_writes_are_skipped(self):
+        """
+        Test that writing the cached level again does not reach the bus.
+        """
+        writes = self.gpio.writes
+        self.gpio.OpenPin(101)
+        self.assertEqual(self.gpio.GetPinLevel(101), OPEN_LEVEL)
+        self.assertEqual(self.gpio.writes, writes + 1)
+        skipped = self.gpio.skipped_writes
+        self.gpio.OpenPin(101)
+        self.gpio.ClosePin(102)
+        self.assertEqual(self.gpio.writes, writes + 1)
+        self.assertEqual(self.gpio.skipped_writes, skipped + 2)
+        self.gpio.ClosePin(101)
+        self.assertEqual(self.gpio.GetPinLevel(101), CLOSED_LEVEL)
+
+    def test_set_pins_writes_only_changed_pins(self):
+        """
+        Test that SetPins writes the changed pins in one operation.
+        """
+        self.gpio.OpenPin(101)
+        writes = self.gpio.writes
+        written = self.gpio.SetPins({101: OPEN_LEVEL, 102: OPEN_LEVEL, 103: OPEN_LEVEL})
+        self.assertEqual(written, [102, 103])
+        self.assertEqual(self.gpio.writes, writes + 1)
+        states = self.gpio.GetPinStates()
+        self.assertEqual([states[pin] for pin in self.pins], [OPEN_LEVEL] * 3)
+
+    def test_close_pins_is_never_skipped(self):
+        """
+        Test that closing all pins writes even the ones cached as closed.
+        """
+        writes = self.gpio.writes
+        self.gpio.ClosePins(self.pins)
+        self.assertEqual(self.gpio.writes, writes + 1)
+
+    def test_batch(self):
+        """
+        Test that pins set in a batch are written together when it ends.
+        """
+        writes = self.gpio.writes
+        with self.gpio.Batch():
+            self.gpio.OpenPin(101)
+            with self.gpio.Batch():
+                self.gpio.OpenPin(102)
+            self.gpio.ClosePin(103)
+            self.assertEqual(self.gpio.GetPinLevel(101), CLOSED_LEVEL)
+        self.assertEqual(self.gpio.writes, writes + 1)
+        self.assertEqual(self.gpio.GetPinLevel(101), OPEN_LEVEL)
+        self.assertEqual(self.gpio.GetPinLevel(102), OPEN_LEVEL)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+This module parses the operations of an RPC batch command, see
+Executor.ExecuteBatch.
+
+An operation is a tuple of plain values, so that a whole batch reaches the
+service in one round trip:
+    (OP_OPEN, zone_id)
+    (OP_CLOSE, zone_id)
+    (OP_OVERRIDE_CLOSE, zone_id)
+    (OP_SET_SCHEDULE, zone_id, (irrigation_info, ...))
+where irrigation_info is encoded as in zone_snapshot, with id -1 for a new
+schedule entry.
+The result of an operation is (ok, error): error says why it failed or,
+when another operation of the batch is invalid or failed while applied, that
+it was not applied. A batch is applied whole or not at all.
+"""
+
+from backend.datatype.zone_snapshot import decode_irrigation_info
+
+OP_OPEN = "open"
+OP_CLOSE = "close"
+OP_OVERRIDE_CLOSE = "override_close"
+OP_SET_SCHEDULE = "set_schedule"
+
+NOT_APPLIED = "not applied: the batch has invalid operations"
+ROLLED_BACK = "not applied: another operation of the batch failed"
+
+
+class BatchOperation:
+    """
+    A validated operation: the zone it applies to and, for OP_SET_SCHEDULE,
+    the decoded irrigation info.
+    """
+
+    def __init__(self, name: str, zone, irrigation_info: list = None):
+        self.name = name
+        self.zone = zone
+        self.irrigation_info = irrigation_info
+
+
+def _parse_schedule(zone, encoded):
+    irrigation_info = [decode_irrigation_info(info) for info in encoded]
+    own_ids = {info.id for info in zone.irrigation_info}
+    for info in irrigation_info:
+        if info.id != -1 and info.id not in own_ids:
+            raise ValueError(f"schedule {info.id} is not of zone {zone.id}")
+        seconds = info.for_how_many_seconds
+        if not isinstance(seconds, int) or seconds <= 0:
+            raise ValueError(f"invalid duration {seconds!r}")
+        if any(day not in range(7) for day in info.day_of_the_week):
+            raise ValueError(f"invalid days {info.day_of_the_week!r}")
+    return irrigation_info
+
+
+def parse_operation(operation, get_zone):
+    """
+    Validates one operation.
+    Args:
+        operation (tuple): The operation as sent by the client.
+        get_zone: Callable returning the zone of an id, raising KeyError
+            for an unknown one.
+    Returns:
+        BatchOperation: The operation, ready to be applied.
+    Raises:
+        ValueError: If the operation is malformed or cannot be applied.
+    """
+    try:
+        name, zone_id, *args = operation
+        zone = get_zone(int(zone_id))
+    except KeyError as ex:
+        raise ValueError(ex.args[0]) from None
+    except (TypeError, ValueError):
+        raise ValueError(f"malformed operation {operation!r}") from None
+    if name in (OP_OPEN, OP_CLOSE, OP_OVERRIDE_CLOSE):
+        if args:
+            raise ValueError(f"{name} takes only a zone id")
+        if name == OP_OPEN and zone.is_override_close():
+            raise ValueError(f"zone {zone.id} is override closed")
+        return BatchOperation(name, zone)
+    if name == OP_SET_SCHEDULE:
+        if len(args) != 1:
+            raise ValueError(f"{name} takes a zone id and a schedule")
+        try:
+            return BatchOperation(name, zone, _parse_schedule(zone, args[0]))
+        except (TypeError, ValueError) as ex:
+            raise ValueError(f"invalid schedule for zone {zone.id}: {ex}") from None
+    raise ValueError(f"unknown operation {name!r}")
+
+
+def parse_batch(operations, get_zone):
+    """
+    Validates every operation of a batch.
+    Returns:
+        tuple[list[BatchOperation], list[str]]: The parsed valid operations
+            and the error of each operation, None for the valid ones.
+    """
+    parsed = []
+    errors = []
+    for operation in operations:
+        try:
+            parsed.append(parse_operation(operation, get_zone))
+            errors.append(None)
+        except ValueError as ex:
+            errors.append(str(ex))
+    return parsed, errors
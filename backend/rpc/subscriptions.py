@@ -0,0 +1,250 @@
+"""
+This module provides SubscriptionDispatcher, which pushes the events of an
+EventHub to rpyc callbacks registered by remote clients.
+"""
+
+import collections
+import itertools
+import logging
+import threading
+import time
+import rpyc
+from backend.datatype.zone_snapshot import EVENT_NAME, EVENT_ZONE_ID, encode_event
+
+HEARTBEAT = "HEARTBEAT"
+EXECUTOR_STALLED = "EXECUTOR_STALLED"
+
+
+class _Subscriber:
+    """A callback with its filter, its pending events and its in-flight calls."""
+
+    def __init__(self, subscription_id, callback, events, zone_ids, heartbeat):
+        self.id = subscription_id
+        self.callback = callback
+        self.events = events
+        self.zone_ids = zone_ids
+        self.heartbeat = heartbeat
+        self.pending = collections.deque()
+        # Calls sent and not answered yet, and why the last one failed
+        self.in_flight = 0
+        self.failure = None
+        if isinstance(callback, rpyc.BaseNetref):
+            # Sends the request without waiting for the client to run it
+            self.send = rpyc.async_(callback)
+        else:
+            self.send = callback
+
+    def wants(self, event):
+        if self.events is not None and event[EVENT_NAME] not in self.events:
+            return False
+        zone_id = event[EVENT_ZONE_ID]
+        return self.zone_ids is None or zone_id is None or zone_id in self.zone_ids
+
+    def is_disconnected(self):
+        if not isinstance(self.callback, rpyc.BaseNetref):
+            return False
+        return object.__getattribute__(self.callback, "____conn__").closed
+
+
+class SubscriptionDispatcher:
+    """
+    Delivers every event of an EventHub to the matching subscribers.
+    A single thread, woken by the hub, reads the events and calls the
+    callbacks asynchronously, so neither the control loop nor the RPC
+    threads ever wait for a client.
+    Each subscriber has at most max_in_flight undelivered calls and
+    max_queue_size queued events; a subscriber that falls further behind, or
+    whose connection fails, is evicted. When no event happens for
+    heartbeat_interval seconds a heartbeat is sent, EXECUTOR_STALLED instead
+    of HEARTBEAT if is_alive() returns False.
+    """
+
+    def __init__(
+        self,
+        event_hub,
+        is_alive=None,
+        max_queue_size: int = 256,
+        max_in_flight: int = 32,
+        heartbeat_interval: float = 5.0,
+    ):
+        self._event_hub = event_hub
+        self._is_alive = is_alive
+        self._max_queue_size = max_queue_size
+        self._max_in_flight = max_in_flight
+        self._heartbeat_interval = heartbeat_interval
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._wakeup = threading.Condition()
+        self._changed = False
+        self._thread = None
+        self._stop = False
+        self.delivered = 0
+        self.evicted = 0
+
+    def subscribe(self, callback, event_filter=None):
+        """
+        Registers a callable(version, event) for the events matching a filter.
+        Args:
+            callback: Called with the version and the event tuple, see
+                zone_snapshot.encode_event.
+            event_filter (dict, optional): "events", the event names to
+                receive; "zone_ids", the zones to receive events of;
+                "heartbeat", False to receive no heartbeat. Missing keys
+                match everything.
+        Returns:
+            int: The id to pass to unsubscribe.
+        """
+        # Copied once: reading a remote dict later costs a round trip per key
+        event_filter = dict(event_filter or {})
+        events = event_filter.get("events")
+        zone_ids = event_filter.get("zone_ids")
+        subscriber = _Subscriber(
+            next(self._ids),
+            callback,
+            None if events is None else frozenset(str(name) for name in events),
+            None if zone_ids is None else frozenset(int(x) for x in zone_ids),
+            bool(event_filter.get("heartbeat", True)),
+        )
+        with self._lock:
+            self._subscribers[subscriber.id] = subscriber
+        self.start()
+        return subscriber.id
+
+    def unsubscribe(self, subscription_id):
+        """
+        Removes a subscription; unknown ids are ignored.
+        """
+        with self._lock:
+            self._subscribers.pop(subscription_id, None)
+
+    def start(self):
+        """
+        Starts the dispatcher thread if it is not running.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop = False
+            self._event_hub.add_listener(self._wake)
+            # Read here so that no event published after start() is missed
+            since = self._event_hub.version
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(since,),
+                name="SubscriptionDispatcher",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """
+        Stops the dispatcher thread.
+        """
+        self._stop = True
+        self._event_hub.remove_listener(self._wake)
+        self._wake()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self):
+        """
+        Returns the number of subscribers and delivery counters.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        return {
+            "subscribers": len(subscribers),
+            "pending": sum(len(s.pending) for s in subscribers),
+            "in_flight": sum(s.in_flight for s in subscribers),
+            "delivered": self.delivered,
+            "evicted": self.evicted,
+        }
+
+    def _wake(self):
+        # Called on new events, replies of callbacks and stop
+        with self._wakeup:
+            self._changed = True
+            self._wakeup.notify()
+
+    def _run(self, since):
+        next_heartbeat = time.monotonic() + self._heartbeat_interval
+        while not self._stop:
+            with self._wakeup:
+                if not self._changed:
+                    self._wakeup.wait(max(0, next_heartbeat - time.monotonic()))
+                self._changed = False
+            if self._stop:
+                break
+            events, _ = self._event_hub.events_since(since)
+            if events:
+                since = events[-1][0]
+                next_heartbeat = time.monotonic() + self._heartbeat_interval
+            elif since > self._event_hub.version:
+                # The hub has been reset
+                since = self._event_hub.version
+            if time.monotonic() >= next_heartbeat:
+                events.append((since, self._heartbeat()))
+                next_heartbeat = time.monotonic() + self._heartbeat_interval
+            with self._lock:
+                subscribers = list(self._subscribers.values())
+            for subscriber in subscribers:
+                self._enqueue(subscriber, events)
+                self._deliver(subscriber)
+
+    def _heartbeat(self):
+        if self._is_alive is None or self._is_alive():
+            return encode_event(HEARTBEAT)
+        return encode_event(EXECUTOR_STALLED)
+
+    def _enqueue(self, subscriber, events):
+        for version, event in events:
+            if event[EVENT_NAME] in (HEARTBEAT, EXECUTOR_STALLED):
+                if subscriber.heartbeat:
+                    subscriber.pending.append((version, event))
+            elif subscriber.wants(event):
+                subscriber.pending.append((version, event))
+
+    def _on_reply(self, subscriber, result):
+        # Runs on the thread that receives the reply of the client
+        with self._wakeup:
+            subscriber.in_flight -= 1
+            if result.error:
+                subscriber.failure = "callback raised"
+            self._changed = True
+            self._wakeup.notify()
+
+    def _deliver(self, subscriber):
+        try:
+            if subscriber.failure is not None:
+                self._evict(subscriber, subscriber.failure)
+                return
+            if subscriber.is_disconnected():
+                self._evict(subscriber, "disconnected")
+                return
+            while subscriber.pending and subscriber.in_flight < self._max_in_flight:
+                version, event = subscriber.pending.popleft()
+                result = subscriber.send(version, event)
+                if isinstance(result, rpyc.AsyncResult):
+                    with self._wakeup:
+                        subscriber.in_flight += 1
+                    result.add_callback(
+                        lambda result, subscriber=subscriber: self._on_reply(
+                            subscriber, result
+                        )
+                    )
+                self.delivered += 1
+        except Exception as ex:
+            self._evict(subscriber, f"callback failed: {ex}")
+            return
+        if len(subscriber.pending) > self._max_queue_size:
+            self._evict(subscriber, "too many undelivered events")
+
+    def _evict(self, subscriber, reason):
+        with self._lock:
+            if self._subscribers.pop(subscriber.id, None) is None:
+                return
+        subscriber.pending.clear()
+        self.evicted += 1
+        logging.warning("Evicted subscription %s: %s", subscriber.id, reason)
@@ -0,0 +1,100 @@
+"""
+Unit tests for the parsing of batch operations.
+"""
+
+import datetime
+import unittest
+from backend.datatype.irrigation_info import IrrigationInfo
+from backend.datatype.zone import Zone
+from backend.db.SqlLite import SqlLite
+from backend.rpc import batch
+
+
+class TestBatch(unittest.TestCase):
+    """
+    Test suite for parse_operation and parse_batch.
+    """
+
+    db = None
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Set up the test database, where override_close logs.
+        """
+        cls.db = SqlLite.get_instance()
+        cls.db.CreateDb()
+
+    @classmethod
+    def tearDownClass(cls):
+        """
+        Remove the test database after running tests.
+        """
+        cls.db.RemoveDb()
+
+    def setUp(self):
+        """
+        Two zones, the second one with a schedule entry and override closed.
+        """
+        self.zones = {1: Zone("front", 1), 2: Zone("back", 2)}
+        for zone_id, zone in self.zones.items():
+            zone.set_id(zone_id)
+        info = IrrigationInfo(datetime.time(6, 0), 120)
+        info.id = 40
+        self.zones[2].set_irrigation_info([info])
+        self.zones[2].override_close()
+
+    def get_zone(self, zone_id):
+        return self.zones[zone_id]
+
+    def test_parse_operations(self):
+        """
+        Test that valid operations are returned with their zone and schedule.
+        """
+        operation = batch.parse_operation((batch.OP_OPEN, 1), self.get_zone)
+        self.assertEqual(operation.name, batch.OP_OPEN)
+        self.assertIs(operation.zone, self.zones[1])
+        operation = batch.parse_operation(
+            (batch.OP_SET_SCHEDULE, 2, ((40, "07:00:00", 60, (0, 1)),)),
+            self.get_zone,
+        )
+        self.assertEqual(len(operation.irrigation_info), 1)
+        self.assertEqual(operation.irrigation_info[0].id, 40)
+        self.assertEqual(operation.irrigation_info[0].day_of_the_week, [0, 1])
+
+    def test_invalid_operations(self):
+        """
+        Test that every kind of invalid operation is reported.
+        """
+        invalid = [
+            ("water", 1),
+            (batch.OP_OPEN, 99),
+            (batch.OP_OPEN, 2),
+            (batch.OP_CLOSE, 1, "extra"),
+            (batch.OP_SET_SCHEDULE, 1),
+            (batch.OP_SET_SCHEDULE, 1, ((40, "07:00:00", 60, (0,)),)),
+            (batch.OP_SET_SCHEDULE, 1, ((-1, "25:00:00", 60, (0,)),)),
+            (batch.OP_SET_SCHEDULE, 1, ((-1, "07:00:00", 0, (0,)),)),
+            (batch.OP_SET_SCHEDULE, 1, ((-1, "07:00:00", 60, (7,)),)),
+            "open",
+            None,
+        ]
+        for operation in invalid:
+            with self.subTest(operation=operation):
+                with self.assertRaises(ValueError):
+                    batch.parse_operation(operation, self.get_zone)
+
+    def test_parse_batch(self):
+        """
+        Test that parse_batch reports the error of each operation.
+        """
+        parsed, errors = batch.parse_batch(
+            [(batch.OP_OPEN, 1), (batch.OP_OPEN, 99)], self.get_zone
+        )
+        self.assertEqual(len(parsed), 1)
+        self.assertIsNone(errors[0])
+        self.assertIn("99", errors[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+"""
+Unit tests for SubscriptionDispatcher: verifies filtering, heartbeats and
+eviction of subscribers, locally and through rpyc callbacks.
+"""
+
+import threading
+import time
+import unittest
+import rpyc
+from rpyc.utils.server import ThreadedServer
+from backend.datatype.zone_snapshot import encode_event
+from backend.rpc.subscriptions import (
+    EXECUTOR_STALLED,
+    HEARTBEAT,
+    SubscriptionDispatcher,
+)
+from backend.utils.event_hub import EventHub
+
+
+class _FakeZone:
+    """Just what encode_event reads of a zone."""
+
+    def __init__(self, zone_id):
+        self.id = zone_id
+
+    def is_open(self):
+        return True
+
+    def is_override(self):
+        return False
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestSubscriptionDispatcher(unittest.TestCase):
+    """
+    Test suite for SubscriptionDispatcher.
+    """
+
+    def setUp(self):
+        """
+        Create a hub and a dispatcher with a short heartbeat.
+        """
+        self.hub = EventHub()
+        self.alive = True
+        self.dispatcher = SubscriptionDispatcher(
+            self.hub, is_alive=lambda: self.alive, heartbeat_interval=0.2
+        )
+
+    def tearDown(self):
+        """
+        Stop the dispatcher thread.
+        """
+        self.dispatcher.stop(5)
+
+    def test_filtered_delivery(self):
+        """
+        Test that subscribers receive only the events matching their filter.
+        """
+        everything = []
+        zone_two = []
+        self.dispatcher.subscribe(lambda v, e: everything.append(e[0:2]))
+        self.dispatcher.subscribe(
+            lambda v, e: zone_two.append(e[0:2]),
+            {"events": ["OPENED"], "zone_ids": [2], "heartbeat": False},
+        )
+        self.hub.publish(encode_event("OPENED", _FakeZone(1)))
+        self.hub.publish(encode_event("OPENED", _FakeZone(2)))
+        self.hub.publish(encode_event("CLOSED", _FakeZone(2)))
+        self.assertTrue(_wait_until(lambda: len(everything) >= 3))
+        self.assertEqual(everything[:3], [("OPENED", 1), ("OPENED", 2), ("CLOSED", 2)])
+        self.assertEqual(zone_two, [("OPENED", 2)])
+
+    def test_heartbeats(self):
+        """
+        Test that idle subscribers get heartbeats telling if the executor runs.
+        """
+        received = []
+        self.dispatcher.subscribe(lambda v, e: received.append(e[0]))
+        self.assertTrue(_wait_until(lambda: HEARTBEAT in received))
+        self.alive = False
+        self.assertTrue(_wait_until(lambda: EXECUTOR_STALLED in received))
+
+    def test_failing_callback_is_evicted(self):
+        """
+        Test that a subscriber whose callback raises is removed.
+        """
+
+        def broken(version, event):
+            raise RuntimeError("gone")
+
+        self.dispatcher.subscribe(broken)
+        self.hub.publish(encode_event("OPENED", _FakeZone(1)))
+        self.assertTrue(_wait_until(lambda: self.dispatcher.evicted == 1))
+        self.assertEqual(self.dispatcher.stats()["subscribers"], 0)
+
+
+class SubscriptionService(rpyc.Service):
+    """
+    Exposes a dispatcher as RpcService does.
+    """
+
+    dispatcher = None
+
+    def exposed_Subscribe(self, callback, filter=None):
+        return SubscriptionService.dispatcher.subscribe(callback, filter)
+
+
+class TestRemoteSubscriptions(unittest.TestCase):
+    """
+    Test suite for subscriptions of remote rpyc callbacks.
+    """
+
+    def setUp(self):
+        """
+        Serve a dispatcher over rpyc.
+        """
+        self.hub = EventHub()
+        SubscriptionService.dispatcher = SubscriptionDispatcher(
+            self.hub, max_queue_size=32, max_in_flight=4, heartbeat_interval=60
+        )
+        self.server = ThreadedServer(SubscriptionService, port=0)
+        threading.Thread(target=self.server.start, daemon=True).start()
+        _wait_until(lambda: self.server.active)
+
+    def tearDown(self):
+        """
+        Stop the server and the dispatcher.
+        """
+        self.server.close()
+        SubscriptionService.dispatcher.stop(5)
+
+    def test_events_reach_a_serving_client(self):
+        """
+        Test that events are pushed to a client serving its connection.
+        """
+        received = []
+        conn = rpyc.connect("localhost", self.server.port)
+        serving = rpyc.BgServingThread(conn, serve_interval=0.1, sleep_interval=0)
+        conn.root.Subscribe(lambda v, e: received.append(v))
+        for zone_id in range(20):
+            self.hub.publish(encode_event("OPENED", _FakeZone(zone_id)))
+        self.assertTrue(_wait_until(lambda: len(received) == 20))
+        self.assertEqual(received, list(range(1, 21)))
+        serving.stop()
+        conn.close()
+
+    def test_slow_consumer_is_evicted(self):
+        """
+        Test that a client that never handles its callbacks is evicted.
+        """
+        conn = rpyc.connect("localhost", self.server.port)
+        conn.root.Subscribe(lambda v, e: None)
+        dispatcher = SubscriptionService.dispatcher
+        for zone_id in range(50):
+            self.hub.publish(encode_event("OPENED", _FakeZone(zone_id)))
+        self.assertTrue(_wait_until(lambda: dispatcher.evicted == 1))
+        self.assertEqual(dispatcher.stats()["subscribers"], 0)
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+"""
+Unit tests for PriorityWorkerPool and BoundedThreadedServer.
+"""
+
+import threading
+import time
+import unittest
+import rpyc
+from rpyc.utils.server import ThreadedServer
+from backend.rpc.worker_pool import (
+    BoundedThreadedServer,
+    Lane,
+    PriorityWorkerPool,
+    ServiceBusyError,
+    in_lane,
+)
+
+
+def _wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not met in time")
+        time.sleep(0.005)
+
+
+class TestPriorityWorkerPool(unittest.TestCase):
+    """
+    Test suite for the lanes and the admission control of the pool.
+    """
+
+    def setUp(self):
+        """
+        A pool with one safety worker and one worker for every lane.
+        """
+        self.pool = PriorityWorkerPool(
+            workers=2, max_queue_size={Lane.READ: 2}, queue_timeout=10
+        )
+        self.pool.start()
+        self.release = threading.Event()
+        self.threads = []
+
+    def tearDown(self):
+        """
+        Release the blocked calls and stop the pool.
+        """
+        self.release.set()
+        for thread in self.threads:
+            thread.join(5)
+        self.pool.stop(5)
+
+    def submit(self, lane, function, *args):
+        thread = threading.Thread(
+            target=self.pool.run, args=(lane, function, *args), daemon=True
+        )
+        thread.start()
+        self.threads.append(thread)
+
+    def block_general_worker(self):
+        self.submit(Lane.READ, self.release.wait)
+        _wait_until(lambda: self.pool.stats()["busy"] == 1)
+
+    def test_safety_calls_do_not_wait_for_reads(self):
+        """
+        Test that a safety call runs while reads keep the other worker busy.
+        """
+        self.block_general_worker()
+        self.submit(Lane.READ, time.sleep, 0)
+        started = time.monotonic()
+        self.assertEqual(self.pool.run(Lane.SAFETY, lambda: "closed"), "closed")
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(self.pool.stats()["read_depth"], 1)
+
+    def test_higher_lanes_first(self):
+        """
+        Test that queued commands run before reads queued earlier.
+        """
+        order = []
+        self.block_general_worker()
+        self.submit(Lane.READ, order.append, "read")
+        self.submit(Lane.COMMAND, order.append, "command")
+        _wait_until(lambda: self.pool.stats()["command_depth"] == 1)
+        _wait_until(lambda: self.pool.stats()["read_depth"] == 1)
+        self.release.set()
+        _wait_until(lambda: len(order) == 2)
+        self.assertEqual(order, ["command", "read"])
+
+    def test_full_lane_is_refused(self):
+        """
+        Test that reads over the queue limit are refused and counted.
+        """
+        self.block_general_worker()
+        self.submit(Lane.READ, time.sleep, 0)
+        self.submit(Lane.READ, time.sleep, 0)
+        _wait_until(lambda: self.pool.stats()["read_depth"] == 2)
+        with self.assertRaises(ServiceBusyError):
+            self.pool.run(Lane.READ, time.sleep, 0)
+        stats = self.pool.stats()
+        self.assertEqual(stats["read_rejected"], 1)
+        self.assertEqual(stats["read_max_depth"], 2)
+
+    def test_expired_calls_are_dropped(self):
+        """
+        Test that a call waiting longer than queue_timeout is not run.
+        """
+        self.pool.stop(5)
+        self.pool = PriorityWorkerPool(workers=2, queue_timeout=0.05)
+        self.pool.start()
+        self.block_general_worker()
+        calls = []
+        errors = []
+
+        def run_read():
+            try:
+                self.pool.run(Lane.READ, calls.append, "read")
+            except ServiceBusyError as ex:
+                errors.append(ex)
+
+        thread = threading.Thread(target=run_read)
+        thread.start()
+        time.sleep(0.1)
+        self.release.set()
+        thread.join(5)
+        self.assertEqual(calls, [])
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(self.pool.stats()["read_expired"], 1)
+
+    def test_errors_reach_the_caller(self):
+        """
+        Test that exceptions of a call are raised to the caller.
+        """
+        with self.assertRaises(ZeroDivisionError):
+            self.pool.run(Lane.COMMAND, lambda: 1 / 0)
+        self.assertEqual(self.pool.stats()["command_completed"], 1)
+
+
+class LaneService(rpyc.Service):
+    """Service running its calls in the lanes of worker_pool."""
+
+    worker_pool = None
+
+    @in_lane(Lane.READ)
+    def exposed_thread_name(self):
+        return threading.current_thread().name
+
+
+class TestRpcLanes(unittest.TestCase):
+    """
+    Test suite for in_lane and BoundedThreadedServer over a real connection.
+    """
+
+    def start_server(self, server_class, **kwargs):
+        server = server_class(LaneService, port=0, **kwargs)
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        _wait_until(lambda: server.active)
+        self.addCleanup(server.close)
+        return server
+
+    def test_calls_run_on_workers(self):
+        """
+        Test that decorated methods run on the pool, or inline without one.
+        """
+        server = self.start_server(ThreadedServer)
+        conn = rpyc.connect("localhost", server.port)
+        self.addCleanup(conn.close)
+        self.assertFalse(conn.root.thread_name().startswith("RpcWorker"))
+        LaneService.worker_pool = PriorityWorkerPool(workers=2)
+        LaneService.worker_pool.start()
+        self.addCleanup(setattr, LaneService, "worker_pool", None)
+        self.addCleanup(LaneService.worker_pool.stop, 5)
+        self.assertEqual(conn.root.thread_name(), "RpcWorker-1")
+
+    def test_connections_over_the_limit_are_refused(self):
+        """
+        Test that a client over max_connections is disconnected.
+        """
+        server = self.start_server(BoundedThreadedServer, max_connections=1)
+        first = rpyc.connect("localhost", server.port)
+        self.addCleanup(first.close)
+        first.ping()
+        with self.assertRaises(EOFError):
+            second = rpyc.connect("localhost", server.port)
+            self.addCleanup(second.close)
+            second.ping()
+        self.assertEqual(server.refused_connections, 1)
+        first.close()
+        _wait_until(lambda: server._connections == 0)
+        third = rpyc.connect("localhost", server.port)
+        self.addCleanup(third.close)
+        third.ping()
+
+
+if __name__ == "__main__":
+    unittest.main()
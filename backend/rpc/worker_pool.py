@@ -0,0 +1,261 @@
+"""
+This module provides PriorityWorkerPool, a fixed set of threads running RPC
+calls by priority lane, and BoundedThreadedServer, an rpyc server with a
+limit on concurrent connections.
+"""
+
+import collections
+import functools
+import threading
+import time
+from enum import Enum
+from rpyc.utils.server import ThreadedServer
+
+
+class Lane(Enum):
+    """Priority of an RPC call, highest first."""
+
+    # Closing valves and stopping the service
+    SAFETY = 0
+    # Other state changes
+    COMMAND = 1
+    # Read-only calls
+    READ = 2
+
+
+class ServiceBusyError(RuntimeError):
+    """Raised when a call is refused because its lane is full."""
+
+
+class _Task:
+    def __init__(self, lane, function, args, kwargs):
+        self.lane = lane
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _LaneStats:
+    def __init__(self):
+        self.max_depth = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.expired = 0
+        self.completed = 0
+        self.max_wait = 0.0
+
+
+class PriorityWorkerPool:
+    """
+    Runs calls on a fixed number of threads, always taking the queued call of
+    the highest priority lane first.
+    safety_workers of the workers only run SAFETY calls, so that closing a
+    valve never waits for the other workers to finish slow reads. COMMAND and
+    READ calls are refused with ServiceBusyError when their lane already
+    holds max_queue_size calls, and dropped if they waited in the queue
+    longer than queue_timeout seconds; SAFETY calls are always accepted.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        safety_workers: int = 1,
+        max_queue_size: dict = None,
+        queue_timeout: float = 10.0,
+    ):
+        if workers <= safety_workers:
+            raise ValueError("At least one worker must serve every lane")
+        if max_queue_size is None:
+            max_queue_size = {Lane.COMMAND: 32, Lane.READ: 64}
+        self._workers = workers
+        self._safety_workers = safety_workers
+        self._max_queue_size = max_queue_size
+        self._queue_timeout = queue_timeout
+        self._queues = {lane: collections.deque() for lane in Lane}
+        self._stats = {lane: _LaneStats() for lane in Lane}
+        self._condition = threading.Condition()
+        self._threads = []
+        self._busy = 0
+        self._stopping = False
+
+    def start(self):
+        """
+        Starts the worker threads.
+        """
+        with self._condition:
+            if self._threads:
+                return
+            self._stopping = False
+            for number in range(self._workers):
+                lanes = (Lane.SAFETY,) if number < self._safety_workers else tuple(Lane)
+                thread = threading.Thread(
+                    target=self._run,
+                    args=(lanes,),
+                    name=f"RpcWorker-{number}",
+                    daemon=True,
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    def stop(self, timeout: float = None):
+        """
+        Stops the workers; queued calls fail with ServiceBusyError.
+        """
+        with self._condition:
+            self._stopping = True
+            threads = self._threads
+            self._threads = []
+            self._condition.notify_all()
+        for thread in threads:
+            thread.join(timeout)
+
+    def run(self, lane: Lane, function, *args, **kwargs):
+        """
+        Queues a call in a lane and waits for its result.
+        Args:
+            lane (Lane): The priority of the call.
+            function: The callable to run on a worker.
+        Returns:
+            The value returned by function; its exceptions are raised here.
+        Raises:
+            ServiceBusyError: If the lane is full, the call waited too long
+                or the pool is stopped.
+        """
+        task = _Task(lane, function, args, kwargs)
+        with self._condition:
+            if self._stopping or not self._threads:
+                raise ServiceBusyError("RPC worker pool not running")
+            stats = self._stats[lane]
+            queue = self._queues[lane]
+            limit = self._max_queue_size.get(lane)
+            if limit is not None and len(queue) >= limit:
+                stats.rejected += 1
+                raise ServiceBusyError(f"Too many {lane.name.lower()} calls queued")
+            queue.append(task)
+            stats.submitted += 1
+            stats.max_depth = max(stats.max_depth, len(queue))
+            self._condition.notify_all()
+        task.done.wait()
+        if task.error is not None:
+            raise task.error
+        return task.result
+
+    def stats(self):
+        """
+        Returns the queue depth and the counters of every lane.
+        """
+        with self._condition:
+            stats = {"workers": self._workers, "busy": self._busy}
+            for lane in Lane:
+                name = lane.name.lower()
+                lane_stats = self._stats[lane]
+                stats[f"{name}_depth"] = len(self._queues[lane])
+                stats[f"{name}_max_depth"] = lane_stats.max_depth
+                stats[f"{name}_submitted"] = lane_stats.submitted
+                stats[f"{name}_rejected"] = lane_stats.rejected
+                stats[f"{name}_expired"] = lane_stats.expired
+                stats[f"{name}_completed"] = lane_stats.completed
+                stats[f"{name}_max_wait_ms"] = round(lane_stats.max_wait * 1000, 3)
+            return stats
+
+    def _next_task(self, lanes):
+        # Called with the condition held
+        for lane in lanes:
+            if self._queues[lane]:
+                return self._queues[lane].popleft()
+        return None
+
+    def _run(self, lanes):
+        while True:
+            with self._condition:
+                task = self._next_task(lanes)
+                while task is None and not self._stopping:
+                    self._condition.wait()
+                    task = self._next_task(lanes)
+                if task is None:
+                    break
+                waited = time.monotonic() - task.enqueued_at
+                stats = self._stats[task.lane]
+                stats.max_wait = max(stats.max_wait, waited)
+                if task.lane != Lane.SAFETY and waited > self._queue_timeout:
+                    stats.expired += 1
+                    task.error = ServiceBusyError("Call waited too long in queue")
+                    task.done.set()
+                    continue
+                self._busy += 1
+            try:
+                task.result = task.function(*task.args, **task.kwargs)
+            except BaseException as ex:
+                task.error = ex
+            with self._condition:
+                self._busy -= 1
+                stats.completed += 1
+            task.done.set()
+        self._fail_queued(lanes)
+
+    def _fail_queued(self, lanes):
+        with self._condition:
+            for lane in lanes:
+                while self._queues[lane]:
+                    task = self._queues[lane].popleft()
+                    task.error = ServiceBusyError("RPC worker pool stopped")
+                    task.done.set()
+
+
+def in_lane(lane: Lane):
+    """
+    Decorates a method of a service with a worker_pool attribute so that it
+    runs in the given lane of the pool, or directly if worker_pool is None.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.worker_pool is None:
+                return method(self, *args, **kwargs)
+            return self.worker_pool.run(lane, method, self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class BoundedThreadedServer(ThreadedServer):
+    """
+    ThreadedServer serving at most max_connections clients at a time; the
+    connections over the limit are closed as soon as they are accepted.
+    """
+
+    def __init__(self, *args, max_connections: int = 16, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._max_connections = max_connections
+        self._connections = 0
+        self._connections_lock = threading.Lock()
+        self.refused_connections = 0
+
+    def _accept_method(self, sock):
+        with self._connections_lock:
+            if self._connections >= self._max_connections:
+                self.refused_connections += 1
+                refused = True
+            else:
+                self._connections += 1
+                refused = False
+        if refused:
+            self.logger.warning("Too many connections, refusing a client")
+            sock.close()
+            return
+        threading.Thread(
+            target=self._serve_and_release, args=(sock,), daemon=True
+        ).start()
+
+    def _serve_and_release(self, sock):
+        try:
+            self._authenticate_and_serve_client(sock)
+        finally:
+            with self._connections_lock:
+                self._connections -= 1
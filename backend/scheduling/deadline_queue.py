@@ -0,0 +1,128 @@
+"""
+This module provides the DeadlineQueue class, a min-heap of upcoming zone
+transitions the Executor sleeps on when running in event-driven mode.
+"""
+
+import datetime
+import heapq
+import itertools
+import threading
+import time
+from enum import Enum
+
+
+class DeadlineKind(Enum):
+    """Kind of transition a deadline refers to."""
+
+    OPEN = 1
+    CLOSE = 2
+    EMERGENCY = 3
+
+
+class DeadlineQueue:
+    """
+    Min-heap of (deadline, zone, kind) entries guarded by a condition variable.
+    The entries of a zone are always replaced as a whole by schedule(); the
+    superseded ones are discarded lazily when they reach the top of the heap.
+    """
+
+    # Deadlines are "strictly passed" checks in Zone, wake up just after them.
+    _WAKE_MARGIN_SECONDS = 0.001
+
+    def __init__(self, clock=datetime.datetime.now):
+        self._clock = clock
+        self._heap = []
+        self._generation = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._woken = False
+
+    def schedule(self, zone, deadlines):
+        """
+        Replaces the pending deadlines of a zone.
+        Args:
+            zone (Zone): The zone the deadlines belong to.
+            deadlines (list[tuple[datetime.datetime, DeadlineKind]]): New deadlines.
+        """
+        with self._condition:
+            generation = self._generation.get(zone.id, 0) + 1
+            self._generation[zone.id] = generation
+            for deadline, kind in deadlines:
+                heapq.heappush(
+                    self._heap,
+                    (deadline, next(self._sequence), generation, zone, kind),
+                )
+            self._condition.notify()
+
+    def remove(self, zone):
+        """
+        Drops every pending deadline of a zone.
+        Args:
+            zone (Zone): The zone to forget.
+        """
+        self.schedule(zone, [])
+
+    def wake(self):
+        """
+        Interrupts wait_for_due(), e.g. because a command changed a zone state.
+        """
+        with self._condition:
+            self._woken = True
+            self._condition.notify()
+
+    def next_deadline(self):
+        """
+        Returns the earliest pending deadline, or None if nothing is scheduled.
+        """
+        with self._condition:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def wait_for_due(self, max_wait_seconds=None):
+        """
+        Blocks until a deadline has passed, wake() is called or max_wait_seconds
+        elapse, whichever comes first.
+        Args:
+            max_wait_seconds (float, optional): Upper bound for the sleep.
+        Returns:
+            tuple[list[tuple[Zone, DeadlineKind]], bool]: The due entries, which are
+            removed from the queue, and whether the wait was interrupted by wake().
+        """
+        give_up_at = None
+        if max_wait_seconds is not None:
+            give_up_at = time.monotonic() + max_wait_seconds
+        with self._condition:
+            while True:
+                now = self._clock()
+                if self._woken:
+                    self._woken = False
+                    return self._pop_due(now), True
+                self._discard_stale()
+                if self._heap and self._heap[0][0] < now:
+                    return self._pop_due(now), False
+                timeout = None
+                if self._heap:
+                    timeout = (self._heap[0][0] - now).total_seconds()
+                    timeout += self._WAKE_MARGIN_SECONDS
+                if give_up_at is not None:
+                    remaining = give_up_at - time.monotonic()
+                    if remaining <= 0:
+                        return [], False
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+                self._condition.wait(timeout)
+
+    def _discard_stale(self):
+        while self._heap:
+            _, _, generation, zone, _ = self._heap[0]
+            if self._generation.get(zone.id) == generation:
+                return
+            heapq.heappop(self._heap)
+
+    def _pop_due(self, now):
+        due = []
+        self._discard_stale()
+        while self._heap and self._heap[0][0] < now:
+            _, _, _, zone, kind = heapq.heappop(self._heap)
+            due.append((zone, kind))
+            self._discard_stale()
+        return due
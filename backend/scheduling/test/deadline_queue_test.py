@@ -0,0 +1,88 @@
+"""
+Unit tests for DeadlineQueue: verifies ordering, replacement and wake up of
+scheduled zone deadlines.
+"""
+
+import datetime
+import threading
+import unittest
+from backend.datatype.zone import Zone
+from backend.scheduling.deadline_queue import DeadlineKind, DeadlineQueue
+
+
+class TestDeadlineQueue(unittest.TestCase):
+    """
+    Test suite for DeadlineQueue.
+    """
+
+    def setUp(self):
+        """
+        Create a queue driven by a controllable clock.
+        """
+        self.now = datetime.datetime(2025, 6, 2, 10, 0, 0)
+        self.queue = DeadlineQueue(clock=lambda: self.now)
+
+    def _zone(self, zone_id):
+        zone = Zone(f"test{zone_id}", zone_id)
+        zone.set_id(zone_id)
+        return zone
+
+    def test_due_deadlines_are_returned_in_order(self):
+        """
+        Test that only passed deadlines are popped, earliest first.
+        """
+        zone_1 = self._zone(1)
+        zone_2 = self._zone(2)
+        self.queue.schedule(
+            zone_1, [(self.now - datetime.timedelta(seconds=1), DeadlineKind.CLOSE)]
+        )
+        self.queue.schedule(
+            zone_2,
+            [
+                (self.now - datetime.timedelta(seconds=2), DeadlineKind.OPEN),
+                (self.now + datetime.timedelta(hours=1), DeadlineKind.EMERGENCY),
+            ],
+        )
+        due, woken = self.queue.wait_for_due(0)
+        self.assertFalse(woken)
+        self.assertEqual(
+            due, [(zone_2, DeadlineKind.OPEN), (zone_1, DeadlineKind.CLOSE)]
+        )
+        self.assertEqual(
+            self.queue.next_deadline(), self.now + datetime.timedelta(hours=1)
+        )
+
+    def test_schedule_replaces_previous_deadlines(self):
+        """
+        Test that rescheduling a zone discards its previous deadlines.
+        """
+        zone = self._zone(1)
+        self.queue.schedule(
+            zone, [(self.now - datetime.timedelta(seconds=1), DeadlineKind.OPEN)]
+        )
+        self.queue.schedule(
+            zone, [(self.now + datetime.timedelta(minutes=5), DeadlineKind.CLOSE)]
+        )
+        due, _ = self.queue.wait_for_due(0)
+        self.assertEqual(due, [])
+        self.queue.remove(zone)
+        self.assertIsNone(self.queue.next_deadline())
+
+    def test_wake_interrupts_the_wait(self):
+        """
+        Test that wake() returns control before the next deadline.
+        """
+        zone = self._zone(1)
+        self.queue.schedule(
+            zone, [(self.now + datetime.timedelta(hours=5), DeadlineKind.OPEN)]
+        )
+        timer = threading.Timer(0.05, self.queue.wake)
+        timer.start()
+        due, woken = self.queue.wait_for_due(5)
+        timer.join()
+        self.assertTrue(woken)
+        self.assertEqual(due, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Unit tests for TickStats: verifies the rolling histograms of the ticks.
+"""
+
+import unittest
+from backend.scheduling.tick_stats import BUCKET_BOUNDS_MS, TickStats
+
+
+def _counts(histogram):
+    return {bound: count for bound, count in histogram if count}
+
+
+class TestTickStats(unittest.TestCase):
+    """
+    Test suite for TickStats.
+    """
+
+    def test_empty(self):
+        """
+        Test the statistics before any tick.
+        """
+        snapshot = TickStats().snapshot()
+        self.assertEqual(snapshot["ticks"], 0)
+        self.assertEqual(snapshot["lateness_max_ms"], 0.0)
+        self.assertEqual(len(snapshot["work_ms"]), len(BUCKET_BOUNDS_MS) + 1)
+
+    def test_buckets(self):
+        """
+        Test that ticks are counted in the bucket of their upper bound.
+        """
+        stats = TickStats()
+        stats.record(-0.002, 0.0005)
+        stats.record(0.003, 0.015)
+        stats.record(0.003, 9.0, overrun=True)
+        snapshot = stats.snapshot()
+        self.assertEqual(_counts(snapshot["lateness_ms"]), {1: 1, 5: 2})
+        self.assertEqual(_counts(snapshot["work_ms"]), {1: 1, 20: 1, None: 1})
+        self.assertEqual(snapshot["overruns"], 1)
+        self.assertAlmostEqual(snapshot["lateness_max_ms"], 3.0)
+        self.assertAlmostEqual(snapshot["work_max_ms"], 9000.0)
+
+    def test_window(self):
+        """
+        Test that ticks leaving the window leave the histograms too.
+        """
+        stats = TickStats(window=2)
+        stats.record(0.5, 0.5, overrun=True)
+        stats.record(0.0, 0.0)
+        stats.record(0.0, 0.0)
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot["ticks"], 2)
+        self.assertEqual(snapshot["overruns"], 0)
+        self.assertEqual(snapshot["total_ticks"], 3)
+        self.assertEqual(snapshot["total_overruns"], 1)
+        self.assertEqual(_counts(snapshot["lateness_ms"]), {1: 2})
+        self.assertEqual(snapshot["lateness_max_ms"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Unit tests for VectorizedEvaluator: verifies it takes the same decisions as
+the per-zone checks of the Executor.
+"""
+
+import datetime
+import random
+import unittest
+from backend.db.SqlLite import SqlLite
+from backend.datatype.zone import Zone
+from backend.datatype.irrigation_info import IrrigationInfo
+from backend.scheduling.vectorized_evaluator import VectorizedEvaluator, np
+
+
+def _build_zones(seed):
+    generator = random.Random(seed)
+    zones = []
+    for zone_id in range(1, 21):
+        irrigation_info = [
+            IrrigationInfo(
+                datetime.time(generator.randrange(24), generator.randrange(60)),
+                generator.choice([60, 120, 300]),
+                generator.sample(range(7), generator.randrange(1, 8)),
+            )
+            for _ in range(generator.randrange(4))
+        ]
+        zone = Zone(f"zone{zone_id}", zone_id, irrigation_info)
+        zone.set_id(zone_id)
+        zones.append(zone)
+    return zones
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestVectorizedEvaluator(unittest.TestCase):
+    """
+    Test suite for VectorizedEvaluator.
+    """
+
+    db = None
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Set up the test database before running tests.
+        """
+        cls.db = SqlLite.get_instance()
+        cls.db.CreateDb()
+
+    @classmethod
+    def tearDownClass(cls):
+        """
+        Remove the test database after running tests.
+        """
+        cls.db.RemoveDb()
+
+    def test_same_decisions_as_per_zone_checks(self):
+        """
+        Test that a day of ticks leaves every zone in the same state with both
+        evaluation backends.
+        """
+        vectorized_zones = _build_zones(7)
+        reference_zones = _build_zones(7)
+        evaluator = VectorizedEvaluator(vectorized_zones)
+        moment = datetime.datetime(2025, 6, 2, 0, 0, 30)
+        while moment < datetime.datetime(2025, 6, 3, 0, 0, 30):
+            current_time = moment.time()
+            current_day = moment.weekday()
+            for zone in reference_zones:
+                zone.check_if_need_to_open(current_time, current_day)
+            for zone in reference_zones:
+                zone.check_if_need_to_close(current_time)
+            for zone in reference_zones:
+                zone.check_emergency_closing(moment)
+            evaluator.evaluate(current_time, current_day)
+            self.assertEqual(
+                [zone.is_open() for zone in vectorized_zones],
+                [zone.is_open() for zone in reference_zones],
+                moment,
+            )
+            moment += datetime.timedelta(seconds=45)
+
+    def test_zone_opened_after_the_tick_time_is_kept_open(self):
+        """
+        Test that a zone opened just after the time of the tick was taken is
+        kept open, as the per-zone check does.
+        """
+        vectorized_zone = Zone("test", 1, [])
+        reference_zone = Zone("test", 2, [])
+        evaluator = VectorizedEvaluator([vectorized_zone])
+        vectorized_zone.override_open(True)
+        reference_zone.override_open(True)
+        evaluator.sync_zone(vectorized_zone)
+        opened = datetime.datetime.combine(
+            datetime.date.today(), vectorized_zone.get_open_time()
+        )
+        tick = opened - datetime.timedelta(seconds=1)
+        evaluator.evaluate(tick.time(), tick.weekday())
+        reference_zone.check_emergency_closing(tick)
+        self.assertEqual(reference_zone.is_open(), True)
+        self.assertEqual(vectorized_zone.is_open(), True)
+        vectorized_zone.override_open(False)
+        reference_zone.override_open(False)
+
+    def test_state_changes_outside_the_evaluator_are_synced(self):
+        """
+        Test that an override close reported with sync_zone prevents opening.
+        """
+        zone = Zone("test", 1, [IrrigationInfo(datetime.time(10, 20, 0), 120)])
+        evaluator = VectorizedEvaluator([zone])
+        zone.override_close()
+        evaluator.sync_zone(zone)
+        evaluator.evaluate(datetime.time(10, 20, 30), 2)
+        self.assertEqual(zone.is_open(), False)
+
+    def test_schedule_edits_are_picked_up_after_invalidate(self):
+        """
+        Test that a new schedule is used once the evaluator is invalidated.
+        """
+        zone = Zone("test", 1, [])
+        evaluator = VectorizedEvaluator([zone])
+        zone.set_irrigation_info([IrrigationInfo(datetime.time(10, 20, 0), 120)])
+        evaluator.invalidate()
+        evaluator.evaluate(datetime.time(10, 20, 30), 2)
+        self.assertEqual(zone.is_open(), True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Unit tests for WeeklySchedule: verifies the compiled seconds-of-week lookups.
+"""
+
+import datetime
+import unittest
+from backend.datatype.irrigation_info import IrrigationInfo
+from backend.scheduling.weekly_schedule import (
+    SECONDS_PER_DAY,
+    WeeklySchedule,
+    seconds_of_week,
+)
+
+
+class TestWeeklySchedule(unittest.TestCase):
+    """
+    Test suite for WeeklySchedule.
+    """
+
+    def test_every_schedule_of_the_day_is_found(self):
+        """
+        Test that a later schedule is active even if an earlier one is over.
+        """
+        morning = IrrigationInfo(datetime.time(5, 0, 0), 120)
+        afternoon = IrrigationInfo(datetime.time(13, 0, 0), 120)
+        schedule = WeeklySchedule([morning, afternoon])
+        active = schedule.find_active(seconds_of_week(2, datetime.time(13, 1, 0)))
+        self.assertIs(active[0], afternoon)
+        self.assertEqual(active[1], seconds_of_week(2, datetime.time(13, 2, 0)))
+        self.assertIsNone(schedule.find_active(seconds_of_week(2, datetime.time(9))))
+
+    def test_window_bounds_are_exclusive(self):
+        """
+        Test that the zone is not active exactly at the start or end time.
+        """
+        schedule = WeeklySchedule([IrrigationInfo(datetime.time(10, 0, 0), 60)])
+        start = seconds_of_week(0, datetime.time(10, 0, 0))
+        self.assertIsNone(schedule.find_active(start))
+        self.assertIsNotNone(schedule.find_active(start + 1))
+        self.assertIsNone(schedule.find_active(start + 60))
+
+    def test_long_window_is_found_after_a_shorter_one_starts(self):
+        """
+        Test overlapping windows: the one still running is returned.
+        """
+        long_one = IrrigationInfo(datetime.time(10, 0, 0), 3600)
+        short_one = IrrigationInfo(datetime.time(10, 10, 0), 60)
+        schedule = WeeklySchedule([long_one, short_one])
+        active = schedule.find_active(seconds_of_week(4, datetime.time(10, 30, 0)))
+        self.assertIs(active[0], long_one)
+
+    def test_day_of_the_week_is_respected(self):
+        """
+        Test that a schedule is only active on its days.
+        """
+        schedule = WeeklySchedule([IrrigationInfo(datetime.time(10, 0, 0), 60, [1])])
+        self.assertIsNone(
+            schedule.find_active(seconds_of_week(0, datetime.time(10, 0, 30)))
+        )
+        self.assertIsNotNone(
+            schedule.find_active(seconds_of_week(1, datetime.time(10, 0, 30)))
+        )
+
+    def test_sunday_window_continues_on_monday(self):
+        """
+        Test that a window crossing the end of the week wraps around.
+        """
+        schedule = WeeklySchedule([IrrigationInfo(datetime.time(23, 59, 0), 120, [6])])
+        self.assertIsNotNone(
+            schedule.find_active(seconds_of_week(0, datetime.time(0, 0, 30)))
+        )
+        self.assertIsNone(
+            schedule.find_active(seconds_of_week(0, datetime.time(0, 1, 30)))
+        )
+
+    def test_seconds_until_next_start(self):
+        """
+        Test the distance to the next start, including the weekly wrap.
+        """
+        schedule = WeeklySchedule([IrrigationInfo(datetime.time(10, 0, 0), 60, [0])])
+        self.assertEqual(
+            schedule.seconds_until_next_start(seconds_of_week(0, datetime.time(9))),
+            3600,
+        )
+        self.assertEqual(
+            schedule.seconds_until_next_start(seconds_of_week(0, datetime.time(11))),
+            7 * SECONDS_PER_DAY - 3600,
+        )
+        self.assertIsNone(WeeklySchedule([]).seconds_until_next_start(0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+This module provides TickStats, a rolling histogram of how late the Executor
+ticks start and how long their work takes.
+"""
+
+import bisect
+import collections
+import threading
+
+# Upper bounds of the histogram buckets, in milliseconds; the last bucket
+# holds everything above the last bound
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def _bucket(milliseconds):
+    return bisect.bisect_left(BUCKET_BOUNDS_MS, milliseconds)
+
+
+class TickStats:
+    """
+    Keeps the lateness and work duration of the last window ticks, with the
+    bucket counts updated as ticks enter and leave the window.
+    Lateness is how long after its deadline a tick started; an overrun is a
+    tick whose work ended after the deadline of the next one.
+    """
+
+    def __init__(self, window: int = 1000):
+        # (lateness_ms, work_ms, overrun)
+        self._ticks = collections.deque(maxlen=window)
+        self._lateness = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self._work = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self._lock = threading.Lock()
+        self.total_ticks = 0
+        self.total_overruns = 0
+
+    def record(self, lateness: float, work: float, overrun: bool = False):
+        """
+        Adds a tick.
+        Args:
+            lateness (float): Seconds between the deadline and the start of
+                the tick, negative if early.
+            work (float): Seconds the work of the tick took.
+            overrun (bool): True if the next deadline was missed.
+        """
+        tick = (max(0.0, lateness * 1000), work * 1000, overrun)
+        with self._lock:
+            if len(self._ticks) == self._ticks.maxlen:
+                oldest = self._ticks[0]
+                self._lateness[_bucket(oldest[0])] -= 1
+                self._work[_bucket(oldest[1])] -= 1
+            self._ticks.append(tick)
+            self._lateness[_bucket(tick[0])] += 1
+            self._work[_bucket(tick[1])] += 1
+            self.total_ticks += 1
+            if overrun:
+                self.total_overruns += 1
+
+    def snapshot(self):
+        """
+        Returns the statistics of the window.
+        Returns:
+            dict: "ticks" and "overruns" in the window and since the start,
+                "lateness_max_ms", "work_max_ms", and "lateness_ms" and
+                "work_ms" as ((upper_bound_ms, count), ...), None being the
+                bound of the last bucket.
+        """
+        with self._lock:
+            ticks = list(self._ticks)
+            lateness = list(self._lateness)
+            work = list(self._work)
+            total_ticks = self.total_ticks
+            total_overruns = self.total_overruns
+        bounds = BUCKET_BOUNDS_MS + (None,)
+        return {
+            "ticks": len(ticks),
+            "overruns": sum(1 for tick in ticks if tick[2]),
+            "total_ticks": total_ticks,
+            "total_overruns": total_overruns,
+            "lateness_max_ms": max((tick[0] for tick in ticks), default=0.0),
+            "work_max_ms": max((tick[1] for tick in ticks), default=0.0),
+            "lateness_ms": tuple(zip(bounds, lateness, strict=True)),
+            "work_ms": tuple(zip(bounds, work, strict=True)),
+        }
@@ -0,0 +1,155 @@
+"""
+This module provides the VectorizedEvaluator class, which computes the open,
+close and emergency decisions of every zone of a tick with NumPy array
+operations instead of one Python call per zone.
+"""
+
+import threading
+from backend.scheduling.weekly_schedule import (
+    SECONDS_PER_DAY,
+    seconds_of_day,
+    seconds_of_week,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class VectorizedEvaluator:
+    """
+    Keeps the compiled schedule windows and the state of all zones in NumPy
+    arrays. Zone objects are only touched to apply the resulting transitions;
+    changes made outside the evaluator must be reported with sync_zone() or,
+    for schedule edits, invalidate().
+    """
+
+    def __init__(self, zones):
+        if np is None:
+            raise RuntimeError("numpy is required by the vectorized evaluator")
+        self._lock = threading.RLock()
+        self._zones = []
+        self._zone_index = {}
+        self._dirty = True
+        self.rebuild(zones)
+
+    def rebuild(self, zones):
+        """
+        Reloads schedules and states of the given zones into the arrays.
+        Args:
+            zones (list[Zone]): The zones to evaluate from now on.
+        """
+        with self._lock:
+            self._zones = list(zones)
+            self._zone_index = {id(zone): index for index, zone in enumerate(zones)}
+            starts, ends, owners, irrigation = [], [], [], []
+            for index, zone in enumerate(self._zones):
+                schedule = zone.get_schedule()
+                starts.extend(schedule.starts)
+                ends.extend(schedule.ends)
+                owners.extend([index] * len(schedule.starts))
+                irrigation.extend(schedule.irrigation)
+            self._window_start = np.array(starts, dtype=np.float64)
+            self._window_end = np.array(ends, dtype=np.float64)
+            self._window_owner = np.array(owners, dtype=np.int64)
+            self._window_irrigation = irrigation
+            count = len(self._zones)
+            self._is_open = np.zeros(count, dtype=bool)
+            self._is_override_open = np.zeros(count, dtype=bool)
+            self._is_override_close = np.zeros(count, dtype=bool)
+            self._active_start = np.zeros(count, dtype=np.float64)
+            self._active_length = np.zeros(count, dtype=np.float64)
+            self._open_time = np.full(count, np.nan, dtype=np.float64)
+            self._max_open_seconds = np.array(
+                [zone.get_max_open_seconds() for zone in self._zones],
+                dtype=np.float64,
+            )
+            for zone in self._zones:
+                self.sync_zone(zone)
+            self._dirty = False
+
+    def invalidate(self):
+        """
+        Marks the schedule windows as stale, they are rebuilt on the next tick.
+        """
+        self._dirty = True
+
+    def sync_zone(self, zone):
+        """
+        Copies the current state of a zone into the arrays.
+        Args:
+            zone (Zone): A zone that changed state outside the evaluator.
+        """
+        with self._lock:
+            index = self._zone_index.get(id(zone))
+            if index is None:
+                return
+            is_open = zone.is_open()
+            self._is_open[index] = is_open
+            self._is_override_open[index] = zone.is_override()
+            self._is_override_close[index] = zone.is_override_close()
+            active = zone.get_active_irrigation()
+            if is_open and not zone.is_override() and active is not None:
+                self._active_start[index] = seconds_of_day(active.time_to_start)
+                self._active_length[index] = active.for_how_many_seconds
+            open_time = zone.get_open_time() if is_open else None
+            self._open_time[index] = (
+                np.nan if open_time is None else seconds_of_day(open_time)
+            )
+
+    def evaluate(self, current_time, current_day_of_the_week):
+        """
+        Opens, closes and emergency closes every zone that needs it.
+        Args:
+            current_time (datetime.time): The time of the tick.
+            current_day_of_the_week (int): The weekday of the tick, 0 is Monday.
+        """
+        with self._lock:
+            if self._dirty:
+                self.rebuild(self._zones)
+            second_of_week = seconds_of_week(current_day_of_the_week, current_time)
+            second_of_day = seconds_of_day(current_time)
+
+            active = np.flatnonzero(
+                (self._window_start < second_of_week)
+                & (self._window_end > second_of_week)
+            )
+            owners = self._window_owner[active]
+            # Per zone, keep the active window that ends last
+            order = np.lexsort((-self._window_end[active], owners))
+            zone_indexes, first = np.unique(owners[order], return_index=True)
+            windows = active[order][first]
+            can_open = (
+                ~self._is_open[zone_indexes] & ~self._is_override_close[zone_indexes]
+            )
+            for index, window in zip(
+                zone_indexes[can_open], windows[can_open], strict=True
+            ):
+                zone = self._zones[index]
+                zone.open_for_schedule(self._window_irrigation[window])
+                self.sync_zone(zone)
+
+            elapsed = np.mod(second_of_day - self._active_start, SECONDS_PER_DAY)
+            to_close = (
+                self._is_open
+                & ~self._is_override_open
+                & (elapsed > self._active_length)
+            )
+            for index in np.flatnonzero(to_close):
+                zone = self._zones[index]
+                zone.close_for_schedule()
+                self.sync_zone(zone)
+
+            # As in Zone.get_open_datetime, an open time up to half a day
+            # after the tick is one taken after the tick started, not one of
+            # yesterday: the zone has not been open for any time yet
+            open_for = np.mod(second_of_day - self._open_time, SECONDS_PER_DAY)
+            with np.errstate(invalid="ignore"):
+                open_for[open_for > SECONDS_PER_DAY / 2] = 0
+                too_long = open_for > self._max_open_seconds
+            to_emergency_close = self._is_open & (np.isnan(open_for) | too_long)
+            for index in np.flatnonzero(to_emergency_close):
+                zone = self._zones[index]
+                zone.emergency_close()
+                self.sync_zone(zone)
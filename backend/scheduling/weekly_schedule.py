@@ -0,0 +1,109 @@
+"""
+This module provides the WeeklySchedule class, a compiled view of a zone's
+irrigation info as sorted seconds-of-week intervals.
+"""
+
+import bisect
+
+SECONDS_PER_DAY = 24 * 60 * 60
+SECONDS_PER_WEEK = 7 * SECONDS_PER_DAY
+
+
+def seconds_of_day(time_of_day):
+    """
+    Converts a datetime.time into seconds since midnight.
+    Args:
+        time_of_day (datetime.time): The time to convert.
+    Returns:
+        float: Seconds since midnight.
+    """
+    return (
+        time_of_day.hour * 3600
+        + time_of_day.minute * 60
+        + time_of_day.second
+        + time_of_day.microsecond / 1_000_000
+    )
+
+
+def seconds_of_week(day_of_the_week, time_of_day):
+    """
+    Converts a weekday (0 is Monday) and a datetime.time into seconds since
+    Monday midnight.
+    """
+    return day_of_the_week * SECONDS_PER_DAY + seconds_of_day(time_of_day)
+
+
+class WeeklySchedule:
+    """
+    Sorted, immutable array of the [start, end) seconds-of-week windows a zone
+    must be open in. Built once from a list of IrrigationInfo, it answers
+    "which irrigation is active now" with a binary search.
+    """
+
+    def __init__(self, irrigation_info):
+        intervals = []
+        for irrigation in irrigation_info:
+            start_of_day = seconds_of_day(irrigation.time_to_start)
+            for day in set(irrigation.day_of_the_week):
+                start = day * SECONDS_PER_DAY + start_of_day
+                end = start + irrigation.for_how_many_seconds
+                intervals.append((start, end, irrigation))
+                if end > SECONDS_PER_WEEK:
+                    # A Sunday window running past midnight goes on on Monday
+                    intervals.append(
+                        (start - SECONDS_PER_WEEK, end - SECONDS_PER_WEEK, irrigation)
+                    )
+        intervals.sort(key=lambda interval: (interval[0], interval[1]))
+        self.starts = [interval[0] for interval in intervals]
+        self.ends = [interval[1] for interval in intervals]
+        self.irrigation = [interval[2] for interval in intervals]
+        # _latest_end[i] is the index of the window ending last among 0..i, so
+        # that a long window is still found when shorter ones start after it.
+        self._latest_end = []
+        latest = 0
+        for index, end in enumerate(self.ends):
+            if end > self.ends[latest]:
+                latest = index
+            self._latest_end.append(latest)
+        self._first_week_start = bisect.bisect_left(self.starts, 0)
+        self.source = irrigation_info
+        self.source_length = len(irrigation_info)
+
+    def is_compiled_from(self, irrigation_info):
+        """
+        Returns True if the schedule was built from this list and it has not
+        grown or shrunk since. In place edits of an IrrigationInfo are not
+        detected, recompile explicitly after them.
+        """
+        return self.source is irrigation_info and self.source_length == len(
+            irrigation_info
+        )
+
+    def find_active(self, second_of_week):
+        """
+        Finds the irrigation whose window strictly contains the given instant.
+        Args:
+            second_of_week (float): Seconds since Monday midnight.
+        Returns:
+            tuple[IrrigationInfo, float] or None: The active irrigation and the
+            second of week its window ends at, or None if nothing is scheduled.
+        """
+        index = bisect.bisect_left(self.starts, second_of_week) - 1
+        if index < 0:
+            return None
+        latest = self._latest_end[index]
+        if self.ends[latest] > second_of_week:
+            return self.irrigation[latest], self.ends[latest]
+        return None
+
+    def seconds_until_next_start(self, second_of_week):
+        """
+        Returns the seconds from the given instant to the next window start,
+        wrapping to the following week, or None if the schedule is empty.
+        """
+        if self._first_week_start == len(self.starts):
+            return None
+        index = bisect.bisect_left(self.starts, second_of_week)
+        if index < len(self.starts):
+            return self.starts[index] - second_of_week
+        return self.starts[self._first_week_start] + SECONDS_PER_WEEK - second_of_week
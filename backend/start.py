@@ -1,37 +1,248 @@
+import argparse
 import datetime
 import logging
+import math
 import os
 import sys
 import time
-from backend.datatype.zone import Zone
+from backend.datatype.zone import MAX_OPEN_SECONDS, Zone, ZoneEvent
+from backend.datatype.zone_snapshot import encode_event, encode_logs, encode_snapshot
 from backend.datatype.irrigation_info import IrrigationInfo
+from backend.datatype.log import EventId
 from backend.db.SqlLite import SqlLite
+from backend.hw_io.actuator import Actuator
 from backend.hw_io.gpio import PiGpio
 from backend.dao.zone_dao import ZoneDAO
+from backend.dao.irrigation_info_dao import IrrigationInfoDAO
+from backend.dao.persistent_log_dao import PersistentLogDAO
+from backend.dao.persistent_log_writer import LogDurability
+from backend.scheduling.deadline_queue import DeadlineQueue
+from backend.scheduling.tick_stats import TickStats
+from backend.scheduling.vectorized_evaluator import VectorizedEvaluator
+from backend.rpc import batch
+from backend.rpc.subscriptions import SubscriptionDispatcher
+from backend.rpc.worker_pool import (
+    BoundedThreadedServer,
+    Lane,
+    PriorityWorkerPool,
+    in_lane,
+)
+from backend.utils.event_hub import EventHub
+from backend.utils.log_pipeline import LogPipeline
 import rpyc
 from threading import Thread
 import threading
 
 
 class Executor:
+    # Ordered view of the zones, replaced (never mutated) on every change so
+    # that loops over it never see a zone being added or removed
     zone_list = []
+    _zones_by_id = {}
+    _zones_lock = threading.Lock()
+    # Held while the zones are evaluated and while a batch is applied, so
+    # that a batch never interleaves with a tick or another batch
+    _command_lock = threading.RLock()
+    _close_all_lock_seconds = 1
+    _close_all_flush_seconds = 1
+    # Writes the pins while Main runs, closing any valve left open for longer
+    # than the emergency timeout plus this grace
+    _actuator = None
+    _watchdog_grace_seconds = 5
     _current_day_of_the_week = 0
     _current_time = datetime.time()
+    _current_datetime = None
     _sleep_milliseconds_time = 800
     _thread = None
     _stop_executor = False
     _db = None
     _instance = None
     _service_instance = None
+    # _monotonic() of the end of the last tick
     _last_run = None
+    # Lateness and work duration of the recent ticks
+    _tick_stats = TickStats()
+    _use_event_scheduler = False
+    # Wall clock the zones are evaluated and scheduled against, and clock
+    # of the tick deadlines and of AmIRunning
+    _clock = datetime.datetime.now
+    _monotonic = time.monotonic
+    _deadline_queue = None
+    _max_idle_seconds = 60
+    _use_vectorized_evaluation = False
+    _evaluator = None
+    # Every zone state or schedule change is published here; the version of
+    # the last event is the state version
+    _event_hub = EventHub()
+    # Longest wait of a GetEventsSince call
+    _max_event_wait_seconds = 30
+    # Pushes the events of _event_hub to remote subscribers
+    _subscriptions = None
 
     def LoadZone(self):
         return ZoneDAO.get_zone_by_id()
 
+    def SetZones(self, zones):
+        with self._zones_lock:
+            for zone in self.zone_list:
+                zone.remove_state_listener(self.OnZoneStateChanged)
+            for zone in zones:
+                zone.add_state_listener(self.OnZoneStateChanged)
+            self._zones_by_id = {zone.id: zone for zone in zones}
+            self.zone_list = list(zones)
+            if self._evaluator is not None:
+                self._evaluator.rebuild(self.zone_list)
+        self.PublishEvent("ZONES_LOADED")
+        self.Wake()
+
+    def GetZone(self, zone_id):
+        # Raises KeyError for an unknown id
+        try:
+            return self._zones_by_id[zone_id]
+        except KeyError:
+            raise KeyError(f"Unknown zone {zone_id}") from None
+
+    def AddZone(self, zone):
+        with self._zones_lock:
+            if zone.id in self._zones_by_id:
+                raise ValueError(f"Zone {zone.id} already loaded")
+            zone.add_state_listener(self.OnZoneStateChanged)
+            self._zones_by_id = {**self._zones_by_id, zone.id: zone}
+            self.zone_list = self.zone_list + [zone]
+            if self._evaluator is not None:
+                self._evaluator.rebuild(self.zone_list)
+        self.PublishEvent("ZONE_ADDED", zone)
+        self.Wake()
+
+    def RemoveZone(self, zone_id):
+        with self._zones_lock:
+            zone = self.GetZone(zone_id)
+            zones_by_id = dict(self._zones_by_id)
+            del zones_by_id[zone_id]
+            self._zones_by_id = zones_by_id
+            self.zone_list = [x for x in self.zone_list if x is not zone]
+            zone.remove_state_listener(self.OnZoneStateChanged)
+            if self._evaluator is not None:
+                self._evaluator.rebuild(self.zone_list)
+            if self._deadline_queue is not None:
+                self._deadline_queue.remove(zone)
+        if zone.is_open():
+            zone.override_open(False)
+        self.PublishEvent("ZONE_REMOVED", zone)
+        self.Wake()
+        return zone
+
+    def PublishEvent(self, name, zone=None):
+        return self._event_hub.publish(encode_event(name, zone))
+
+    def GetStateVersion(self):
+        return self._event_hub.version
+
+    def GetEventsSince(self, version, timeout=0):
+        # Returns (version, complete, ((version, event), ...)), where version
+        # is the one to ask from next; when not complete some events are lost
+        # and the state must be reloaded
+        timeout = min(max(timeout, 0), self._max_event_wait_seconds)
+        events, complete = self._event_hub.wait_for_events(version, timeout)
+        if events:
+            version = events[-1][0]
+        elif not complete:
+            version = self._event_hub.version
+        return (version, complete, tuple(events))
+
+    def ExecuteBatch(self, operations):
+        # Applies every operation or none. They are all validated first, then
+        # applied in order in one critical section, writing their logs and
+        # schedules in one transaction and their pins with one write. If one
+        # fails while applied, the transaction is rolled back, the logs are
+        # dropped and the zones are restored to their state before the batch.
+        # Returns (applied, results) with one (ok, error) result per
+        # operation, see backend.rpc.batch.
+        with self._command_lock:
+            parsed, errors = batch.parse_batch(operations, self.GetZone)
+            if any(error is not None for error in errors):
+                return (
+                    False,
+                    tuple((False, error or batch.NOT_APPLIED) for error in errors),
+                )
+            states = {}
+            for operation in parsed:
+                zone = operation.zone
+                states.setdefault(id(zone), (zone, zone.save_state()))
+
+            def restore_zones():
+                for zone, state in states.values():
+                    zone.restore_state(state)
+
+            failed = None
+            try:
+                with (
+                    SqlLite.get_instance().Transaction(),
+                    PersistentLogDAO.batch(),
+                    PiGpio.instance().Batch(),
+                ):
+                    try:
+                        for operation in parsed:
+                            failed = operation
+                            self.ApplyOperation(operation)
+                        failed = None
+                    except Exception:
+                        # Within the pin batch: the pins are written once,
+                        # with the levels they had
+                        restore_zones()
+                        raise
+            except Exception as ex:
+                if failed is None:
+                    # Writing the logs or committing failed
+                    restore_zones()
+                    self.LogInformation("Batch commit failed: %s", ex, is_error=True)
+                else:
+                    self.LogInformation(
+                        "Batch %s of zone %s failed: %s",
+                        failed.name,
+                        failed.zone.id,
+                        ex,
+                        is_error=True,
+                    )
+                return (
+                    False,
+                    tuple(
+                        (False, str(ex))
+                        if failed is None or operation is failed
+                        else (False, batch.ROLLED_BACK)
+                        for operation in parsed
+                    ),
+                )
+        return (True, ((True, None),) * len(parsed))
+
+    def ApplyOperation(self, operation):
+        zone = operation.zone
+        if operation.name == batch.OP_OPEN:
+            zone.override_open(True)
+        elif operation.name == batch.OP_CLOSE:
+            zone.override_open(False)
+        elif operation.name == batch.OP_OVERRIDE_CLOSE:
+            zone.override_close()
+        elif operation.name == batch.OP_SET_SCHEDULE:
+            IrrigationInfoDAO.replace_irrigation_info(
+                zone.id, operation.irrigation_info
+            )
+            zone.set_irrigation_info(operation.irrigation_info)
+
+    def OnZoneStateChanged(self, zone, event):
+        self.PublishEvent(event.name, zone)
+        if self._evaluator is not None:
+            if event == ZoneEvent.SCHEDULE_CHANGED:
+                self._evaluator.invalidate()
+            else:
+                self._evaluator.sync_zone(zone)
+        self.Wake()
+
     def SetCurrentTimeInformation(self):
-        now = datetime.datetime.now()
+        now = self._clock()
         self._current_day_of_the_week = now.weekday()
         self._current_time = now.time()
+        self._current_datetime = now
 
     def CheckIfHaveToOpenAnyZone(self):
         for zone in self.zone_list:
@@ -45,78 +256,234 @@ class Executor:
 
     def CheckIfAZoneIsOpenForTooManyTime(self):
         for zone in self.zone_list:
-            zone.check_emergency_closing(self._current_time)
+            zone.check_emergency_closing(self._current_datetime)
 
-    def CloseAll(self):
+    def ScheduleZone(self, zone, now):
+        deadlines = zone.get_next_deadlines(now)
+        # A zone still due right after being evaluated must not spin the loop
+        not_before = now + datetime.timedelta(
+            milliseconds=self._sleep_milliseconds_time
+        )
+        self._deadline_queue.schedule(
+            zone, [(max(deadline, not_before), kind) for deadline, kind in deadlines]
+        )
+
+    def ScheduleAllZones(self):
+        now = self._clock()
         for zone in self.zone_list:
-            zone.override_open(False)
+            self._deadline_queue.schedule(zone, zone.get_next_deadlines(now))
+
+    def RunEventLoop(self):
+        self.ScheduleAllZones()
+        while not self._stop_executor:
+            deadline = self._deadline_queue.next_deadline()
+            due, woken = self._deadline_queue.wait_for_due(self._max_idle_seconds)
+            if self._stop_executor:
+                break
+            started = self._monotonic()
+            lateness = 0.0
+            if due and deadline is not None:
+                lateness = (self._clock() - deadline).total_seconds()
+            self.SetCurrentTimeInformation()
+            due_zones = list({id(zone): zone for zone, _ in due}.values())
+            with self._command_lock:
+                for zone in due_zones:
+                    zone.check_if_need_to_open(
+                        self._current_time, self._current_day_of_the_week
+                    )
+                    zone.check_if_need_to_close(self._current_time)
+                    zone.check_emergency_closing(self._current_datetime)
+            self.SetLastRun()
+            if woken or not due_zones:
+                # Commands or wall clock jumps can move any deadline
+                self.ScheduleAllZones()
+            else:
+                now = self._clock()
+                for zone in due_zones:
+                    self.ScheduleZone(zone, now)
+            if due:
+                self._tick_stats.record(lateness, self._monotonic() - started)
+
+    def RunPollingLoop(self):
+        # Ticks target fixed time.monotonic() deadlines, so the period does
+        # not grow with the work of each tick nor drift over time
+        period = self._sleep_milliseconds_time / 1000
+        next_tick = self._monotonic()
+        while not self._stop_executor:
+            started = self._monotonic()
+            self.SetCurrentTimeInformation()
+            with self._command_lock:
+                self.EvaluateZones()
+            self.SetLastRun()
+            finished = self._monotonic()
+            lateness = started - next_tick
+            next_tick += period
+            overrun = finished > next_tick
+            if overrun:
+                # Skip the missed ticks instead of running them back to back
+                next_tick += (math.floor((finished - next_tick) / period) + 1) * period
+            self._tick_stats.record(lateness, finished - started, overrun)
+            self.WaitUntil(next_tick)
+
+    def UseEventScheduler(self, enabled=True):
+        self._use_event_scheduler = enabled
+
+    def Wake(self):
+        if self._deadline_queue is not None:
+            self._deadline_queue.wake()
+
+    def UseVectorizedEvaluation(self, enabled=True):
+        self._use_vectorized_evaluation = enabled
+
+    def EvaluateZones(self):
+        if self._evaluator is not None:
+            self._evaluator.evaluate(self._current_time, self._current_day_of_the_week)
+            return
+        self.CheckIfHaveToOpenAnyZone()
+        self.CheckIfHaveToCloseAnyZone()
+        self.CheckIfAZoneIsOpenForTooManyTime()
+
+    def CloseAll(self):
+        # Emergency path: every pin is closed in one call before anything
+        # that can be slow or fail, the logs are written afterwards in bulk
+        zones = self.zone_list
+        pins = [zone.gpio_pin for zone in zones]
+        PiGpio.instance().ClosePins(pins)
+        # Do not wait forever for a tick or a batch stuck on the database
+        locked = self._command_lock.acquire(timeout=self._close_all_lock_seconds)
+        logs = []
+        try:
+            for zone in zones:
+                try:
+                    log = zone.mark_closed()
+                except Exception as ex:
+                    self.LogInformation(
+                        "Cannot mark zone closed: %s", ex, is_error=True
+                    )
+                    continue
+                if log is not None:
+                    logs.append(log)
+            # A tick may have opened a zone after the first call
+            PiGpio.instance().ClosePins(pins)
+        finally:
+            if locked:
+                self._command_lock.release()
+        try:
+            PersistentLogDAO.add_logs(logs)
+            if not PersistentLogDAO.flush(self._close_all_flush_seconds):
+                self.LogInformation(
+                    "Log writer stalled, the closing of all zones is still queued",
+                    is_error=True,
+                )
+        except Exception as ex:
+            self.LogInformation(
+                "Cannot log the closing of all zones: %s", ex, is_error=True
+            )
+
+    def StartActuator(self):
+        max_open_seconds = max(
+            [zone.get_max_open_seconds() for zone in self.zone_list],
+            default=MAX_OPEN_SECONDS,
+        )
+        self._actuator = Actuator(
+            PiGpio.instance().WritePins,
+            max_open_seconds=max_open_seconds + self._watchdog_grace_seconds,
+            on_watchdog_close=self.OnWatchdogClose,
+        )
+        self._actuator.start()
+        PiGpio.instance().UseActuator(self._actuator)
+
+    def StopActuator(self):
+        if self._actuator is None:
+            return
+        PiGpio.instance().UseActuator(None)
+        self._actuator.stop(timeout=5)
 
-    def Wait(self):
-        time.sleep(self._sleep_milliseconds_time / 1000)
+    def GetActuator(self):
+        return self._actuator
+
+    def OnWatchdogClose(self, pin):
+        # The actuator already closed the pin: bring the zones in line, as a
+        # command would, so that no tick or batch sees them half closed
+        with self._command_lock:
+            for zone in self.zone_list:
+                if zone.gpio_pin == pin and zone.is_open():
+                    self.LogInformation(
+                        "Watchdog closed zone %s, executor stalled?",
+                        zone.id,
+                        is_error=True,
+                    )
+                    zone.emergency_close()
+
+    def WaitUntil(self, deadline):
+        time.sleep(max(0.0, deadline - self._monotonic()))
 
     def SetLastRun(self):
-        self._last_run = datetime.datetime.now()
+        self._last_run = self._monotonic()
+
+    def GetTickStats(self):
+        return self._tick_stats.snapshot()
+
+    def GetMaxTimeBetweenRuns(self):
+        # Up to a period passes between two ticks, plus the lateness of the
+        # next one: running means no whole tick has been missed
+        max_time = datetime.timedelta(milliseconds=2 * self._sleep_milliseconds_time)
+        if self._use_event_scheduler:
+            max_time += datetime.timedelta(seconds=self._max_idle_seconds)
+        return max_time
+
+    def GetSubscriptions(self):
+        return self._subscriptions
 
     def AmIRunning(self):
-        print(self._last_run)
-        print(datetime.datetime.now())
-        print(
-            (self._last_run - datetime.datetime.now())
-            < datetime.timedelta(milliseconds=self._sleep_milliseconds_time)
-        )
-        return (datetime.datetime.now() - self._last_run) < datetime.timedelta(
-            milliseconds=self._sleep_milliseconds_time
-        )
+        if self._last_run is None:
+            return False
+        # Monotonic: wall clock jumps do not make the executor look stalled
+        elapsed = self._monotonic() - self._last_run
+        return elapsed < self.GetMaxTimeBetweenRuns().total_seconds()
 
     def SetServiceInstance(self, service):
         self._service_instance = service
-        print("Service instance set")
 
     def Main(self):
         try:
-            print("Setting up pins")
             output_pin = []
-            print("Setting up pins")
             for zone in self.zone_list:
                 output_pin.append(zone.gpio_pin)
-            print("output_pin")
+            self.LogInformation("Setting up pins %s", output_pin)
             PiGpio.instance().SetUp(output_pin)
-            print("===================")
-            print(self.zone_list)
-            print("===================")
-            while not self._stop_executor:
-                print("Runner....")
-                self.SetCurrentTimeInformation()
-                self.CheckIfHaveToOpenAnyZone()
-                self.CheckIfHaveToCloseAnyZone()
-                self.CheckIfAZoneIsOpenForTooManyTime()
-                self.SetLastRun()
-                self.Wait()
+            self.StartActuator()
+            if self._use_vectorized_evaluation:
+                self._evaluator = VectorizedEvaluator(self.zone_list)
+            if self._use_event_scheduler:
+                self._deadline_queue = DeadlineQueue(clock=self._clock)
+                self.RunEventLoop()
+            self.RunPollingLoop()
         except Exception as ex:
-            self.LogInformation(f"Critical error in main loop: {ex}", is_error=True)
-            logging.error(f"Main loop error: {ex}")
+            logging.critical("Executor - Critical error in main loop: %s", ex)
             logging.critical("Hardware or database failure - forcing shutdown")
-            print(f"Critical error in main loop: {ex}")
             self.CloseAll()
+            self.StopActuator()
             if self._db:
                 self._db.CloseConnection()
             os._exit(1)
         finally:
             self.CloseAll()
+            self.StopActuator()
             if self._db:
                 self._db.CloseConnection()
             self.Stop()
 
-    def LogInformation(self, message, is_error=False):
-        if is_error:
-            logging.error(f"Executor - {message}")
-        else:
-            logging.info(f"Executor - {message}")
+    def LogInformation(self, message, *args, is_error=False):
+        # message is formatted with args only if the record is written
+        logging.log(
+            logging.ERROR if is_error else logging.INFO, "Executor - " + message, *args
+        )
 
     def Stop(self):
         self._stop_executor = True
+        self.Wake()
         self.LogInformation("Stopping executor")
-        print("Stopping")
 
     def Start(self):
         if self._thread is not None and self._thread.is_alive():
@@ -143,22 +510,33 @@ class Executor:
     @classmethod
     def instance(self):
         if self._instance is None:
-            print("Executor - Creating new instance")
+            logging.debug("Executor - Creating new instance")
             self._instance = self.__new__(self)
+            # Start versions from the clock so that they keep growing across
+            # restarts and clients never take a new state for one they have
+            self._event_hub.reset(time.time_ns() // 1_000_000)
+            self._instance._subscriptions = SubscriptionDispatcher(
+                self._event_hub, is_alive=self._instance.AmIRunning
+            )
         return self._instance
 
 
+# Most log entries sent in one GetLogsPage reply
+MAX_LOG_PAGE_SIZE = 500
+
+
 class RpcService(rpyc.Service):
     executor = None
+    # When set, calls run on its workers by lane instead of on the thread of
+    # the connection
+    worker_pool = None
 
     def StartUp(self):
-        print("Starting up the service...")
+        logging.info("Starting up the service...")
         self._db = SqlLite.get_instance()
-        print("Database instance obtained")
         db_exists = self._db.DbExists()
-        print(f"Database exists: {db_exists}")
         if not db_exists:
-            print("Create db")
+            logging.info("Creating the database")
             self._db.CreateDb()
             zone_to_add_1 = Zone("Zona 1 ", 37)
             zone_to_add_2 = Zone("Zona 2 ", 38)
@@ -193,10 +571,13 @@ class RpcService(rpyc.Service):
             )
             zone_to_add_3.irrigation_info.append(irrigation_info_to_add_1_zone_3)
             zone_to_add_3.irrigation_info.append(irrigation_info_to_add_2_zone_3)
-            ZoneDAO.add_new_irrigator(zone_to_add_1)
-            ZoneDAO.add_new_irrigator(zone_to_add_2)
-            ZoneDAO.add_new_irrigator(zone_to_add_3)
+            ZoneDAO.import_zones([zone_to_add_1, zone_to_add_2, zone_to_add_3])
+        else:
+            self._db.UpgradeDb()
+        PersistentLogDAO.warm_last_events()
+        PersistentLogDAO.warm_recent_logs()
 
+    @in_lane(Lane.COMMAND)
     def exposed_start(self):
         if self._executor.AmIRunning():
             logging.info("Executor already running")
@@ -205,72 +586,221 @@ class RpcService(rpyc.Service):
             self._executor.Start()
             logging.info("Executor started via RPC")
         except Exception as ex:
-            logging.error(f"Error starting executor via RPC: {ex}")
-            print(f"Error starting executor: {ex}")
+            logging.critical("Error starting executor via RPC: %s", ex)
             # Force immediate termination on startup failure
             os._exit(1)
 
     def exposed_stop(self):
         logging.info("Stop requested via RPC")
-        self._executor.Stop()
+        # Waiting for the shutdown must not keep a safety worker busy
+        self.RunInLane(Lane.SAFETY, self._executor.Stop)
         self._executor.WaitForShutdown()
 
+    @in_lane(Lane.SAFETY)
+    def exposed_CloseAll(self):
+        self._executor.CloseAll()
+
+    def RunInLane(self, lane, function, *args):
+        if self.worker_pool is None:
+            return function(*args)
+        return self.worker_pool.run(lane, function, *args)
+
+    def exposed_GetServerStats(self):
+        if self.worker_pool is None:
+            return ()
+        return tuple(self.worker_pool.stats().items())
+
+    @in_lane(Lane.READ)
     def exposed_AmIRunning(self):
         return self._executor.AmIRunning()
 
+    @in_lane(Lane.READ)
+    def exposed_GetStateVersion(self):
+        return self._executor.GetStateVersion()
+
+    def exposed_GetEventsSince(self, version, timeout=0):
+        # Long poll: waits up to timeout seconds for an event after version
+        return self._executor.GetEventsSince(version, timeout)
+
+    def exposed_Subscribe(self, callback, filter=None):
+        # callback(version, event) is called asynchronously: the client must
+        # serve its connection, e.g. with rpyc.BgServingThread
+        return self._executor.GetSubscriptions().subscribe(callback, filter)
+
+    def exposed_Unsubscribe(self, subscription_id):
+        self._executor.GetSubscriptions().unsubscribe(subscription_id)
+
+    def exposed_GetSubscriptionStats(self):
+        return tuple(self._executor.GetSubscriptions().stats().items())
+
+    @in_lane(Lane.READ)
     def exposed_GetIrrigators(self):
-        print(self._executor.zone_list)
         return self._executor.zone_list
 
+    @in_lane(Lane.COMMAND)
     def exposed_OpenZone(self, id: int):
-        thread_id = threading.get_ident()
-        print(f"Thread ID: {thread_id}")
-        zone = next((x for x in self._executor.zone_list if x.id == id), None)
-        zone.OverrideOpen(True)
+        self._executor.GetZone(id).override_open(True)
 
+    @in_lane(Lane.SAFETY)
     def exposed_CloseZone(self, id):
-        zone = next((x for x in self._executor.zone_list if x.id == id), None)
-        zone.OverrideOpen(False)
+        self._executor.GetZone(id).override_open(False)
+
+    @in_lane(Lane.COMMAND)
+    def exposed_ExecuteBatch(self, operations):
+        # Many operations in one round trip, applied together or not at all
+        return self._executor.ExecuteBatch(operations)
 
+    @in_lane(Lane.READ)
     def exposed_GetZoneInfo(self, id):
-        return self._executor.zone_list[id]
+        return self._executor.GetZone(id)
+
+    @in_lane(Lane.READ)
+    def exposed_GetPinStates(self):
+        # Last levels written to the pins, read from the cache of PiGpio
+        return tuple(sorted(PiGpio.instance().GetPinStates().items()))
+
+    @in_lane(Lane.READ)
+    def exposed_GetTickStats(self):
+        # Histograms of how late the ticks started and how long they took
+        return tuple(self._executor.GetTickStats().items())
+
+    @in_lane(Lane.READ)
+    def exposed_GetActuatorStats(self):
+        actuator = self._executor.GetActuator()
+        if actuator is None:
+            return ()
+        return tuple(actuator.stats().items())
+
+    @in_lane(Lane.READ)
+    def exposed_GetZonesSnapshot(self):
+        # Plain tuples: the whole list reaches the client in one round trip
+        return encode_snapshot(self._executor.zone_list)
+
+    @in_lane(Lane.READ)
+    def exposed_GetZoneSnapshot(self, id):
+        zone = self._executor.GetZone(id)
+        return encode_snapshot([zone], with_last_irrigation_date=True)
+
+    @in_lane(Lane.READ)
+    def exposed_GetLogsPage(self, zone_id=None, event=None, cursor=None, page_size=100):
+        # Newest first, returns (log tuples, cursor of the next page or None);
+        # event is the name of an EventId
+        logs, next_cursor = PersistentLogDAO.get_logs_page(
+            zone_id=zone_id,
+            event_id=None if event is None else EventId[event],
+            cursor=None if cursor is None else tuple(cursor),
+            page_size=max(1, min(page_size, MAX_LOG_PAGE_SIZE)),
+        )
+        return encode_logs(logs), next_cursor
+
+    @in_lane(Lane.READ)
+    def exposed_GetRecentLogs(
+        self, zone_id=None, event=None, since=None, within_seconds=None, limit=None
+    ):
+        # From memory, newest first; event is the name of an EventId and since
+        # an ISO 8601 date
+        logs = PersistentLogDAO.get_recent_logs(
+            zone_id=zone_id,
+            event_id=None if event is None else EventId[event],
+            since=None if since is None else datetime.datetime.fromisoformat(since),
+            within_seconds=within_seconds,
+            limit=limit,
+        )
+        return encode_logs(logs)
 
     def __init__(self):
         self._executor = Executor.instance()
         try:
             self.StartUp()
-            self._executor.zone_list = self._executor.LoadZone()
+            self._executor.SetZones(self._executor.LoadZone())
             self._executor.Start()
-            print("Executor started")
             logging.info("Executor started successfully")
         except Exception as ex:
-            logging.error(f"Error starting executor: {ex}")
-            print(f"Error starting executor: {ex}")
+            logging.critical("Error starting executor: %s", ex)
             # Force immediate termination on startup failure
             os._exit(1)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roberta Irrigator service")
+    parser.add_argument(
+        "--event-scheduler",
+        action="store_true",
+        help="sleep until the next schedule transition instead of polling",
+    )
+    parser.add_argument(
+        "--vectorized",
+        action="store_true",
+        help="evaluate all zones of a tick with NumPy (requires numpy)",
+    )
+    parser.add_argument(
+        "--log-durability",
+        choices=[durability.name.lower() for durability in LogDurability],
+        default=LogDurability.BATCHED.name.lower(),
+        help="when valve transition logs are committed to the database",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="run calls on this many workers by priority, safety commands "
+        "first (0: on the thread of each connection)",
+    )
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=32,
+        help="clients served at the same time when --workers is set",
+    )
+    parser.add_argument(
+        "--max-queued-reads",
+        type=int,
+        default=64,
+        help="read calls waiting for a worker before new ones are refused",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=["debug", "info", "warning", "error"],
+        default="info",
+        help="least severe records written to markitiello_irrigator.log "
+        "(debug: also why each tick left a zone unchanged)",
+    )
+    args = parser.parse_args()
     service = None
     server = None
+    # Written by a background thread, rotated every 10 MB into 5 gzip files
+    log_pipeline = LogPipeline(level=getattr(logging, args.log_level.upper()))
+    log_pipeline.start()
     try:
-        logging.basicConfig(
-            format="%(asctime)s %(levelname)-8s %(message)s",
-            filename="markitiello_irrigator.log",
-            encoding="utf-8",
-            level=logging.DEBUG,
-        )
-
         logging.info("Starting Roberta Irrigator service...")
+        Executor.instance().UseEventScheduler(args.event_scheduler)
+        Executor.instance().UseVectorizedEvaluation(args.vectorized)
+        PersistentLogDAO.start_writer(LogDurability[args.log_durability.upper()])
         service = RpcService()
+        protocol_config = {"allow_public_attrs": True, "allow_pickle": True}
+        if args.workers > 0:
+            RpcService.worker_pool = PriorityWorkerPool(
+                workers=args.workers,
+                max_queue_size={
+                    Lane.COMMAND: 32,
+                    Lane.READ: args.max_queued_reads,
+                },
+            )
+            RpcService.worker_pool.start()
+            server = BoundedThreadedServer(
+                service,
+                port=18871,
+                protocol_config=protocol_config,
+                max_connections=args.max_connections,
+            )
+        else:
+            from rpyc.utils.server import ThreadedServer
 
-        from rpyc.utils.server import ThreadedServer
-
-        server = ThreadedServer(
-            service,
-            port=18871,
-            protocol_config={"allow_public_attrs": True, "allow_pickle": True},
-        )
+            server = ThreadedServer(
+                service,
+                port=18871,
+                protocol_config=protocol_config,
+            )
 
         logging.info("RPC Server starting on port 18871")
         server.start()
@@ -278,19 +808,22 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         logging.info("Received shutdown signal")
     except Exception as ex:
-        logging.error(f"Critical server error: {ex}")
-        print(f"Critical error: {ex}")
+        logging.critical("Critical server error: %s", ex)
     finally:
         logging.info("Shutting down service...")
         if service:
             try:
                 service.exposed_stop()
             except Exception as cleanup_ex:
-                logging.error(f"Error during service cleanup: {cleanup_ex}")
+                logging.error("Error during service cleanup: %s", cleanup_ex)
         if server:
             try:
                 server.close()
             except Exception as cleanup_ex:
-                logging.error(f"Error during server cleanup: {cleanup_ex}")
+                logging.error("Error during server cleanup: %s", cleanup_ex)
+        if RpcService.worker_pool is not None:
+            RpcService.worker_pool.stop(timeout=5)
+        PersistentLogDAO.stop_writer()
         logging.info("Service shutdown complete")
+        log_pipeline.stop()
         sys.exit(0)
@@ -0,0 +1,369 @@
+"""
+Unit tests for the Executor: verifies the zone registry used by the RPC
+service, the state events, batch execution, the polling loop with its tick
+and lateness statistics, the event loop across midnight, the watchdog
+closes and CloseAll.
+"""
+
+import datetime
+import sqlite3
+import threading
+import time
+import unittest
+from backend.dao.irrigation_info_dao import IrrigationInfoDAO
+from backend.dao.persistent_log_dao import PersistentLogDAO
+from backend.datatype.irrigation_info import IrrigationInfo
+from backend.datatype.log import EventId
+from backend.datatype.zone import Zone
+from backend.db.SqlLite import SqlLite
+from backend.hw_io.gpio import CLOSED_LEVEL, PiGpio
+from backend.rpc import batch
+from backend.scheduling.deadline_queue import DeadlineQueue
+from backend.scheduling.tick_stats import TickStats
+from backend.start import Executor
+
+
+def _zone(zone_id, gpio_pin):
+    zone = Zone(f"zone{zone_id}", gpio_pin)
+    zone.set_id(zone_id)
+    return zone
+
+
+class TestExecutor(unittest.TestCase):
+    """
+    Test suite for the Executor, run against a test database and the
+    simulated pins.
+    """
+
+    db = None
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Set up the test database before running tests.
+        """
+        cls.db = SqlLite.get_instance()
+        cls.db.CreateDb()
+
+    @classmethod
+    def tearDownClass(cls):
+        """
+        Remove the test database after running tests.
+        """
+        Executor.instance().SetZones([])
+        cls.db.RemoveDb()
+
+    def setUp(self):
+        """
+        Load three zones whose ids differ from their positions.
+        """
+        self.executor = Executor.instance()
+        self.zones = [_zone(7, 1), _zone(3, 2), _zone(12, 3)]
+        self.executor.SetZones(self.zones)
+
+    def test_get_zone_by_id(self):
+        """
+        Test that zones are found by id, not by position.
+        """
+        self.assertIs(self.executor.GetZone(3), self.zones[1])
+        self.assertIs(self.executor.GetZone(12), self.zones[2])
+        with self.assertRaises(KeyError):
+            self.executor.GetZone(0)
+
+    def test_add_and_remove_zone(self):
+        """
+        Test that adding and removing zones keeps lookup and order in sync.
+        """
+        added = _zone(5, 4)
+        self.executor.AddZone(added)
+        self.assertIs(self.executor.GetZone(5), added)
+        self.assertEqual([zone.id for zone in self.executor.zone_list], [7, 3, 12, 5])
+        with self.assertRaises(ValueError):
+            self.executor.AddZone(_zone(5, 6))
+        removed = self.zones[0]
+        removed.override_open(True)
+        self.assertIs(self.executor.RemoveZone(7), removed)
+        self.assertFalse(removed.is_open())
+        self.assertEqual([zone.id for zone in self.executor.zone_list], [3, 12, 5])
+        with self.assertRaises(KeyError):
+            self.executor.GetZone(7)
+        with self.assertRaises(KeyError):
+            self.executor.RemoveZone(7)
+
+    def test_state_version_follows_zone_changes(self):
+        """
+        Test that opening, closing and rescheduling a zone bump the version.
+        """
+        version = self.executor.GetStateVersion()
+        zone = self.executor.GetZone(3)
+        zone.override_open(True)
+        self.assertGreater(self.executor.GetStateVersion(), version)
+        version = self.executor.GetStateVersion()
+        zone.override_open(False)
+        self.assertGreater(self.executor.GetStateVersion(), version)
+        version = self.executor.GetStateVersion()
+        zone.compile_schedule()
+        self.assertGreater(self.executor.GetStateVersion(), version)
+
+    def test_events_since(self):
+        """
+        Test that state changes are published as events readable by version.
+        """
+        version = self.executor.GetStateVersion()
+        zone = self.executor.GetZone(12)
+        zone.override_open(True)
+        zone.emergency_close()
+        next_version, complete, events = self.executor.GetEventsSince(version)
+        self.assertTrue(complete)
+        self.assertEqual(next_version, self.executor.GetStateVersion())
+        self.assertEqual(
+            [(event[0], event[1]) for _, event in events],
+            [("OPENED", 12), ("CLOSED", 12), ("EMERGENCY_CLOSED", 12)],
+        )
+        self.assertEqual(self.executor.GetEventsSince(next_version, 0.01)[2], ())
+
+    def test_execute_batch(self):
+        """
+        Test that a batch applies every operation and logs them together.
+        """
+        writes = PiGpio.instance().writes
+        applied, results = self.executor.ExecuteBatch(
+            [
+                (batch.OP_OPEN, 7),
+                (batch.OP_OPEN, 3),
+                (batch.OP_SET_SCHEDULE, 12, ((-1, "06:30:00", 300, (0, 2, 4)),)),
+                (batch.OP_CLOSE, 7),
+            ]
+        )
+        self.assertTrue(applied)
+        self.assertEqual(results, ((True, None),) * 4)
+        self.assertFalse(self.zones[0].is_open())
+        self.assertTrue(self.zones[1].is_open())
+        self.assertEqual(PiGpio.instance().writes, writes + 1)
+        self.assertEqual(len(self.zones[2].irrigation_info), 1)
+        stored = IrrigationInfoDAO.get_irrigation_info(12)
+        self.assertEqual(stored[0].id, self.zones[2].irrigation_info[0].id)
+        self.assertEqual(stored[0].for_how_many_seconds, 300)
+        self.assertEqual(
+            [log.event_id for log in PersistentLogDAO.get_logs(7)][:2],
+            [EventId.IRRIGATION_STOP, EventId.IRRIGATION_START],
+        )
+        self.zones[1].override_open(False)
+
+    def test_failed_batch_is_rolled_back(self):
+        """
+        Test that when the second operation raises, the first one is undone:
+        zone state, pin, logs and schedules are as before the batch.
+        """
+        zone = self.zones[2]
+        zone.set_irrigation_info(IrrigationInfoDAO.get_irrigation_info(12))
+        schedule = zone.irrigation_info
+        stored = IrrigationInfoDAO.get_irrigation_info(12)
+        logs = PersistentLogDAO.get_logs(7)
+        last_start = PersistentLogDAO.get_last_event_date(7, EventId.IRRIGATION_START)
+
+        def fail(irrigation_info):
+            raise RuntimeError("cannot load")
+
+        zone.set_irrigation_info = fail
+        self.addCleanup(delattr, zone, "set_irrigation_info")
+        applied, results = self.executor.ExecuteBatch(
+            [
+                (batch.OP_OPEN, 7),
+                (batch.OP_SET_SCHEDULE, 12, ((-1, "07:00:00", 60, (1,)),)),
+                (batch.OP_OPEN, 3),
+            ]
+        )
+        self.assertFalse(applied)
+        self.assertEqual(
+            results,
+            (
+                (False, batch.ROLLED_BACK),
+                (False, "cannot load"),
+                (False, batch.ROLLED_BACK),
+            ),
+        )
+        self.assertFalse(self.zones[0].is_open())
+        self.assertFalse(self.zones[1].is_open())
+        self.assertEqual(PiGpio.instance().GetPinLevel(1), CLOSED_LEVEL)
+        self.assertIs(zone.irrigation_info, schedule)
+        self.assertEqual(
+            [info.id for info in IrrigationInfoDAO.get_irrigation_info(12)],
+            [info.id for info in stored],
+        )
+        self.assertEqual(PersistentLogDAO.get_logs(7), logs)
+        self.assertEqual(
+            PersistentLogDAO.get_last_event_date(7, EventId.IRRIGATION_START),
+            last_start,
+        )
+
+    def test_invalid_batch_is_not_applied(self):
+        """
+        Test that one invalid operation keeps the whole batch from running.
+        """
+        version = self.executor.GetStateVersion()
+        applied, results = self.executor.ExecuteBatch(
+            [(batch.OP_OPEN, 7), (batch.OP_OPEN, 99)]
+        )
+        self.assertFalse(applied)
+        self.assertEqual(results[0], (False, batch.NOT_APPLIED))
+        self.assertFalse(results[1][0])
+        self.assertFalse(self.zones[0].is_open())
+        self.assertEqual(self.executor.GetStateVersion(), version)
+
+    def run_polling_loop(self, period_ms, work_seconds, ticks):
+        # Runs the polling loop for a number of ticks on a simulated clock
+        # advanced only by the work of each tick and by the waits, so that
+        # the scheduler of the machine running the test plays no part.
+        # Returns the start time of every tick
+        now = [0.0]
+        starts = []
+
+        def evaluate_zones():
+            starts.append(now[0])
+            now[0] += work_seconds
+            if len(starts) == ticks:
+                self.executor._stop_executor = True
+
+        def wait_until(deadline):
+            now[0] = max(now[0], deadline)
+
+        overrides = {
+            "_monotonic": lambda: now[0],
+            "_sleep_milliseconds_time": period_ms,
+            "_tick_stats": TickStats(),
+            "EvaluateZones": evaluate_zones,
+            "WaitUntil": wait_until,
+        }
+        for name, value in overrides.items():
+            setattr(self.executor, name, value)
+            self.addCleanup(delattr, self.executor, name)
+        self.executor._stop_executor = False
+        self.executor.RunPollingLoop()
+        self.executor._stop_executor = False
+        return starts
+
+    def test_polling_ticks_do_not_drift(self):
+        """
+        Test that ticks keep their period whatever their work takes.
+        """
+        starts = self.run_polling_loop(20, 0.01, 50)
+        # A loop sleeping 20 ms after 10 ms of work would start them 30 ms apart
+        for number, started in enumerate(starts):
+            self.assertAlmostEqual(started, number * 0.02)
+        self.assertTrue(self.executor.AmIRunning())
+        stats = self.executor.GetTickStats()
+        self.assertEqual(stats["ticks"], 50)
+        self.assertEqual(stats["overruns"], 0)
+
+    def test_polling_overruns_are_counted(self):
+        """
+        Test that ticks whose work exceeds the period are counted as overruns.
+        """
+        starts = self.run_polling_loop(10, 0.025, 10)
+        stats = self.executor.GetTickStats()
+        self.assertEqual(stats["ticks"], 10)
+        self.assertEqual(stats["overruns"], 10)
+        # Missed ticks are skipped, not run late back to back
+        for number, started in enumerate(starts):
+            self.assertAlmostEqual(started, number * 0.03)
+        self.assertLess(stats["lateness_max_ms"], 1)
+
+    def wait_for(self, condition, timeout=2):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return condition()
+
+    def test_event_loop_closes_a_window_across_midnight(self):
+        """
+        Test that a zone opened just before midnight is closed by the event
+        loop after it, also when its deadlines are rebuilt after midnight.
+        """
+        zone = self.executor.GetZone(12)
+        zone.set_irrigation_info([IrrigationInfo(datetime.time(23, 59, 0), 120)])
+        # Flows with real time from the dates the test jumps to
+        jumps = [datetime.datetime(2025, 6, 5, 23, 59, 30), time.monotonic()]
+
+        def clock():
+            return jumps[0] + datetime.timedelta(seconds=time.monotonic() - jumps[1])
+
+        def jump(date_time):
+            jumps[:] = [date_time, time.monotonic()]
+            self.executor.Wake()
+
+        self.executor._clock = clock
+        self.addCleanup(delattr, self.executor, "_clock")
+        self.executor._deadline_queue = DeadlineQueue(clock=clock)
+        self.addCleanup(delattr, self.executor, "_deadline_queue")
+        self.executor._stop_executor = False
+        thread = threading.Thread(target=self.executor.RunEventLoop)
+        thread.start()
+        try:
+            self.assertTrue(self.wait_for(zone.is_open))
+            # Woken by another zone after midnight: the deadlines are rebuilt
+            jump(datetime.datetime(2025, 6, 6, 0, 0, 30))
+            self.assertTrue(
+                self.wait_for(
+                    lambda: (
+                        self.executor._deadline_queue.next_deadline()
+                        == datetime.datetime(2025, 6, 6, 0, 1, 0)
+                    )
+                )
+            )
+            self.assertTrue(zone.is_open())
+            jump(datetime.datetime(2025, 6, 6, 0, 1, 5))
+            self.assertTrue(self.wait_for(lambda: not zone.is_open()))
+        finally:
+            self.executor._stop_executor = True
+            self.executor.Wake()
+            thread.join(5)
+
+    def test_watchdog_close_updates_the_zone(self):
+        """
+        Test that a pin closed by the actuator watchdog closes its zone.
+        """
+        zone = self.executor.GetZone(3)
+        zone.override_open(True)
+        version = self.executor.GetStateVersion()
+        self.executor.OnWatchdogClose(zone.gpio_pin)
+        self.assertFalse(zone.is_open())
+        events = self.executor.GetEventsSince(version)[2]
+        self.assertEqual(events[-1][1][0], "EMERGENCY_CLOSED")
+
+    def test_close_all_does_not_wait_for_the_database(self):
+        """
+        Test that every zone is closed within a bounded time while the
+        database is locked, and that the closes are logged once it is free.
+        """
+        zones = [_zone(100 + number, number) for number in range(20)]
+        self.executor.SetZones(zones)
+        for zone in zones:
+            zone.override_open(True)
+        closed_at = []
+        for zone in zones:
+            zone.add_state_listener(
+                lambda zone, event: closed_at.append(time.monotonic())
+            )
+        # Another writer holds the database, as a slow disk would
+        blocker = sqlite3.connect(self.db._file_name, check_same_thread=False)
+        blocker.execute("BEGIN IMMEDIATE")
+        started = time.monotonic()
+        closing = threading.Thread(target=self.executor.CloseAll)
+        closing.start()
+        deadline = time.monotonic() + 5
+        while len(closed_at) < len(zones) and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.assertTrue(closing.is_alive())
+        blocker.rollback()
+        blocker.close()
+        closing.join(10)
+        self.assertFalse(any(zone.is_open() for zone in zones))
+        self.assertEqual(len(closed_at), len(zones))
+        self.assertLess(max(closed_at) - started, 0.1)
+        stops = PersistentLogDAO.get_logs(100, EventId.IRRIGATION_STOP)
+        self.assertEqual(len(stops), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
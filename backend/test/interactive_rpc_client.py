@@ -17,6 +17,8 @@ def interactive_client():
         print("  zone(id) - Get detailed zone info")
         print("  open(id) - Open zone by ID")
         print("  close(id) - Close zone by ID")
+        print("  closeall() - Close every zone")
+        print("  watch() - Print zone events as they happen, until Enter")
         print("  stop() - Stop the service")
         print("  quit() - Exit client")
 
@@ -29,9 +31,10 @@ def interactive_client():
 
         def zones():
             zones = conn.root.GetIrrigators()
-            for i, zone in enumerate(zones):
+            for zone in zones:
                 print(
-                    f"Zone {i}: {zone.name} (Pin: {zone.gpio_pin}, Open: {zone.IsOpen()})"
+                    f"Zone {zone.id}: {zone.name} "
+                    f"(Pin: {zone.gpio_pin}, Open: {zone.is_open()})"
                 )
             return zones
 
@@ -46,6 +49,22 @@ def interactive_client():
             print(f"Closing zone {zone_id}...")
             return conn.root.CloseZone(zone_id)
 
+        def close_all():
+            print("Closing every zone...")
+            return conn.root.CloseAll()
+
+        def watch():
+            def on_event(version, event):
+                name, zone_id, is_open, is_override, date_time = event
+                print(f"[{version}] {date_time} {name} zone={zone_id} open={is_open}")
+
+            # Serves the callbacks of the service while waiting for Enter
+            serving = rpyc.BgServingThread(conn, serve_interval=0.1, sleep_interval=0)
+            subscription_id = conn.root.Subscribe(on_event)
+            input("Watching events, press Enter to stop\n")
+            conn.root.Unsubscribe(subscription_id)
+            serving.stop()
+
         def stop():
             print("Stopping service...")
             return conn.root.stop()
@@ -70,7 +89,8 @@ def interactive_client():
                     zone_id = int(cmd[5:-1])
                     info = zone(zone_id)
                     print(
-                        f"Zone {zone_id}: {info.name} - Open: {info.IsOpen()}, Override: {info.IsOverride()}"
+                        f"Zone {zone_id}: {info.name} - Open: {info.is_open()}, "
+                        f"Override: {info.is_override()}"
                     )
                 elif cmd.startswith("open(") and cmd.endswith(")"):
                     zone_id = int(cmd[5:-1])
@@ -78,11 +98,16 @@ def interactive_client():
                 elif cmd.startswith("close(") and cmd.endswith(")"):
                     zone_id = int(cmd[6:-1])
                     close_zone(zone_id)
+                elif cmd == "closeall()":
+                    close_all()
+                elif cmd == "watch()":
+                    watch()
                 elif cmd == "stop()":
                     stop()
                 else:
                     print(
-                        "Unknown command. Try: status(), start(), zones(), zone(0), open(0), close(0), stop(), quit()"
+                        "Unknown command. Try: status(), start(), zones(), zone(1), "
+                        "open(1), close(1), closeall(), watch(), stop(), quit()"
                     )
 
             except KeyboardInterrupt:
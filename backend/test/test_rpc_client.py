@@ -23,19 +23,20 @@ def test_rpc_connection():
         print("\n--- Zone Information ---")
         zones = conn.root.GetIrrigators()
         print(f"Found {len(zones)} zones:")
-        for i, zone in enumerate(zones):
+        for _, zone in enumerate(zones):
             print(
-                f"  Zone {i}: {zone.name} (GPIO pin: {zone.gpio_pin}, Open: {zone.IsOpen()})"
+                f"  Zone {zone.id}: {zone.name} "
+                f"(GPIO pin: {zone.gpio_pin}, Open: {zone.is_open()})"
             )
 
         # Test individual zone info
         if zones:
-            print("\n--- Detailed Zone 0 Info ---")
-            zone_info = conn.root.GetZoneInfo(0)
+            print(f"\n--- Detailed Zone {zones[0].id} Info ---")
+            zone_info = conn.root.GetZoneInfo(zones[0].id)
             print(f"Name: {zone_info.name}")
             print(f"GPIO Pin: {zone_info.gpio_pin}")
-            print(f"Is Open: {zone_info.IsOpen()}")
-            print(f"Is Override: {zone_info.IsOverride()}")
+            print(f"Is Open: {zone_info.is_open()}")
+            print(f"Is Override: {zone_info.is_override()}")
 
         # Manual control test (commented out for safety)
         # print("\n--- Manual Control Test ---")
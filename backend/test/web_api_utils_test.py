@@ -0,0 +1,213 @@
+"""
+Unit tests for the web API: verifies the conditional GET caching of the
+zone routes against an in-process RPC service.
+"""
+
+import datetime
+import threading
+import time
+import unittest
+import rpyc
+from rpyc.utils.server import ThreadedServer
+from backend import web_api_utils
+from backend.datatype.irrigation_info import IrrigationInfo
+from backend.datatype.zone import Zone
+from backend.datatype.log import EventId, Log
+from backend.datatype.zone_snapshot import encode_event, encode_logs, encode_snapshot
+from backend.web_service.rpc_pool import RpcConnectionPool
+
+
+class FakeIrrigationService(rpyc.Service):
+    """
+    Serves one zone and counts the snapshots taken.
+    """
+
+    version = 1
+    snapshots = 0
+
+    def __init__(self):
+        self.zone = Zone("web", 3, [IrrigationInfo(datetime.time(6, 0, 0), 60)])
+        self.zone.set_id(4)
+
+    def exposed_GetStateVersion(self):
+        return FakeIrrigationService.version
+
+    def exposed_GetEventsSince(self, version, timeout=0):
+        if version >= FakeIrrigationService.version:
+            time.sleep(min(timeout, 0.05))
+            return (version, True, ())
+        event = encode_event("OPENED", self.zone)
+        return (FakeIrrigationService.version, True, ((version + 1, event),))
+
+    def exposed_GetZonesSnapshot(self):
+        FakeIrrigationService.snapshots += 1
+        return encode_snapshot([self.zone])
+
+    def exposed_GetLogsPage(self, zone_id=None, event=None, cursor=None, page_size=100):
+        # Five logs numbered 4 to 0, the cursor being the last number sent
+        if event is not None:
+            EventId[event]
+        last = 5 if cursor is None else cursor[1]
+        numbers = list(range(last - 1, -1, -1))[:page_size]
+        logs = [
+            Log(zone_id, datetime.datetime(2024, 6, 1, 6), EventId.GENERAL, str(n))
+            for n in numbers
+        ]
+        next_cursor = None
+        if numbers and numbers[-1] > 0:
+            next_cursor = ("2024-06-01 06:00:00.000000", numbers[-1])
+        return encode_logs(logs), next_cursor
+
+    def exposed_GetRecentLogs(
+        self, zone_id=None, event=None, since=None, within_seconds=None, limit=None
+    ):
+        if event is not None:
+            EventId[event]
+        log = Log(zone_id, datetime.datetime(2024, 6, 1, 6), EventId.GENERAL, "recent")
+        return encode_logs([log] * (limit or 1))
+
+
+class TestWebApiUtils(unittest.TestCase):
+    """
+    Test suite for the web API routes.
+    """
+
+    server = None
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Start the fake RPC service and point the web API pool to it.
+        """
+        cls.server = ThreadedServer(FakeIrrigationService, port=0)
+        threading.Thread(target=cls.server.start, daemon=True).start()
+        while not cls.server.active:
+            time.sleep(0.01)
+        web_api_utils.rpc_pool = RpcConnectionPool("localhost", cls.server.port)
+        web_api_utils.event_rpc_pool = RpcConnectionPool(
+            "localhost", cls.server.port, max_size=1
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        """
+        Stop the fake RPC service.
+        """
+        web_api_utils.rpc_pool.close()
+        web_api_utils.event_rpc_pool.close()
+        cls.server.close()
+
+    def test_unchanged_zones_are_not_rebuilt(self):
+        """
+        Test that /zones is rebuilt only when the state version changes.
+        """
+        client = web_api_utils.app.test_client()
+        first = client.get("/zones")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json[0]["id"], "4")
+        etag = first.headers["ETag"]
+        snapshots = FakeIrrigationService.snapshots
+        not_modified = client.get("/zones", headers={"If-None-Match": etag})
+        self.assertEqual(not_modified.status_code, 304)
+        cached = client.get("/zones")
+        self.assertEqual(cached.data, first.data)
+        self.assertEqual(FakeIrrigationService.snapshots, snapshots)
+        FakeIrrigationService.version += 1
+        changed = client.get("/zones", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["ETag"], etag)
+        self.assertEqual(FakeIrrigationService.snapshots, snapshots + 1)
+
+    def test_logs_are_paged(self):
+        """
+        Test that /logs streams the pages of the service up to the limit and
+        that its cursor continues where it stopped.
+        """
+        client = web_api_utils.app.test_client()
+        page_size = web_api_utils.LOG_PAGE_SIZE
+        web_api_utils.LOG_PAGE_SIZE = 2
+        try:
+            first = client.get("/logs?zone_id=4&limit=3")
+        finally:
+            web_api_utils.LOG_PAGE_SIZE = page_size
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([log["log"] for log in first.json["logs"]], ["4", "3", "2"])
+        cursor = first.json["next_cursor"]
+        rest = client.get(f"/logs?zone_id=4&cursor={cursor}")
+        self.assertEqual([log["log"] for log in rest.json["logs"]], ["1", "0"])
+        self.assertIsNone(rest.json["next_cursor"])
+        self.assertEqual(client.get("/logs?event=RAIN").status_code, 400)
+        self.assertEqual(client.get("/logs?cursor=bad").status_code, 400)
+
+    def test_recent_logs(self):
+        """
+        Test that /logs/recent forwards the filters and rejects unknown events.
+        """
+        client = web_api_utils.app.test_client()
+        response = client.get("/logs/recent?zone_id=4&limit=2")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json,
+            [
+                {
+                    "zone_id": 4,
+                    "date_time": "2024-06-01T06:00:00",
+                    "event": "GENERAL",
+                    "log": "recent",
+                }
+            ]
+            * 2,
+        )
+        self.assertEqual(client.get("/logs/recent?event=RAIN").status_code, 400)
+
+    def test_events_stream(self):
+        """
+        Test that /events relays the events published after a version.
+        """
+        client = web_api_utils.app.test_client()
+        response = client.get("/events", buffered=False)
+        chunks = iter(response.response)
+        self.assertEqual(next(chunks), b": connected\n\n")
+        while web_api_utils.event_hub.version != FakeIrrigationService.version:
+            time.sleep(0.01)
+        FakeIrrigationService.version += 1
+        chunk = next(chunks)
+        # Comments, and the reset sent when the relay starts after the client
+        while chunk.startswith(b":") or b"event: reset" in chunk:
+            chunk = next(chunks)
+        self.assertIn(f"id: {FakeIrrigationService.version}".encode(), chunk)
+        self.assertIn(b'"event": "OPENED", "zone_id": 4', chunk)
+        response.close()
+
+    def test_events_rejects_a_bad_version(self):
+        """
+        Test that /events answers 400 to a version that is not a number.
+        """
+        client = web_api_utils.app.test_client()
+        self.assertEqual(client.get("/events?since=abc").status_code, 400)
+        response = client.get("/events", headers={"Last-Event-ID": "x"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_events_streams_are_capped(self):
+        """
+        Test that /events answers 503 past MAX_EVENT_STREAMS and frees the
+        slot of a closed stream.
+        """
+        client = web_api_utils.app.test_client()
+        for _ in range(web_api_utils.MAX_EVENT_STREAMS - 1):
+            self.assertTrue(web_api_utils.event_streams.acquire(blocking=False))
+        try:
+            response = client.get("/events", buffered=False)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(client.get("/events").status_code, 503)
+            response.close()
+            response = client.get("/events", buffered=False)
+            self.assertEqual(response.status_code, 200)
+            response.close()
+        finally:
+            for _ in range(web_api_utils.MAX_EVENT_STREAMS - 1):
+                web_api_utils.event_streams.release()
+
+
+if __name__ == "__main__":
+    unittest.main()
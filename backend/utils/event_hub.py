@@ -0,0 +1,118 @@
+"""
+This module provides EventHub, an in-process publish/subscribe buffer of
+numbered events that readers consume at their own pace.
+"""
+
+import collections
+import threading
+
+
+class EventHub:
+    """
+    Bounded history of events, each numbered with a version one higher than
+    the previous one.
+    Publishing never blocks on readers: a reader asks for the events after
+    the last version it has seen, and learns when some of them have already
+    been dropped from the history so that it can reload the full state.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._events = collections.deque(maxlen=capacity)
+        self._version = 0
+        # No event after this version is missing, unless dropped by the deque
+        self._complete_from = 0
+        self._condition = threading.Condition()
+        self._listeners = []
+
+    @property
+    def version(self):
+        """Version of the last published event, 0 if none."""
+        return self._version
+
+    def add_listener(self, listener):
+        """
+        Registers a callable() invoked after every change of the hub, to wake
+        readers that do not block in wait_for_events. It must not block.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Unregisters a listener added with add_listener."""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self):
+        self._condition.notify_all()
+        for listener in self._listeners:
+            listener()
+
+    def publish(self, event):
+        """
+        Appends an event with the next version and wakes the waiting readers.
+        Args:
+            event: Any value, shared by all readers.
+        Returns:
+            int: The version of the event.
+        """
+        with self._condition:
+            self._version += 1
+            self._events.append((self._version, event))
+            self._notify()
+            return self._version
+
+    def mirror(self, version: int, event):
+        """
+        Appends an event published by another hub, keeping its version.
+        Versions must grow; an older one means the source has restarted and
+        the history is reset first. A jump in versions marks the events
+        before it as incomplete.
+        """
+        with self._condition:
+            if version <= self._version:
+                self._events.clear()
+            if version != self._version + 1:
+                self._complete_from = version - 1
+            self._version = version
+            self._events.append((version, event))
+            self._notify()
+
+    def reset(self, version: int = 0):
+        """
+        Forgets the history and continues numbering from version.
+        """
+        with self._condition:
+            self._events.clear()
+            self._version = version
+            self._complete_from = version
+            self._notify()
+
+    def events_since(self, since: int):
+        """
+        Returns the events published after a version.
+        Args:
+            since (int): The last version the reader has seen.
+        Returns:
+            tuple[list[tuple[int, object]], bool]: The (version, event) pairs,
+                oldest first, and False if events after since have been
+                dropped or since is not a version of this hub.
+        """
+        with self._condition:
+            return self._events_since(since)
+
+    def wait_for_events(self, since: int, timeout: float = None):
+        """
+        Like events_since, but waits up to timeout seconds for an event
+        when there is none after since.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._version != since, timeout)
+            return self._events_since(since)
+
+    def _events_since(self, since):
+        complete_from = self._complete_from
+        if self._events:
+            complete_from = max(complete_from, self._events[0][0] - 1)
+        elif since != self._version:
+            complete_from = self._version
+        complete = complete_from <= since <= self._version
+        return [entry for entry in self._events if entry[0] > since], complete
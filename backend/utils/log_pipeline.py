@@ -0,0 +1,201 @@
+"""
+This module provides LogPipeline, which moves log I/O off the threads that
+log: records are queued by a QueueHandler, with their message already
+formatted, and laid out and written by a QueueListener thread into
+size-rotated, gzip-compressed files.
+"""
+
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import time
+
+LOG_FORMAT = "%(asctime)s %(levelname)-8s %(threadName)s %(name)s %(message)s"
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most burst records of the same logger, level and message through
+    every interval seconds. Messages are compared once formatted, so that a
+    template shared by many subjects, such as "%s - Opened" with the zone
+    name, is limited per subject. The first record let through after some
+    were dropped tells how many.
+    Records at or above exempt_level are never dropped.
+    """
+
+    def __init__(
+        self,
+        interval: float = 60.0,
+        burst: int = 10,
+        exempt_level: int = logging.CRITICAL,
+        max_keys: int = 4096,
+    ):
+        super().__init__()
+        self._interval = interval
+        self._burst = burst
+        self._exempt_level = exempt_level
+        self._max_keys = max_keys
+        # (logger, level, message) -> [window start, let through, dropped]
+        self._windows = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        if record.levelno >= self._exempt_level or not isinstance(record.msg, str):
+            return True
+        message = record.getMessage()
+        key = (record.name, record.levelno, message)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self._interval:
+                dropped = window[2] if window is not None else 0
+                if window is None and len(self._windows) >= self._max_keys:
+                    self._windows.clear()
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self._burst:
+                window[1] += 1
+                dropped = 0
+            else:
+                window[2] += 1
+                self.suppressed += 1
+                return False
+        if dropped:
+            message = f"{message} [{dropped} identical messages dropped]"
+        # Formatted once: the queue handler passes the record on as it is
+        record.msg = message
+        record.args = None
+        return True
+
+
+class GzipRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler compressing the rotated files as <name>.<n>.gz.
+    """
+
+    def __init__(self, filename, max_bytes: int, backup_count: int, **kwargs):
+        super().__init__(
+            filename, maxBytes=max_bytes, backupCount=backup_count, **kwargs
+        )
+        self.namer = lambda name: name + ".gz"
+        self.rotator = self._compress
+
+    @staticmethod
+    def _compress(source, dest):
+        with open(source, "rb") as source_file, gzip.open(dest, "wb") as dest_file:
+            shutil.copyfileobj(source_file, dest_file)
+        os.remove(source)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # Queues the records with their message formatted, so that the listener
+    # thread never reads arguments the caller may change meanwhile; the
+    # timestamp, level and exception are laid out on the listener thread.
+    # Records are dropped and counted when the queue is full, never waited for.
+    # CRITICAL records are written at once by the direct handler instead, so
+    # that they are not lost when the process exits right after them
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.direct = None
+        self.dropped = 0
+
+    def emit(self, record):
+        direct = self.direct
+        if direct is not None and record.levelno >= logging.CRITICAL:
+            direct.handle(record)
+            return
+        super().emit(record)
+
+    def prepare(self, record):
+        # The rate limit already formatted the records it let through
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """
+    Routes the records of the root logger through a bounded queue to a
+    listener thread writing them to filename, rotated when it reaches
+    max_bytes with backup_count compressed files kept.
+    Repeated messages are rate limited by a RateLimitFilter before they are
+    queued, so that a message repeated on every tick is formatted but not written.
+    """
+
+    def __init__(
+        self,
+        filename: str = "markitiello_irrigator.log",
+        level: int = logging.INFO,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        rate_limit_interval: float = 60.0,
+        rate_limit_burst: int = 10,
+        queue_size: int = 10000,
+    ):
+        self._filename = filename
+        self._level = level
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._rate_limit = RateLimitFilter(rate_limit_interval, rate_limit_burst)
+        self._queue = queue.Queue(queue_size)
+        self._queue_handler = _QueueHandler(self._queue)
+        self._queue_handler.addFilter(self._rate_limit)
+        self._file_handler = None
+        self._listener = None
+
+    def start(self):
+        """
+        Opens the log file and replaces the handlers of the root logger with
+        the queue.
+        """
+        if self._listener is not None:
+            return
+        self._file_handler = GzipRotatingFileHandler(
+            self._filename,
+            max_bytes=self._max_bytes,
+            backup_count=self._backup_count,
+            encoding="utf-8",
+        )
+        self._file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        self._listener = logging.handlers.QueueListener(self._queue, self._file_handler)
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self._queue_handler)
+        root.setLevel(self._level)
+        self._queue_handler.direct = self._file_handler
+        self._listener.start()
+
+    def stop(self):
+        """
+        Writes the queued records and closes the log file.
+        """
+        if self._listener is None:
+            return
+        logging.getLogger().removeHandler(self._queue_handler)
+        self._queue_handler.direct = None
+        self._listener.stop()
+        self._listener = None
+        self._file_handler.close()
+
+    def stats(self):
+        """
+        Returns the records queued, dropped because the queue was full and
+        suppressed by the rate limit.
+        """
+        return {
+            "queued": self._queue.qsize(),
+            "dropped": self._queue_handler.dropped,
+            "suppressed": self._rate_limit.suppressed,
+        }
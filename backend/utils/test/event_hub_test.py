@@ -0,0 +1,79 @@
+"""
+Unit tests for EventHub: verifies versioning, backfill and waiting for
+published events.
+"""
+
+import threading
+import unittest
+from backend.utils.event_hub import EventHub
+
+
+class TestEventHub(unittest.TestCase):
+    """
+    Test suite for EventHub.
+    """
+
+    def test_events_since_a_version(self):
+        """
+        Test that readers get the events after the version they have seen.
+        """
+        hub = EventHub()
+        for name in ("a", "b", "c"):
+            hub.publish(name)
+        self.assertEqual(hub.version, 3)
+        self.assertEqual(hub.events_since(1), ([(2, "b"), (3, "c")], True))
+        self.assertEqual(hub.events_since(3), ([], True))
+
+    def test_dropped_events_are_reported(self):
+        """
+        Test that a reader too far behind learns that it missed events.
+        """
+        hub = EventHub(capacity=2)
+        for name in ("a", "b", "c"):
+            hub.publish(name)
+        self.assertEqual(hub.events_since(0), ([(2, "b"), (3, "c")], False))
+        self.assertEqual(hub.events_since(1), ([(2, "b"), (3, "c")], True))
+        self.assertFalse(hub.events_since(4)[1])
+
+    def test_mirror_keeps_versions(self):
+        """
+        Test that mirrored events keep their versions and gaps are reported.
+        """
+        hub = EventHub()
+        hub.reset(10)
+        hub.mirror(11, "a")
+        hub.mirror(14, "b")
+        self.assertEqual(hub.events_since(11), ([(14, "b")], False))
+        self.assertEqual(hub.events_since(13), ([(14, "b")], True))
+        hub.mirror(2, "restarted")
+        self.assertEqual(hub.events_since(1), ([(2, "restarted")], True))
+
+    def test_wait_for_events(self):
+        """
+        Test that a waiting reader is woken by a publish and times out otherwise.
+        """
+        hub = EventHub()
+        self.assertEqual(hub.wait_for_events(0, 0.01), ([], True))
+        publisher = threading.Timer(0.05, hub.publish, ["late"])
+        publisher.start()
+        self.assertEqual(hub.wait_for_events(0, 5), ([(1, "late")], True))
+        publisher.join()
+
+    def test_listeners(self):
+        """
+        Test that listeners are called on every change until removed.
+        """
+        hub = EventHub()
+        calls = []
+        listener = lambda: calls.append(hub.version)  # noqa: E731
+        hub.add_listener(listener)
+        hub.publish("a")
+        hub.reset(5)
+        hub.mirror(6, "b")
+        hub.remove_listener(listener)
+        hub.publish("c")
+        self.assertEqual(calls, [1, 5, 6])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+"""
+Unit tests for LogPipeline: verifies rate limiting, writing from the listener
+thread and compressed rotation.
+"""
+
+import gzip
+import logging
+import os
+import tempfile
+import time
+import unittest
+from backend.utils.log_pipeline import LogPipeline, RateLimitFilter
+
+
+def _record(message, *args, level=logging.INFO):
+    return logging.LogRecord("test", level, __file__, 1, message, args, None)
+
+
+class TestRateLimitFilter(unittest.TestCase):
+    """
+    Test suite for RateLimitFilter.
+    """
+
+    def test_burst_then_dropped_count(self):
+        """
+        Test that a message is let through burst times per interval and that
+        the next record let through tells how many were dropped.
+        """
+        rate_limit = RateLimitFilter(interval=0.05, burst=2)
+        passed = [rate_limit.filter(_record("tick %s", 1)) for _ in range(5)]
+        self.assertEqual(passed, [True, True, False, False, False])
+        self.assertEqual(rate_limit.suppressed, 3)
+        self.assertTrue(rate_limit.filter(_record("other %s", 1)))
+        time.sleep(0.06)
+        record = _record("tick %s", 1)
+        self.assertTrue(rate_limit.filter(record))
+        self.assertEqual(record.getMessage(), "tick 1 [3 identical messages dropped]")
+
+    def test_shared_template_limited_per_message(self):
+        """
+        Test that records sharing a template but not their arguments, such as
+        the transitions of different zones, are not dropped for each other.
+        """
+        rate_limit = RateLimitFilter(interval=60, burst=1)
+        for zone in ("lawn", "garden", "hedge"):
+            self.assertTrue(rate_limit.filter(_record("%s - Opened", zone)))
+        self.assertFalse(rate_limit.filter(_record("%s - Opened", "lawn")))
+        self.assertEqual(rate_limit.suppressed, 1)
+
+    def test_critical_never_dropped(self):
+        """
+        Test that critical records are let through whatever the limit.
+        """
+        rate_limit = RateLimitFilter(interval=60, burst=1)
+        for _ in range(3):
+            self.assertTrue(rate_limit.filter(_record("down", level=logging.CRITICAL)))
+
+
+class TestLogPipeline(unittest.TestCase):
+    """
+    Test suite for LogPipeline.
+    """
+
+    def setUp(self):
+        root = logging.getLogger()
+        self._handlers = list(root.handlers)
+        self._level = root.level
+        self._dir = tempfile.TemporaryDirectory()
+        self._file_name = os.path.join(self._dir.name, "test.log")
+
+    def tearDown(self):
+        root = logging.getLogger()
+        for handler in self._handlers:
+            root.addHandler(handler)
+        root.setLevel(self._level)
+        self._dir.cleanup()
+
+    def _read(self):
+        with open(self._file_name, encoding="utf-8") as log_file:
+            return log_file.read()
+
+    def test_records_written_by_listener(self):
+        """
+        Test that records below the level are skipped and the others are in
+        the file once the pipeline is stopped.
+        """
+        pipeline = LogPipeline(self._file_name, level=logging.INFO)
+        pipeline.start()
+        logging.debug("hidden %s", 1)
+        logging.info("zone %s opened", 3)
+        pipeline.stop()
+        content = self._read()
+        self.assertIn("zone 3 opened", content)
+        self.assertNotIn("hidden", content)
+        self.assertEqual(pipeline.stats()["queued"], 0)
+
+    def test_records_queued_formatted(self):
+        """
+        Test that records are queued with their message formatted, so that
+        arguments changed after the call do not reach the file.
+        """
+        pipeline = LogPipeline(self._file_name)
+        for level in (logging.INFO, logging.CRITICAL):
+            pins = [1, 2]
+            pipeline._queue_handler.handle(_record("pins %s", pins, level=level))
+            pins.append(3)
+            record = pipeline._queue.get_nowait()
+            self.assertEqual(record.getMessage(), "pins [1, 2]")
+            self.assertIsNone(record.args)
+
+    def test_critical_written_at_once(self):
+        """
+        Test that a critical record is in the file before the listener runs,
+        so that it survives an immediate exit.
+        """
+        pipeline = LogPipeline(self._file_name)
+        pipeline.start()
+        try:
+            logging.critical("forcing shutdown")
+            self.assertIn("forcing shutdown", self._read())
+        finally:
+            pipeline.stop()
+
+    def test_rotated_files_are_compressed(self):
+        """
+        Test that the file is rotated into gzip files past max_bytes.
+        """
+        pipeline = LogPipeline(
+            self._file_name, max_bytes=200, backup_count=2, rate_limit_burst=100
+        )
+        pipeline.start()
+        for number in range(20):
+            logging.info("line %s of the rotation test", number)
+        pipeline.stop()
+        with gzip.open(self._file_name + ".1.gz", "rt", encoding="utf-8") as rotated:
+            self.assertIn("of the rotation test", rotated.read())
+        self.assertFalse(os.path.exists(self._file_name + ".3.gz"))
+        self.assertIn("line 19 of the rotation test", self._read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,88 +1,319 @@
-from flask import Flask, Blueprint
+import base64
+import threading
+import time
+from flask import Flask, Blueprint, Response, request, stream_with_context
 from backend.web_service.model.zone_web import ZoneWeb
-from backend.datatype.irrigation_info import IrrigationInfo
-import rpyc
+from backend.datatype import zone_snapshot
+from backend.datatype.zone_snapshot import decode_snapshot
+from backend.utils.event_hub import EventHub
+from backend.web_service.rpc_pool import RpcConnectionPool
 import json
+import rpyc
 
 app = Flask(__name__)
+# Shared by all the waitress worker threads
+rpc_pool = RpcConnectionPool("localhost", 18871, max_size=8)
+# Serialized bodies by key, as (state version, body)
+response_cache = {}
+response_cache_lock = threading.Lock()
+# Events of the service, relayed by one thread and read by every /events client
+event_hub = EventHub()
+event_relay = None
+event_relay_lock = threading.Lock()
+EVENT_POLL_SECONDS = 20
+EVENT_HEARTBEAT_SECONDS = 15
+# Each /events client keeps a waitress thread busy: past MAX_EVENT_STREAMS
+# they are turned away, so that threads are left for the other routes
+WEB_THREADS = 32
+MAX_EVENT_STREAMS = 24
+event_streams = threading.BoundedSemaphore(MAX_EVENT_STREAMS)
+# Log entries fetched from the service per RPC call, and sent per /logs
+# response unless ?limit= says otherwise
+LOG_PAGE_SIZE = 200
+LOGS_PER_RESPONSE = 1000
+
+
+def connect_for_events():
+    # Long polls last longer than the default rpyc request timeout
+    return rpyc.connect(
+        "localhost", 18871, config={"sync_request_timeout": EVENT_POLL_SECONDS * 2}
+    )
+
+
+event_rpc_pool = RpcConnectionPool(max_size=1, connect=connect_for_events)
 
 zones = Blueprint("zones", __name__, url_prefix="/zones")
 
 
+def versioned_response(key, load):
+    # Rebuilds the body with load(connection) only when the state version of
+    # the service changed, and answers 304 to clients that already have it
+    with rpc_pool.connection() as c:
+        version = c.root.GetStateVersion()
+        etag = f"{key}-{version}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        cached = response_cache.get(key)
+        if cached is None or cached[0] != version:
+            cached = (version, load(c))
+            with response_cache_lock:
+                response_cache[key] = cached
+    response = Response(cached[1], mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+
 @app.route("/zones")
 def get_zones():
-    c = rpyc.connect("localhost", 18871, config={"allow_public_attrs": True})
-    zones = c.root.GetIrrigators()
-    print(zones)
-    zone_web_list = list()
-    irrigation_info_list = list()
-    for zone in zones:
-        irrigation_info_list = list()
-        if len(zone.irrigation_info) == 0:
-            print("NO ZONE")
-        for timing in zone.irrigation_info:
-            print(type(timing.time_to_start))
-            print(type(timing.day_of_the_week))
-            irrigation_info_list.append(
-                IrrigationInfo(
-                    timing.time_to_start,
-                    int(timing.for_how_many_seconds),
-                    list(timing.day_of_the_week),
-                )
-            )
-        zone_web_list.append(
-            ZoneWeb(
-                zone.name,
-                zone.id,
-                zone.IsOpen(),
-                zone.IsOverride(),
-                # zone.irrigation_info,
-                irrigation_info_list,
-            )
-        )
-    print("OK")
-    print([s.serialize() for s in zone_web_list])
-    return [s.serialize() for s in zone_web_list]
+    def load(c):
+        zones = decode_snapshot(c.root.GetZonesSnapshot())
+        return json.dumps([ZoneWeb.from_snapshot(zone).serialize() for zone in zones])
+
+    return versioned_response("zones", load)
+
+
+def zone_not_found(zone_id):
+    return (
+        json.dumps({"success": False, "error": f"Unknown zone {zone_id}"}),
+        404,
+        {"ContentType": "application/json"},
+    )
 
 
-@app.route("/zones/<zone_id>/open", methods=["POST"])
+@app.route("/zones/<int:zone_id>/open", methods=["POST"])
 def open_zone(zone_id):
-    c = rpyc.connect("localhost", 18871, config={"allow_public_attrs": True})
-    c.root.OpenZone(int(zone_id))
+    try:
+        with rpc_pool.connection() as c:
+            c.root.OpenZone(zone_id)
+    except KeyError:
+        return zone_not_found(zone_id)
     return json.dumps({"success": True}), 200, {"ContentType": "application/json"}
 
 
-@app.route("/zones/<zone_id>")
+@app.route("/zones/<int:zone_id>")
 def info_zone(zone_id):
-    c = rpyc.connect("localhost", 18871, config={"allow_public_attrs": True})
-    zone = c.root.GetZoneInfo(int(zone_id))
-    zone_web = ZoneWeb(
-        zone.name,
-        zone.id,
-        zone.IsOpen(),
-        False,
-        zone.irrigation_info,
-        zone.GetLastIrrigationDate().strftime("%d-%m-%Y %H:%M:%S"),
-    )
-    return (
-        json.dumps(zone_web.serialize(), indent=2),
-        200,
-        {"ContentType": "application/json"},
-    )
+    def load(c):
+        zones = decode_snapshot(c.root.GetZoneSnapshot(zone_id))
+        return json.dumps(ZoneWeb.from_snapshot(zones[0]).serialize(), indent=2)
 
+    try:
+        return versioned_response(f"zone-{zone_id}", load)
+    except KeyError:
+        return zone_not_found(zone_id)
 
-@app.route("/zones/<zone_id>/close", methods=["POST"])
+
+@app.route("/zones/<int:zone_id>/close", methods=["POST"])
 def close_zone(zone_id):
-    c = rpyc.connect("localhost", 18871, config={"allow_public_attrs": True})
-    c.root.CloseZone(int(zone_id))
+    try:
+        with rpc_pool.connection() as c:
+            c.root.CloseZone(zone_id)
+    except KeyError:
+        return zone_not_found(zone_id)
     return json.dumps({"success": True}), 200, {"ContentType": "application/json"}
 
 
+def serialize_log(log):
+    return {
+        "zone_id": log[zone_snapshot.LOG_ZONE_ID],
+        "date_time": log[zone_snapshot.LOG_DATE_TIME],
+        "event": log[zone_snapshot.LOG_EVENT],
+        "log": log[zone_snapshot.LOG_DESCRIPTION],
+    }
+
+
+def encode_cursor(cursor):
+    # Opaque to the clients: the date and rowid of the last entry sent
+    if cursor is None:
+        return None
+    date_time, rowid = cursor
+    return base64.urlsafe_b64encode(f"{rowid} {date_time}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    if cursor is None:
+        return None
+    rowid, date_time = base64.urlsafe_b64decode(cursor).decode().split(" ", 1)
+    return (date_time, int(rowid))
+
+
+def bad_request(error):
+    return (
+        json.dumps({"success": False, "error": str(error)}),
+        400,
+        {"ContentType": "application/json"},
+    )
+
+
 @app.route("/logs")
 def get_logs():
-    c = rpyc.connect("localhost", 18871, config={"allow_public_attrs": True})
-    logs_list = c.root.GetLogs()
-    return [s.serialize() for s in logs_list]
+    # Newest first, filtered by ?zone_id= and ?event=IRRIGATION_START.
+    # Streams {"logs": [...], "next_cursor": ...}, fetching a page from the
+    # service at a time; pass next_cursor as ?cursor= to continue, null means
+    # there is nothing more
+    zone_id = request.args.get("zone_id", type=int)
+    event = request.args.get("event")
+    limit = request.args.get("limit", LOGS_PER_RESPONSE, type=int)
+    if limit < 1:
+        return bad_request("limit must be positive")
+    try:
+        cursor = decode_cursor(request.args.get("cursor"))
+    except ValueError as ex:
+        return bad_request(ex)
+
+    def fetch(cursor, remaining):
+        with rpc_pool.connection() as c:
+            return c.root.GetLogsPage(
+                zone_id, event, cursor, min(remaining, LOG_PAGE_SIZE)
+            )
+
+    # The first page is fetched before answering, so that a bad filter is a 400
+    try:
+        page = fetch(cursor, limit)
+    except (KeyError, ValueError) as ex:
+        return bad_request(ex)
+
+    def stream(page, remaining):
+        yield '{"logs": ['
+        separator = ""
+        while True:
+            logs, cursor = page
+            if logs:
+                yield separator + ", ".join(
+                    json.dumps(serialize_log(log)) for log in logs
+                )
+                separator = ", "
+            remaining -= len(logs)
+            if cursor is None or remaining <= 0:
+                break
+            page = fetch(cursor, remaining)
+        yield f'], "next_cursor": {json.dumps(encode_cursor(cursor))}}}'
+
+    return Response(stream(page, limit), mimetype="application/json")
+
+
+@app.route("/logs/recent")
+def get_recent_logs():
+    # The last log entries, from the memory of the service; filtered by
+    # ?zone_id=, ?event=IRRIGATION_START, ?since=ISO date, ?within_seconds=
+    # and ?limit=
+    try:
+        with rpc_pool.connection() as c:
+            logs = c.root.GetRecentLogs(
+                request.args.get("zone_id", type=int),
+                request.args.get("event"),
+                request.args.get("since"),
+                request.args.get("within_seconds", type=float),
+                request.args.get("limit", type=int),
+            )
+    except (KeyError, ValueError) as ex:
+        return bad_request(ex)
+    return Response(
+        json.dumps([serialize_log(log) for log in logs]), mimetype="application/json"
+    )
+
+
+def relay_events():
+    # Mirrors the events of the service into event_hub with a long poll
+    since = None
+    while True:
+        try:
+            with event_rpc_pool.connection() as c:
+                if since is None:
+                    since = c.root.GetStateVersion()
+                    event_hub.reset(since)
+                    continue
+                since, complete, events = c.root.GetEventsSince(
+                    since, EVENT_POLL_SECONDS
+                )
+        except (ConnectionError, OSError, EOFError):
+            time.sleep(1)
+            continue
+        if not complete:
+            event_hub.reset(since)
+            continue
+        for version, event in events:
+            event_hub.mirror(version, event)
+
+
+def start_event_relay():
+    global event_relay
+    with event_relay_lock:
+        if event_relay is None or not event_relay.is_alive():
+            event_relay = threading.Thread(
+                target=relay_events, name="EventRelay", daemon=True
+            )
+            event_relay.start()
+
+
+def server_sent_event(version, event):
+    data = {
+        "version": version,
+        "event": event[zone_snapshot.EVENT_NAME],
+        "zone_id": event[zone_snapshot.EVENT_ZONE_ID],
+        "is_open": event[zone_snapshot.EVENT_IS_OPEN],
+        "is_override": event[zone_snapshot.EVENT_IS_OVERRIDE],
+        "date_time": event[zone_snapshot.EVENT_DATE_TIME],
+    }
+    return f"id: {version}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route("/events")
+def get_events():
+    # Server-Sent Events; clients resume with Last-Event-ID or ?since=version.
+    # A "reset" event means events have been lost: reload /zones.
+    since = request.headers.get("Last-Event-ID", request.args.get("since"))
+    try:
+        since = event_hub.version if since is None else int(since)
+    except ValueError:
+        return bad_request(f"Invalid event version: {since}")
+    if not event_streams.acquire(blocking=False):
+        return (
+            json.dumps({"success": False, "error": "Too many event streams"}),
+            503,
+            {"ContentType": "application/json", "Retry-After": "30"},
+        )
+    start_event_relay()
+
+    def stream(since):
+        yield ": connected\n\n"
+        while True:
+            events, complete = event_hub.wait_for_events(since, EVENT_HEARTBEAT_SECONDS)
+            if not complete:
+                since = event_hub.version
+                yield f"id: {since}\nevent: reset\ndata: {{}}\n\n"
+                continue
+            if not events:
+                yield ": keepalive\n\n"
+                continue
+            for version, event in events:
+                yield server_sent_event(version, event)
+                since = version
+
+    response = Response(
+        stream_with_context(stream(since)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Run by the server once the client is gone, even if nothing was sent
+    response.call_on_close(event_streams.release)
+    return response
+
+
+@app.route("/stats/rpc_pool")
+def rpc_pool_stats():
+    return rpc_pool.stats()
+
+
+@app.errorhandler(ConnectionError)
+@app.errorhandler(TimeoutError)
+def rpc_unavailable(error):
+    return (
+        json.dumps({"success": False, "error": str(error)}),
+        503,
+        {"ContentType": "application/json"},
+    )
 
 
 @app.after_request
@@ -90,6 +321,7 @@ def after_request(response):
     response.headers.add("Access-Control-Allow-Origin", "*")
     response.headers.add("Access-Control-Allow-Headers", "Content-Type,Authorization")
     response.headers.add("Access-Control-Allow-Methods", "GET,PUT,POST,DELETE,OPTIONS")
+    response.headers.add("Access-Control-Expose-Headers", "ETag")
     return response
 
 
@@ -98,5 +330,5 @@ app.register_blueprint(zones)
 if __name__ == "__main__":
     from waitress import serve
 
-    serve(app, host="0.0.0.0", port=8080)
+    serve(app, host="0.0.0.0", port=8080, threads=WEB_THREADS)
 # app.run()
@@ -1,3 +1,7 @@
+import datetime
+from backend.datatype import zone_snapshot
+
+
 class ZoneWeb:
     name = ""
     id = 0
@@ -32,3 +36,23 @@ class ZoneWeb:
             "last_irrigation_date": str(self.last_irrigation_date),
             "irrigation_info": [s.serializes() for s in self.irrigation_info],
         }
+
+    @staticmethod
+    def from_snapshot(zone):
+        """Build a ZoneWeb from a zone tuple of a zone snapshot."""
+        last_irrigation_date = zone[zone_snapshot.ZONE_LAST_IRRIGATION_DATE]
+        if last_irrigation_date is not None:
+            last_irrigation_date = datetime.datetime.fromisoformat(
+                last_irrigation_date
+            ).strftime("%d-%m-%Y %H:%M:%S")
+        return ZoneWeb(
+            zone[zone_snapshot.ZONE_NAME],
+            zone[zone_snapshot.ZONE_ID],
+            zone[zone_snapshot.ZONE_IS_OPEN],
+            zone[zone_snapshot.ZONE_IS_OVERRIDE],
+            [
+                zone_snapshot.decode_irrigation_info(info)
+                for info in zone[zone_snapshot.ZONE_IRRIGATION_INFO]
+            ],
+            last_irrigation_date,
+        )
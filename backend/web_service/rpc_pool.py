@@ -0,0 +1,211 @@
+"""
+This module provides RpcConnectionPool, a bounded and thread-safe pool of
+rpyc connections to the irrigation service shared by the web API workers.
+"""
+
+import collections
+import contextlib
+import threading
+import time
+import rpyc
+
+
+class RpcConnectionPool:
+    """
+    Bounded pool of rpyc connections.
+    A connection is handed to one thread at a time and returned afterwards;
+    closed connections are dropped on checkout, connections that were idle
+    for a while are pinged first. When the service cannot be reached new
+    connections are attempted again only after an exponential backoff.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 18871,
+        max_size: int = 8,
+        checkout_timeout: float = 5.0,
+        validate_after: float = 30.0,
+        min_backoff: float = 0.1,
+        max_backoff: float = 5.0,
+        connect=None,
+    ):
+        if connect is None:
+
+            def connect():
+                return rpyc.connect(host, port, config={"allow_public_attrs": True})
+
+        self._connect = connect
+        self._max_size = max_size
+        self._checkout_timeout = checkout_timeout
+        self._validate_after = validate_after
+        self._min_backoff = min_backoff
+        self._max_backoff = max_backoff
+        self._condition = threading.Condition()
+        # (connection, monotonic time it was returned to the pool)
+        self._idle = collections.deque()
+        self._size = 0
+        self._connect_failures = 0
+        self._next_connect = 0.0
+        self._closed = False
+        self.created = 0
+        self.discarded = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.failed_connects = 0
+
+    def checkout(self, timeout: float = None):
+        """
+        Takes a working connection out of the pool, opening one if needed.
+        Args:
+            timeout (float, optional): Maximum seconds to wait for a free
+                connection, checkout_timeout if None.
+        Returns:
+            rpyc.Connection: A connection to give back with checkin.
+        Raises:
+            TimeoutError: If every connection stayed busy for timeout seconds.
+            ConnectionError: If the service cannot be reached.
+        """
+        if timeout is None:
+            timeout = self._checkout_timeout
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise ConnectionError("RPC connection pool closed")
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self._max_size:
+                    conn, returned_at = None, None
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise TimeoutError("No free RPC connection")
+                self.waits += 1
+                self._condition.wait(remaining)
+        # Connecting and pinging happen outside the lock
+        if conn is not None:
+            if self._is_healthy(conn, returned_at):
+                return conn
+            # The replacement takes the slot of the dead connection
+            self._close(conn)
+        try:
+            return self._open()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def checkin(self, conn, broken: bool = False):
+        """
+        Gives a connection back to the pool.
+        Args:
+            conn (rpyc.Connection): A connection taken with checkout.
+            broken (bool): True if the connection failed and must be closed.
+        """
+        if broken or self._closed or conn.closed:
+            self._discard(conn)
+            return
+        with self._condition:
+            self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    @contextlib.contextmanager
+    def connection(self, timeout: float = None):
+        """
+        Context manager lending a connection for the duration of the block.
+        The connection is closed instead of reused if the block fails with
+        a connection error.
+        """
+        conn = self.checkout(timeout)
+        try:
+            yield conn
+        except (EOFError, OSError):
+            self.checkin(conn, broken=True)
+            raise
+        except BaseException:
+            self.checkin(conn)
+            raise
+        self.checkin(conn)
+
+    def stats(self):
+        """
+        Returns the occupancy and counters of the pool.
+        """
+        with self._condition:
+            idle = len(self._idle)
+            return {
+                "max_size": self._max_size,
+                "size": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                "created": self.created,
+                "discarded": self.discarded,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "failed_connects": self.failed_connects,
+                "backoff_seconds": max(0.0, self._next_connect - time.monotonic()),
+            }
+
+    def close(self):
+        """
+        Closes the idle connections; busy ones are closed when given back.
+        """
+        with self._condition:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._condition.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def _is_healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self._validate_after:
+            return True
+        try:
+            conn.ping(timeout=1)
+            return True
+        except Exception:
+            return False
+
+    def _open(self):
+        with self._condition:
+            wait = self._next_connect - time.monotonic()
+        if wait > 0:
+            raise ConnectionError(f"RPC service unreachable, retrying in {wait:.2f}s")
+        try:
+            conn = self._connect()
+        except Exception as ex:
+            with self._condition:
+                self.failed_connects += 1
+                backoff = min(
+                    self._max_backoff, self._min_backoff * 2**self._connect_failures
+                )
+                self._connect_failures += 1
+                self._next_connect = time.monotonic() + backoff
+            raise ConnectionError(f"Cannot connect to the RPC service: {ex}") from ex
+        with self._condition:
+            self._connect_failures = 0
+            self._next_connect = 0.0
+            self.created += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+        self._close(conn)
+
+    def _close(self, conn):
+        with self._condition:
+            self.discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
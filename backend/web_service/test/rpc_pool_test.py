@@ -0,0 +1,132 @@
+"""
+Unit tests for RpcConnectionPool: verifies reuse, bounds, health checks and
+reconnection backoff of pooled RPC connections.
+"""
+
+import threading
+import unittest
+from backend.web_service.rpc_pool import RpcConnectionPool
+
+
+class FakeConnection:
+    """
+    Stands in for an rpyc connection.
+    """
+
+    def __init__(self):
+        self.closed = False
+        self.pings = 0
+
+    def ping(self, timeout=None):
+        self.pings += 1
+        if self.closed:
+            raise EOFError("connection closed")
+
+    def close(self):
+        self.closed = True
+
+
+class FakeService:
+    """
+    Connect function counting connections, that can be made to fail.
+    """
+
+    def __init__(self):
+        self.connections = []
+        self.available = True
+
+    def connect(self):
+        if not self.available:
+            raise ConnectionRefusedError("service down")
+        conn = FakeConnection()
+        self.connections.append(conn)
+        return conn
+
+
+class TestRpcConnectionPool(unittest.TestCase):
+    """
+    Test suite for RpcConnectionPool.
+    """
+
+    def setUp(self):
+        """
+        Create a pool of two connections to a fake service.
+        """
+        self.service = FakeService()
+        self.pool = RpcConnectionPool(
+            max_size=2, checkout_timeout=0.2, connect=self.service.connect
+        )
+
+    def test_connections_are_reused(self):
+        """
+        Test that sequential requests share one connection.
+        """
+        for _ in range(10):
+            with self.pool.connection():
+                pass
+        self.assertEqual(len(self.service.connections), 1)
+        self.assertEqual(self.pool.stats()["idle"], 1)
+
+    def test_pool_is_bounded(self):
+        """
+        Test that a third concurrent checkout waits and then times out.
+        """
+        first = self.pool.checkout()
+        second = self.pool.checkout()
+        self.assertEqual(self.pool.stats()["in_use"], 2)
+        with self.assertRaises(TimeoutError):
+            self.pool.checkout()
+        released = threading.Timer(0.05, self.pool.checkin, [first])
+        released.start()
+        self.assertIs(self.pool.checkout(timeout=1), first)
+        released.join()
+        self.pool.checkin(first)
+        self.pool.checkin(second)
+        self.assertEqual(self.pool.stats()["timeouts"], 1)
+
+    def test_broken_connections_are_replaced(self):
+        """
+        Test that closed or failing connections are not handed out again.
+        """
+        with self.assertRaises(EOFError):
+            with self.pool.connection():
+                raise EOFError("lost")
+        self.assertTrue(self.service.connections[0].closed)
+        with self.pool.connection() as conn:
+            self.assertIs(conn, self.service.connections[1])
+        conn.closed = True
+        with self.pool.connection() as conn:
+            self.assertIs(conn, self.service.connections[2])
+        self.assertEqual(self.pool.stats()["size"], 1)
+
+    def test_idle_connections_are_pinged(self):
+        """
+        Test that a connection idle for longer than validate_after is pinged.
+        """
+        pool = RpcConnectionPool(validate_after=0, connect=self.service.connect)
+        with pool.connection():
+            pass
+        with pool.connection() as conn:
+            self.assertEqual(conn.pings, 1)
+
+    def test_reconnect_backs_off(self):
+        """
+        Test that after a failed connect new attempts wait for the backoff.
+        """
+        pool = RpcConnectionPool(
+            min_backoff=60, max_size=1, connect=self.service.connect
+        )
+        self.service.available = False
+        with self.assertRaises(ConnectionError):
+            pool.checkout()
+        self.service.available = True
+        with self.assertRaises(ConnectionError):
+            pool.checkout()
+        stats = pool.stats()
+        self.assertEqual(stats["failed_connects"], 1)
+        self.assertEqual(stats["size"], 0)
+        self.assertGreater(stats["backoff_seconds"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()